@@ -0,0 +1,149 @@
+import base64
+import inspect
+import os
+
+from auth import Auth
+from database import DatabaseManager
+
+TOKEN_HEADER = 'X-API-Token'
+SESSION_HEADER = 'X-Session-Token'
+DEFAULT_TIMEOUT = 30
+PHOTO_CACHE_DIR = os.path.join('cache', 'foto')
+
+
+# Sesi login dipakai bersama oleh semua koneksi ke server di proses ini; user_id ditentukan server dari sesi ini
+_session = {'token': None}
+
+
+def set_session_token(token):
+    _session['token'] = token
+
+
+class RemoteError(Exception):
+    def __init__(self, message, error_type=None):
+        super().__init__(message)
+        self.error_type = error_type
+
+
+def restore_rows(value, depth=0):
+    # JSON tidak mengenal tuple; baris hasil query dikembalikan ke tuple seperti dari sqlite3
+    if isinstance(value, list):
+        if depth > 0 and not any(isinstance(item, list) for item in value):
+            return tuple(value)
+        return [restore_rows(item, depth + 1) for item in value]
+    return value
+
+
+class RemoteClient:
+    def __init__(self, url, token=None, timeout=DEFAULT_TIMEOUT):
+        import requests
+
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+        if token:
+            self.session.headers[TOKEN_HEADER] = token
+
+    def post(self, path, payload):
+        headers = {SESSION_HEADER: _session['token']} if _session['token'] else None
+        response = self.session.post(f"{self.url}{path}", json=payload, headers=headers, timeout=self.timeout)
+        try:
+            body = response.json()
+        except ValueError:
+            response.raise_for_status()
+            raise RemoteError(f"Respon server tidak valid ({response.status_code})")
+        if response.status_code != 200 or 'error' in body:
+            raise RemoteError(body.get('error', f"HTTP {response.status_code}"), body.get('type'))
+        return body['result']
+
+    def call(self, target, method, args=(), kwargs=None):
+        return self.post('/call', {'target': target, 'method': method, 'args': list(args), 'kwargs': kwargs or {}})
+
+    def close(self):
+        self.session.close()
+
+
+class RemoteDatabaseManager:
+    # Pengganti DatabaseManager yang meneruskan setiap method ke api_server.py
+    def __init__(self, url, token=None, timeout=DEFAULT_TIMEOUT):
+        self.db_name = url
+        self.client = RemoteClient(url, token, timeout)
+
+    def __getattr__(self, name):
+        if name.startswith('_') or not inspect.isfunction(getattr(DatabaseManager, name, None)):
+            raise AttributeError(name)
+
+        def remote_method(*args, **kwargs):
+            args, kwargs = self.attach_photo(name, args, kwargs)
+            return restore_rows(self.client.call('database', name, args, kwargs))
+        remote_method.__name__ = name
+        return remote_method
+
+    def attach_photo(self, name, args, kwargs):
+        # Foto baru ada di komputer klien, jadi isinya ikut dikirim ke server
+        signature = inspect.signature(getattr(DatabaseManager, name))
+        if 'photo_path' not in signature.parameters:
+            return list(args), kwargs
+        bound = signature.bind_partial(None, *args, **kwargs)
+        photo_path = bound.arguments.get('photo_path')
+        if isinstance(photo_path, str) and os.path.isfile(photo_path):
+            with open(photo_path, 'rb') as f:
+                bound.arguments['photo_path'] = {'__upload__': os.path.basename(photo_path),
+                                                 'data': base64.b64encode(f.read()).decode('ascii')}
+        return list(bound.args[1:]), bound.kwargs
+
+    iter_closed_book = DatabaseManager.iter_closed_book
+
+    def get_data_version(self):
+        # PRAGMA data_version hanya berlaku per koneksi di server, jadi view selalu membandingkan counter perubahan
+        return None
+
+    def fetch_photo(self, photo_path):
+        # Foto tersimpan di server; salinan lokal dipakai untuk ditampilkan
+        if not photo_path or os.path.exists(photo_path):
+            return photo_path
+        local_path = os.path.join(PHOTO_CACHE_DIR, os.path.normpath(photo_path).replace(os.sep, '_'))
+        if not os.path.exists(local_path):
+            data = self.client.post('/file', {'path': photo_path})
+            os.makedirs(PHOTO_CACHE_DIR, exist_ok=True)
+            with open(local_path, 'wb') as f:
+                f.write(base64.b64decode(data))
+        return local_path
+
+    def close(self):
+        self.client.close()
+
+
+class RemoteAuth:
+    def __init__(self, url, token=None, timeout=DEFAULT_TIMEOUT):
+        self.db_name = url
+        self.client = RemoteClient(url, token, timeout)
+
+    def __getattr__(self, name):
+        if name.startswith('_') or not inspect.isfunction(getattr(Auth, name, None)):
+            raise AttributeError(name)
+
+        def remote_method(*args, **kwargs):
+            return self.client.call('auth', name, args, kwargs)
+        remote_method.__name__ = name
+        return remote_method
+
+    def login(self, username, password):
+        result = self.client.call('auth', 'login', (username, password))
+        if result['user_id']:
+            set_session_token(result['session'])
+        return result['user_id']
+
+    def validate_session(self, token):
+        user_id = self.client.call('auth', 'validate_session', (token,))
+        if user_id:
+            set_session_token(token)
+        return user_id
+
+    def revoke_session(self, token):
+        self.client.call('auth', 'revoke_session', (token,))
+        if _session['token'] == token:
+            set_session_token(None)
+
+    def close(self):
+        self.client.close()
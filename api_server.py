@@ -0,0 +1,315 @@
+import argparse
+import base64
+import hmac
+import inspect
+import ipaddress
+import json
+import logging
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from auth import Auth
+from database import DatabaseManager, TRACKED_TABLES, BOOK_DATE_PATTERN
+from settings import get_setting
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 8
+TOKEN_HEADER = 'X-API-Token'
+SESSION_HEADER = 'X-Session-Token'
+
+# Method yang hanya membaca dijalankan paralel di koneksi milik tiap thread,
+# sisanya diserialisasi di satu thread penulis
+READ_PREFIXES = ('get_', 'load_', 'count_')
+READ_METHODS = {'column_exists'}
+HIDDEN_METHODS = {'run_migrations', 'create_tables', 'check_and_update_closed_books', 'check_and_update_closed_books_photo',
+                  'migrate_materials_usage_table', 'migrate_sales_table', 'create_change_tracking', 'create_report_rollup',
+                  'report_source_query', 'rebuild_report_source', 'refresh_report_buckets', 'iter_closed_book', 'touch_closed_book',
+                  'create_archive_registry', 'find_book_tables', 'open_archived_book', 'detach_archives', 'archive_closed_books',
+                  'begin_immediate', 'create_photo_moves', 'create_change_log', 'set_sync_state', 'reset_node_id',
+                  'fetch_photo', 'close'}
+AUTH_READ_METHODS = {'login', 'validate_session'}
+AUTH_WRITE_METHODS = {'register', 'create_session', 'revoke_session', 'revoke_user_sessions'}
+# Method auth yang hanya boleh dipakai untuk user pemilik sesi
+AUTH_SESSION_METHODS = {'create_session', 'revoke_user_sessions'}
+# Argumen berisi nama tabel yang dirangkai ke SQL, jadi harus tabel data atau buku milik user sesi
+TABLE_PARAMETERS = ('table_name', 'backup_table_name', 'backup_name')
+TABLE_NAME_PATTERN = re.compile(r'[A-Za-z0-9_]+')
+
+
+class AuthorizationError(Exception):
+    pass
+
+
+def is_loopback(host):
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def book_owner(book_name):
+    # Nama buku: <tabel>_backup_[<orang>_]<user>_<tahun>_<bulan>_<hari>_<n>[_projects|_materials]
+    base = re.sub(r'_(projects|materials)$', '', book_name.split('_backup_', 1)[1])
+    parts = base.split('_')
+    return int(parts[-5]) if len(parts) >= 5 and parts[-5].isdigit() else None
+
+
+def public_methods(cls):
+    return {name for name, member in vars(cls).items()
+            if inspect.isfunction(member) and not name.startswith('_') and name not in HIDDEN_METHODS}
+
+
+def is_read_method(name):
+    return name.startswith(READ_PREFIXES) or name in READ_METHODS
+
+
+class LedgerService:
+    def __init__(self, db_name, workers=DEFAULT_WORKERS, wal=True):
+        self.db_name = os.path.abspath(db_name)
+        self.workers = workers
+        self.database_methods = public_methods(DatabaseManager)
+        self.local = threading.local()
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ledger-writer')
+        self.writer_state = threading.local()
+        self.upload_dir = tempfile.mkdtemp(prefix='ledger_upload_')
+        self.base_dir = os.getcwd()
+
+        # Migrasi dijalankan sekali di sini sebelum klien pertama terhubung
+        db = DatabaseManager(db_name)
+        if wal:
+            db.conn.execute("PRAGMA journal_mode=WAL")
+        db.conn.close()
+        Auth(db_name).close()
+
+    def reader(self):
+        if not hasattr(self.local, 'db'):
+            self.local.db = DatabaseManager(self.db_name)
+            self.local.db.conn.execute("PRAGMA busy_timeout = 5000")
+        return self.local.db
+
+    def reader_auth(self):
+        if not hasattr(self.local, 'auth'):
+            self.local.auth = Auth(self.db_name)
+        return self.local.auth
+
+    def writer_db(self):
+        if not hasattr(self.writer_state, 'db'):
+            self.writer_state.db = DatabaseManager(self.db_name)
+            self.writer_state.db.conn.execute("PRAGMA busy_timeout = 5000")
+        return self.writer_state.db
+
+    def writer_auth(self):
+        if not hasattr(self.writer_state, 'auth'):
+            self.writer_state.auth = Auth(self.db_name)
+        return self.writer_state.auth
+
+    def session_user(self, session_token):
+        user_id = self.reader_auth().validate_session(session_token) if session_token else None
+        if user_id is None:
+            raise AuthorizationError("Sesi tidak valid, silakan login ulang")
+        return user_id
+
+    def bind_user(self, func, args, kwargs, user_id):
+        # user_id selalu diambil dari sesi; nilai dari klien hanya boleh sama
+        signature = inspect.signature(func)
+        bound = signature.bind_partial(*args, **kwargs)
+        if 'user_id' in signature.parameters:
+            requested = bound.arguments.get('user_id')
+            if requested is not None and requested != user_id:
+                raise AuthorizationError("Tidak boleh mengakses data user lain")
+            bound.arguments['user_id'] = user_id
+        return bound
+
+    def check_table(self, table_name, user_id):
+        if table_name is None or table_name in TRACKED_TABLES:
+            return
+        if TABLE_NAME_PATTERN.fullmatch(table_name) and BOOK_DATE_PATTERN.search(table_name) and book_owner(table_name) == user_id:
+            db = self.reader()
+            # backup_name bahan tanpa akhiran; tabelnya <nama>_projects dan <nama>_materials
+            for name in (table_name, f"{table_name}_projects"):
+                if name in db.find_book_tables(name):
+                    return
+        raise AuthorizationError(f"Tabel tidak dikenal: {table_name}")
+
+    def check_tables(self, bound, user_id):
+        for parameter in TABLE_PARAMETERS:
+            self.check_table(bound.arguments.get(parameter), user_id)
+        for table_name in bound.arguments.get('table_names') or ():
+            self.check_table(table_name, user_id)
+
+    def login(self, username, password):
+        # Login lewat API sekaligus membuat sesi yang dipakai untuk semua panggilan berikutnya
+        user_id = self.reader_auth().login(username, password)
+        if not user_id:
+            return {'user_id': None, 'session': None}
+        session = self.writer.submit(lambda: self.writer_auth().create_session(user_id)).result()
+        return {'user_id': user_id, 'session': session}
+
+    def call(self, target, method, args, kwargs, session_token=None):
+        if target == 'auth':
+            if method == 'login':
+                return self.login(*args, **kwargs)
+            if method in AUTH_SESSION_METHODS:
+                bound = self.bind_user(getattr(Auth, method), [None] + list(args), kwargs, self.session_user(session_token))
+                args, kwargs = bound.args[1:], bound.kwargs
+            if method in AUTH_READ_METHODS:
+                return getattr(self.reader_auth(), method)(*args, **kwargs)
+            if method in AUTH_WRITE_METHODS:
+                return self.writer.submit(lambda: getattr(self.writer_auth(), method)(*args, **kwargs)).result()
+        elif target == 'database' and method in self.database_methods:
+            user_id = self.session_user(session_token)
+            bound = self.bind_user(getattr(DatabaseManager, method), [None] + list(args), kwargs, user_id)
+            self.check_tables(bound, user_id)
+            args, kwargs, uploads = self.store_uploads(bound.args[1:], bound.kwargs)
+            try:
+                if is_read_method(method):
+                    return getattr(self.reader(), method)(*args, **kwargs)
+                return self.writer.submit(lambda: getattr(self.writer_db(), method)(*args, **kwargs)).result()
+            finally:
+                for path in uploads:
+                    os.remove(path)
+        raise ValueError(f"Method tidak dikenal: {target}.{method}")
+
+    def store_uploads(self, args, kwargs):
+        # Foto dikirim klien sebagai base64 lalu disimpan sementara agar DatabaseManager bisa menyalinnya seperti biasa
+        uploads = []
+
+        def restore(value):
+            if isinstance(value, dict) and '__upload__' in value:
+                extension = os.path.splitext(value['__upload__'])[1]
+                fd, path = tempfile.mkstemp(suffix=extension, dir=self.upload_dir)
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(base64.b64decode(value['data']))
+                uploads.append(path)
+                return path
+            return value
+
+        args = [restore(value) for value in args]
+        kwargs = {key: restore(value) for key, value in kwargs.items()}
+        return args, kwargs, uploads
+
+    def read_file(self, path, session_token=None):
+        # Hanya file di bawah folder foto milik user sesi yang boleh diambil
+        root = os.path.join(self.base_dir, 'foto', str(self.session_user(session_token)))
+        full_path = os.path.abspath(os.path.join(self.base_dir, path))
+        if os.path.commonpath([root, full_path]) != root or not os.path.isfile(full_path):
+            raise ValueError(f"File tidak ditemukan: {path}")
+        with open(full_path, 'rb') as f:
+            return base64.b64encode(f.read()).decode('ascii')
+
+    def shutdown(self):
+        self.writer.shutdown(wait=True)
+        shutil.rmtree(self.upload_dir, ignore_errors=True)
+
+
+class LedgerRequestHandler(BaseHTTPRequestHandler):
+    # Koneksi ditutup setiap selesai agar satu klien tidak menahan thread pool
+    timeout = 30
+
+    def do_GET(self):
+        if self.path == '/health':
+            self.send_json(200, {'status': 'ok'})
+        else:
+            self.send_json(404, {'error': 'Tidak ditemukan'})
+
+    def do_POST(self):
+        if not self.authorized():
+            self.send_json(401, {'error': 'Token API tidak valid'})
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            request = json.loads(self.rfile.read(length) or b'{}')
+            session_token = self.headers.get(SESSION_HEADER)
+            if self.path == '/call':
+                result = self.server.service.call(request.get('target', 'database'), request['method'],
+                                                  request.get('args', []), request.get('kwargs', {}), session_token)
+            elif self.path == '/file':
+                result = self.server.service.read_file(request['path'], session_token)
+            else:
+                self.send_json(404, {'error': 'Tidak ditemukan'})
+                return
+            self.send_json(200, {'result': result})
+        except AuthorizationError as e:
+            logging.warning(f"Akses ditolak pada {self.path}: {str(e)}")
+            self.send_json(403, {'error': str(e), 'type': type(e).__name__})
+        except (ValueError, KeyError, TypeError, sqlite3.Error, OSError) as e:
+            logging.error(f"API error pada {self.path}: {str(e)}")
+            self.send_json(400, {'error': str(e), 'type': type(e).__name__})
+
+    def authorized(self):
+        token = self.server.token
+        return not token or hmac.compare_digest(self.headers.get(TOKEN_HEADER, '').encode('utf-8'), token.encode('utf-8'))
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.info("%s - %s", self.address_string(), format % args)
+
+
+class LedgerServer(ThreadingHTTPServer):
+    # Permintaan dilayani thread pool berukuran tetap sehingga koneksi pembaca per thread bisa dipakai ulang
+    def __init__(self, address, service, token=None):
+        super().__init__(address, LedgerRequestHandler)
+        self.service = service
+        self.token = token
+        self.pool = ThreadPoolExecutor(max_workers=service.workers, thread_name_prefix='ledger-reader')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+        self.service.shutdown()
+
+
+def create_server(db_name='project_management.db', host=DEFAULT_HOST, port=DEFAULT_PORT, workers=DEFAULT_WORKERS, token=None, wal=True):
+    # Tanpa token server hanya boleh didengar dari komputer ini sendiri
+    if not token and not is_loopback(host):
+        raise ValueError(f"Token API wajib diisi (--token atau APP_API_TOKEN) untuk mendengarkan di {host}")
+    service = LedgerService(db_name, workers, wal)
+    return LedgerServer((host, port), service, token)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server API lokal agar beberapa komputer memakai satu database")
+    parser.add_argument('--db', default='project_management.db')
+    parser.add_argument('--host', default=get_setting('api_host', DEFAULT_HOST), help="Gunakan 0.0.0.0 agar bisa diakses komputer lain")
+    parser.add_argument('--port', type=int, default=get_setting('api_port', DEFAULT_PORT))
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--token', default=os.environ.get('APP_API_TOKEN') or get_setting('api_token'))
+    parser.add_argument('--no-wal', action='store_true', help="Jangan ubah database ke mode WAL")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    try:
+        server = create_server(args.db, args.host, args.port, args.workers, args.token, not args.no_wal)
+    except ValueError as e:
+        logging.error(str(e))
+        raise SystemExit(1)
+    logging.info(f"Server API berjalan di http://{args.host}:{args.port} untuk {os.path.abspath(args.db)}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
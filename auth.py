@@ -1,12 +1,45 @@
 import sqlite3
 import bcrypt
-from PyQt5.QtWidgets import QMessageBox
+import hashlib
+import os
+import secrets
+from datetime import datetime, timedelta
+from settings import get_setting
+
+DEFAULT_BCRYPT_ROUNDS = 12
+DEFAULT_SESSION_DAYS = 30
+SESSION_FILE = 'session.token'
+
+def load_session_token():
+    if not os.path.exists(SESSION_FILE):
+        return None
+    with open(SESSION_FILE, 'r') as f:
+        return f.read().strip() or None
+
+def save_session_token(token):
+    with open(SESSION_FILE, 'w') as f:
+        f.write(token)
+
+def clear_session_token():
+    if os.path.exists(SESSION_FILE):
+        os.remove(SESSION_FILE)
+
+def open_auth(db_name='project_management.db'):
+    # Sama seperti open_database: pakai server API bila api_url diatur
+    api_url = get_setting('api_url')
+    if api_url:
+        from api_client import RemoteAuth
+        return RemoteAuth(api_url, get_setting('api_token'))
+    return Auth(db_name)
 
 class Auth:
-    def __init__(self, db_name='project_management.db'):
+    def __init__(self, db_name='project_management.db', rounds=None):
+        self.db_name = db_name
+        self.rounds = self.normalize_rounds(rounds if rounds is not None else get_setting('bcrypt_rounds', DEFAULT_BCRYPT_ROUNDS))
         self.conn = sqlite3.connect(db_name)
         self.cursor = self.conn.cursor()
         self.create_users_table()
+        self.create_sessions_table()
 
     def create_users_table(self):
         self.cursor.execute('''
@@ -18,9 +51,74 @@ class Auth:
         ''')
         self.conn.commit()
 
+    def create_sessions_table(self):
+        # Hanya digest SHA-256 dari token yang disimpan, token aslinya ada di komputer pengguna
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            id INTEGER PRIMARY KEY,
+            user_id INTEGER NOT NULL,
+            token_hash TEXT UNIQUE NOT NULL,
+            created_at TEXT NOT NULL,
+            expires_at TEXT NOT NULL,
+            revoked INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        ''')
+        self.conn.commit()
+
+    @staticmethod
+    def hash_token(token):
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def create_session(self, user_id, days=None):
+        days = days if days is not None else get_setting('session_days', DEFAULT_SESSION_DAYS)
+        now = datetime.now()
+        token = secrets.token_urlsafe(32)
+        self.cursor.execute("DELETE FROM sessions WHERE expires_at <= ? OR revoked = 1", (now.isoformat(timespec='seconds'),))
+        self.cursor.execute("INSERT INTO sessions (user_id, token_hash, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                            (user_id, self.hash_token(token), now.isoformat(timespec='seconds'),
+                             (now + timedelta(days=int(days))).isoformat(timespec='seconds')))
+        self.conn.commit()
+        return token
+
+    def validate_session(self, token):
+        self.cursor.execute('''
+        SELECT user_id FROM sessions
+        WHERE token_hash = ? AND revoked = 0 AND expires_at > ?
+        ''', (self.hash_token(token), datetime.now().isoformat(timespec='seconds')))
+        session = self.cursor.fetchone()
+        return session[0] if session else None
+
+    def revoke_session(self, token):
+        self.cursor.execute("UPDATE sessions SET revoked = 1 WHERE token_hash = ?", (self.hash_token(token),))
+        self.conn.commit()
+
+    def revoke_user_sessions(self, user_id):
+        self.cursor.execute("UPDATE sessions SET revoked = 1 WHERE user_id = ?", (user_id,))
+        self.conn.commit()
+
+    @staticmethod
+    def normalize_rounds(rounds):
+        # bcrypt hanya menerima cost 4 sampai 31
+        try:
+            return max(4, min(31, int(rounds)))
+        except (TypeError, ValueError):
+            return DEFAULT_BCRYPT_ROUNDS
+
+    @staticmethod
+    def get_hash_rounds(hashed):
+        # Format hash bcrypt: $2b$<cost>$<salt+hash>
+        try:
+            return int(hashed.split(b'$')[2])
+        except (IndexError, ValueError):
+            return None
+
+    def hash_password(self, password):
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=self.rounds))
+
     def register(self, username, password):
         try:
-            hashed = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+            hashed = self.hash_password(password)
             self.cursor.execute("INSERT INTO users (username, password) VALUES (?, ?)",
                                 (username, hashed))
             self.conn.commit()
@@ -31,9 +129,20 @@ class Auth:
     def login(self, username, password):
         self.cursor.execute("SELECT * FROM users WHERE username=?", (username,))
         user = self.cursor.fetchone()
-        if user and bcrypt.checkpw(password.encode('utf-8'), user[2]):
+        if not user:
+            return None
+
+        stored_hash = user[2] if isinstance(user[2], bytes) else user[2].encode('utf-8')
+        if bcrypt.checkpw(password.encode('utf-8'), stored_hash):
+            if self.get_hash_rounds(stored_hash) != self.rounds:
+                self.rehash_password(user[0], password)
             return user[0]  # Return user ID
         return None
 
+    def rehash_password(self, user_id, password):
+        # Dipanggil setelah login berhasil saat cost di config berubah
+        self.cursor.execute("UPDATE users SET password = ? WHERE id = ?", (self.hash_password(password), user_id))
+        self.conn.commit()
+
     def close(self):
-        self.conn.close()
\ No newline at end of file
+        self.conn.close()
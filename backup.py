@@ -0,0 +1,327 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from datetime import datetime
+from urllib.request import pathname2url
+
+from database import copy_archives
+from settings import get_setting
+
+# Modul ini tidak mengimpor PyQt5 agar bisa dipakai cli.py maupun penjadwal di aplikasi
+BACKUP_ROOT = 'backup'
+DB_FILE = 'project_management.db'
+MANIFEST_FILE = 'manifest.json'
+FOLDER_DATE_FORMAT = '%d-%m-%Y'
+# Backup API menyalin sekian halaman per langkah lalu berhenti sejenak agar disk tidak dimonopoli
+PAGES_PER_STEP = 256
+DEFAULT_MAX_MB_PER_SECOND = 20
+DEFAULT_INTERVAL_MINUTES = 120
+DEFAULT_KEEP_DAILY = 7
+DEFAULT_KEEP_WEEKLY = 4
+DEFAULT_KEEP_MONTHLY = 12
+
+
+IN_USE_MESSAGE = "Database sedang dipakai. Tutup aplikasi dan server API sebelum restore."
+
+
+class RestoreError(Exception):
+    pass
+
+
+def next_snapshot_path(backup_root=BACKUP_ROOT):
+    backup_folder = os.path.join(backup_root, datetime.now().strftime(FOLDER_DATE_FORMAT))
+    destination_path = os.path.join(backup_folder, DB_FILE)
+    counter = 1
+    while os.path.exists(destination_path):
+        counter += 1
+        destination_path = os.path.join(backup_folder, f"project_management({counter}).db")
+    return destination_path
+
+
+def throttle_progress(max_mb_per_second, page_size):
+    delay = PAGES_PER_STEP * page_size / (max_mb_per_second * 1024 * 1024)
+
+    def progress(status, remaining, total):
+        if remaining:
+            time.sleep(delay)
+    return progress
+
+
+def table_counts(conn):
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name")
+    return {name: cursor.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0] for (name,) in cursor.fetchall()}
+
+
+def change_marker(conn):
+    # Jumlah counter perubahan: sama dengan snapshot terakhir berarti data belum berubah
+    try:
+        return conn.execute("SELECT COALESCE(SUM(counter), 0) FROM table_changes").fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+
+def file_sha256(path):
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            file_hash.update(block)
+    return file_hash.hexdigest()
+
+
+def read_manifest(folder):
+    path = os.path.join(folder, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {'snapshots': {}}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def write_manifest(folder, manifest):
+    path = os.path.join(folder, MANIFEST_FILE)
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def create_snapshot(source_path=DB_FILE, backup_root=BACKUP_ROOT, destination_path=None, reason='manual', max_mb_per_second=None,
+                    archive_folder=None):
+    # Backup API sqlite tetap konsisten walaupun aplikasi sedang menulis; file baru muncul setelah lengkap
+    destination_path = destination_path or next_snapshot_path(backup_root)
+    folder = os.path.dirname(os.path.abspath(destination_path))
+    os.makedirs(folder, exist_ok=True)
+    temp_path = destination_path + '.tmp'
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(temp_path)
+    try:
+        if max_mb_per_second:
+            page_size = source.execute("PRAGMA page_size").fetchone()[0]
+            source.backup(target, pages=PAGES_PER_STEP, progress=throttle_progress(max_mb_per_second, page_size))
+        else:
+            source.backup(target)
+        counts = table_counts(target)
+        marker = change_marker(target)
+    finally:
+        target.close()
+        source.close()
+    os.replace(temp_path, destination_path)
+    archive_folder = archive_folder or os.path.join(os.path.dirname(folder), 'arsip')
+    archives = copy_archives(source_path, archive_folder)
+
+    entry = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'reason': reason,
+        'source': os.path.abspath(source_path),
+        'size': os.path.getsize(destination_path),
+        'sha256': file_sha256(destination_path),
+        'change_marker': marker,
+        'tables': counts,
+        'archives': [os.path.basename(path) for path in archives],
+    }
+    manifest = read_manifest(folder)
+    manifest['snapshots'][os.path.basename(destination_path)] = entry
+    write_manifest(folder, manifest)
+    return destination_path, entry
+
+
+def snapshot_folders(backup_root=BACKUP_ROOT):
+    # Hanya folder bertanggal yang dianggap snapshot; arsip dan folder lain tidak disentuh
+    folders = []
+    if not os.path.isdir(backup_root):
+        return folders
+    for name in os.listdir(backup_root):
+        try:
+            folder_date = datetime.strptime(name, FOLDER_DATE_FORMAT).date()
+        except ValueError:
+            continue
+        if os.path.isdir(os.path.join(backup_root, name)):
+            folders.append((folder_date, os.path.join(backup_root, name)))
+    return sorted(folders, reverse=True)
+
+
+def list_snapshots(backup_root=BACKUP_ROOT):
+    # Backup lama tanpa manifest tetap didaftar dengan entry None
+    snapshots = []
+    for _, folder in snapshot_folders(backup_root):
+        manifest = read_manifest(folder)
+        for file in sorted(os.listdir(folder)):
+            if file.endswith('.db'):
+                snapshots.append((os.path.join(folder, file), manifest['snapshots'].get(file)))
+    return snapshots
+
+
+def last_snapshot(backup_root=BACKUP_ROOT):
+    entries = [(entry['created_at'], os.path.getmtime(path), path, entry) for path, entry in list_snapshots(backup_root) if entry]
+    if not entries:
+        return None, None
+    _, _, path, entry = max(entries, key=lambda item: item[:2])
+    return path, entry
+
+
+def has_changes(source_path=DB_FILE, backup_root=BACKUP_ROOT):
+    _, entry = last_snapshot(backup_root)
+    if entry is None or entry.get('change_marker') is None:
+        return True
+    conn = sqlite3.connect(source_path)
+    try:
+        return change_marker(conn) != entry['change_marker']
+    finally:
+        conn.close()
+
+
+def apply_retention(backup_root=BACKUP_ROOT, keep_daily=None, keep_weekly=None, keep_monthly=None):
+    # Kakek-ayah-anak: folder harian terbaru, folder terakhir tiap minggu dan tiap bulan disimpan
+    keep_daily = get_setting('backup_keep_daily', DEFAULT_KEEP_DAILY) if keep_daily is None else keep_daily
+    keep_weekly = get_setting('backup_keep_weekly', DEFAULT_KEEP_WEEKLY) if keep_weekly is None else keep_weekly
+    keep_monthly = get_setting('backup_keep_monthly', DEFAULT_KEEP_MONTHLY) if keep_monthly is None else keep_monthly
+    folders = snapshot_folders(backup_root)
+    keep = {folder for _, folder in folders[:max(keep_daily, 1)]}
+    for key, limit in ((lambda day: day.isocalendar()[:2], keep_weekly), (lambda day: (day.year, day.month), keep_monthly)):
+        periods = []
+        for folder_date, folder in folders:
+            if key(folder_date) not in periods:
+                periods.append(key(folder_date))
+                if len(periods) > limit:
+                    break
+                keep.add(folder)
+
+    removed = []
+    for _, folder in folders:
+        if folder not in keep:
+            shutil.rmtree(folder)
+            removed.append(folder)
+    return removed
+
+
+def run_scheduled_backup(source_path=DB_FILE, backup_root=BACKUP_ROOT, reason='terjadwal', throttle=True):
+    # Tidak membuat snapshot baru jika data belum berubah sejak snapshot terakhir
+    if not has_changes(source_path, backup_root):
+        return None, []
+    max_mb_per_second = get_setting('backup_max_mb_per_second', DEFAULT_MAX_MB_PER_SECOND) if throttle else None
+    path, _ = create_snapshot(source_path, backup_root, reason=reason, max_mb_per_second=max_mb_per_second)
+    return path, apply_retention(backup_root)
+
+
+def open_read_only(path):
+    return sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True)
+
+
+def verify_snapshot(path, entry=None):
+    # Snapshot dibuka hanya-baca sehingga pemeriksaan tidak pernah mengubah file backup
+    errors = []
+    if entry and entry.get('sha256') and file_sha256(path) != entry['sha256']:
+        errors.append("Isi file tidak cocok dengan sha256 di manifest")
+    try:
+        conn = open_read_only(path)
+        try:
+            result = conn.execute("PRAGMA quick_check").fetchone()[0]
+            if result != 'ok':
+                errors.append(f"quick_check: {result}")
+            counts = table_counts(conn)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        errors.append(f"Tidak bisa dibuka: {str(e)}")
+        counts = {}
+    if entry:
+        for table_name, expected in entry.get('tables', {}).items():
+            if table_name not in counts:
+                errors.append(f"Tabel {table_name} tidak ada")
+            elif counts[table_name] != expected:
+                errors.append(f"Tabel {table_name}: {counts[table_name]} baris, manifest {expected}")
+    return {
+        'checked_at': datetime.now().isoformat(timespec='seconds'),
+        'ok': not errors,
+        'manifest': entry is not None,
+        'errors': errors,
+    }
+
+
+def verify_backups(backup_root=BACKUP_ROOT, paths=None):
+    # Hasil pemeriksaan dicatat di manifest.json folder masing-masing
+    results = []
+    for path, entry in list_snapshots(backup_root):
+        if paths and os.path.abspath(path) not in paths:
+            continue
+        result = verify_snapshot(path, entry)
+        folder = os.path.dirname(path)
+        manifest = read_manifest(folder)
+        manifest.setdefault('verifications', {})[os.path.basename(path)] = result
+        write_manifest(folder, manifest)
+        results.append((path, result))
+    return results
+
+
+def snapshot_entry(path):
+    return read_manifest(os.path.dirname(os.path.abspath(path)))['snapshots'].get(os.path.basename(path))
+
+
+def diff_counts(current, snapshot):
+    # Hanya tabel yang jumlah barisnya berbeda: (tabel, sekarang, di snapshot)
+    return [(table_name, current.get(table_name), snapshot.get(table_name))
+            for table_name in sorted(set(current) | set(snapshot))
+            if current.get(table_name) != snapshot.get(table_name)]
+
+
+def lock_for_restore(target_path):
+    # Restore hanya boleh saat aplikasi ditutup. Mode WAL hanya bisa dilepas jika tidak ada koneksi lain,
+    # sekaligus isi file -wal masuk ke file utama
+    conn = sqlite3.connect(target_path, timeout=0, isolation_level=None)
+    try:
+        if conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal':
+            if conn.execute("PRAGMA journal_mode=DELETE").fetchone()[0] != 'delete':
+                raise sqlite3.OperationalError("database is locked")
+        conn.execute("BEGIN EXCLUSIVE")
+        conn.execute("ROLLBACK")
+    except sqlite3.OperationalError:
+        raise RestoreError(IN_USE_MESSAGE)
+    finally:
+        conn.close()
+
+
+def restore_snapshot(snapshot_path, target_path=DB_FILE, backup_root=BACKUP_ROOT, dry_run=False):
+    if not os.path.exists(snapshot_path):
+        raise RestoreError(f"Snapshot {snapshot_path} tidak ditemukan")
+    # Salinan dibuat di folder yang sama dengan database agar os.replace bisa atomik
+    staging_path = os.path.abspath(target_path) + '.restore'
+    shutil.copyfile(snapshot_path, staging_path)
+    try:
+        result = verify_snapshot(staging_path, snapshot_entry(snapshot_path))
+        if not result['ok']:
+            raise RestoreError("Snapshot gagal diperiksa: " + '; '.join(result['errors']))
+        conn = open_read_only(staging_path)
+        try:
+            snapshot_counts = table_counts(conn)
+        finally:
+            conn.close()
+        current_counts = {}
+        if os.path.exists(target_path):
+            conn = open_read_only(target_path)
+            try:
+                current_counts = table_counts(conn)
+            finally:
+                conn.close()
+        diff = diff_counts(current_counts, snapshot_counts)
+        if dry_run:
+            return None, diff
+
+        safety_path = None
+        if os.path.exists(target_path):
+            lock_for_restore(target_path)
+            # Database yang akan ditimpa disimpan dulu sebagai snapshot agar restore bisa dibatalkan
+            safety_path, _ = create_snapshot(target_path, backup_root, reason='sebelum restore')
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(target_path + suffix):
+                    os.remove(target_path + suffix)
+        try:
+            os.replace(staging_path, target_path)
+        except PermissionError:
+            # Di Windows file yang masih dibuka aplikasi tidak bisa ditimpa
+            raise RestoreError(IN_USE_MESSAGE)
+        return safety_path, diff
+    finally:
+        if os.path.exists(staging_path):
+            os.remove(staging_path)
@@ -0,0 +1,178 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+from settings import get_setting
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def summarize(samples):
+    return {
+        'runs': len(samples),
+        'min_ms': min(samples) * 1000,
+        'median_ms': statistics.median(samples) * 1000,
+        'mean_ms': statistics.mean(samples) * 1000,
+        'max_ms': max(samples) * 1000,
+    }
+
+
+class DatabaseBenchmark:
+    def __init__(self, source_db, user_id=1, repeat=5, insert_count=200):
+        self.source_db = source_db
+        self.user_id = user_id
+        self.repeat = repeat
+        self.insert_count = insert_count
+        self.work_dir = tempfile.mkdtemp(prefix='bench_db_')
+        self.results = {}
+
+    def fresh_copy(self):
+        # Benchmark yang mengubah data selalu memakai salinan baru agar hasil antar run sebanding
+        path = os.path.join(self.work_dir, 'bench.db')
+        shutil.copyfile(self.source_db, path)
+        DatabaseManager._migrated_databases.discard(os.path.abspath(path))
+        return path
+
+    def measure(self, name, func, setup=None, repeat=None):
+        samples = []
+        for _ in range(repeat or self.repeat):
+            state = setup() if setup else None
+            start = time.perf_counter()
+            func(state) if setup else func()
+            samples.append(time.perf_counter() - start)
+        self.results[name] = summarize(samples)
+        print(f"{name:40s} {self.results[name]['median_ms']:10.2f} ms (median)")
+
+    def run(self):
+        self.bench_startup()
+
+        db = DatabaseManager(self.fresh_copy())
+        user_id = self.user_id
+        sales_id = db.get_sales_list(user_id)[0][0]
+        tukang_id = db.get_tukang_list(user_id)[0][0]
+        project_id = db.get_projects(user_id)[0][0]
+        closed_consumers = db.get_closed_books('consumers', user_id)
+        closed_sales = db.get_closed_books('sales_projects', user_id)
+        sales_with_books = closed_sales[0].split('_backup_')[1].split('_')[0] if closed_sales else sales_id
+
+        self.measure('get_consumers', lambda: db.get_consumers(user_id=user_id))
+        self.measure('get_consumers_month', lambda: db.get_consumers(2023, 6, user_id))
+        self.measure('get_sales_list', lambda: db.get_sales_list(user_id))
+        self.measure('get_sales_projects', lambda: db.get_sales_projects(sales_id, user_id))
+        self.measure('get_tukang_list', lambda: db.get_tukang_list(user_id))
+        self.measure('get_worker_projects', lambda: db.get_worker_projects(tukang_id, user_id))
+        self.measure('get_projects', lambda: db.get_projects(user_id))
+        self.measure('get_material_usage', lambda: db.get_material_usage(project_id, user_id))
+        self.measure('count_projects', lambda: db.count_projects(user_id))
+        self.measure('get_closed_books', lambda: [db.get_closed_books(table, user_id) for table in ('consumers', 'sales_projects', 'worker_projects')])
+        self.measure('get_closed_books_for_person', lambda: db.get_closed_books_for_person('sales_projects', sales_with_books, user_id))
+        if closed_consumers:
+            self.measure('load_closed_book', lambda: db.load_closed_book(closed_consumers[0]))
+
+        self.measure('insert_consumer', lambda: [
+            db.insert_consumer(("01/01/2024", "Bench", "Jl. Bench", "Sales", "Kanopi", "1000000", "Tukang", ""), 2024, 1, user_id)
+            for _ in range(self.insert_count)], repeat=1)
+        self.measure('insert_sales_project', lambda: [
+            db.insert_sales_project(sales_id, ("Bench", "Jl. Bench", "Kanopi", "1000000", "50000", "", ""), 2024, 1, user_id)
+            for _ in range(self.insert_count)], repeat=1)
+        self.measure('insert_worker_project', lambda: [
+            db.insert_worker_project(tukang_id, ("Bench", "Jl. Bench", "Kanopi", "2x3 m", "", ""), 2024, 1, user_id)
+            for _ in range(self.insert_count)], repeat=1)
+        self.measure('insert_project', lambda: [
+            db.insert_project(("Bench", "Sales", "Tukang", "01/01/2024", "10/01/2024", "1000000", "500000"), user_id)
+            for _ in range(self.insert_count)], repeat=1)
+        self.measure('insert_material_usage', lambda: [
+            db.insert_material_usage(project_id, ("01/01/2024", "Semen", "10", "60000", "600000", ""), user_id)
+            for _ in range(self.insert_count)], repeat=1)
+        for name in ('insert_consumer', 'insert_sales_project', 'insert_worker_project', 'insert_project', 'insert_material_usage'):
+            self.results[name]['rows'] = self.insert_count
+        db.conn.close()
+
+        self.measure('close_book', lambda db: db.close_book('consumers', user_id), setup=self.open_fresh)
+        self.measure('close_book_for_person', lambda db: db.close_book_for_person('sales_projects', sales_id, user_id), setup=self.open_fresh)
+        return self.results
+
+    def open_fresh(self):
+        return DatabaseManager(self.fresh_copy())
+
+    def bench_startup(self):
+        def open_database(path):
+            DatabaseManager(path).conn.close()
+        self.measure('startup_migrations', open_database, setup=self.fresh_copy)
+
+        path = self.fresh_copy()
+        open_database(path)
+        self.measure('startup_cached', lambda: open_database(path))
+
+    def cleanup(self):
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def compare(results, baseline_path, threshold=1.2):
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    print(f"\nPerbandingan dengan {baseline_path}:")
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous['median_ms']:
+            continue
+        ratio = current['median_ms'] / previous['median_ms']
+        flag = "  <-- REGRESI" if ratio > threshold else ""
+        print(f"{name:40s} {previous['median_ms']:10.2f} -> {current['median_ms']:10.2f} ms ({ratio:.2f}x){flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark jalur utama DatabaseManager")
+    parser.add_argument('--db', default='benchmark.db', help="Database hasil generate_data.py")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--insert-count', type=int, default=200)
+    parser.add_argument('--user-id', type=int, default=1)
+    parser.add_argument('--output', help="File JSON hasil (default: benchmarks/results/db_<versi>_<waktu>.json)")
+    parser.add_argument('--compare', help="File JSON hasil sebelumnya sebagai pembanding")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        parser.error(f"{args.db} tidak ditemukan, jalankan generate_data.py terlebih dahulu")
+
+    version = get_setting('version', 'unknown')
+    benchmark = DatabaseBenchmark(args.db, args.user_id, args.repeat, args.insert_count)
+    try:
+        results = benchmark.run()
+    finally:
+        benchmark.cleanup()
+
+    report = {
+        'version': version,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'database': os.path.abspath(args.db),
+        'database_size': os.path.getsize(args.db),
+        'results': results,
+    }
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"db_{version}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nHasil disimpan di {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from PyQt5.QtWidgets import QApplication
+
+from generate_data import generate
+from settings import get_setting
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+DEFAULT_SIZES = (1000, 10000, 100000)
+# SalesTable.load_data memasukkan semua proyek sales ke tabel sekaligus, jadi diukur pada ukuran yang lebih kecil
+DEFAULT_SALES_SIZES = (1000, 3000, 10000)
+SEARCH_TEXT = "budi san"
+
+
+@contextlib.contextmanager
+def quiet():
+    # Beberapa jalur mencetak log per baris; tetap dijalankan tetapi tidak memenuhi terminal
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    with quiet():
+        func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'wall_ms': elapsed * 1000, 'peak_python_kb': peak / 1024}
+
+
+class UiBenchmark:
+    def __init__(self, app, size, table_sizes):
+        self.app = app
+        self.size = size
+        # Jalur yang diukur -> ukuran yang diminta untuk jalur itu; ukuran lain dicatat sebagai dilewati di JSON
+        self.table_sizes = table_sizes
+        self.work_dir = tempfile.mkdtemp(prefix='bench_ui_')
+        self.results = {}
+
+    def prepare(self):
+        # Widget membuka project_management.db dari direktori kerja, jadi database dibuat di folder sementara
+        os.chdir(self.work_dir)
+        counts = {
+            'consumers': self.size,
+            'sales': 1,
+            'tukang': 1,
+            'sales_projects': self.size,
+            'worker_projects': 1,
+            'projects': 1,
+            'materials_usage': self.size,
+            'closed_books': 0,
+        }
+        generate('project_management.db', counts)
+
+    def record(self, name, result):
+        self.results[name] = result
+        if result.get('skipped'):
+            print(f"  {name:36s} dilewati ({result['skipped']})")
+        else:
+            print(f"  {name:36s} {result['wall_ms']:10.1f} ms  puncak {result['peak_python_kb']:10.0f} KB")
+
+    def skipped(self, name):
+        sizes = self.table_sizes[name]
+        if self.size in sizes:
+            return None
+        result = {'skipped': f"{name} hanya diukur pada {', '.join(str(size) for size in sizes)} baris"}
+        self.record(name, result)
+        return result
+
+    def run(self):
+        from table_views import ConsumerTable, SalesTable, MaterialTable
+
+        widgets = []
+        consumer_table = ConsumerTable()
+        consumer_table.user_id = 1
+        widgets.append(consumer_table)
+        if not self.skipped('ConsumerTable.load_data'):
+            self.record('ConsumerTable.load_data', measure(consumer_table.load_data))
+            self.bench_filter(consumer_table)
+            export_path = os.path.join(self.work_dir, 'export.xlsx')
+            self.record('ConsumerTable.export_to_excel', measure(lambda: consumer_table.save_excel(export_path)))
+
+        if not self.skipped('SalesTable.load_data'):
+            sales_table = SalesTable()
+            sales_table.user_id = 1
+            sales_table.current_sales_id = 1
+            widgets.append(sales_table)
+            self.record('SalesTable.load_data', measure(sales_table.load_data))
+
+        if not self.skipped('MaterialTable.load_history_project'):
+            material_table = MaterialTable()
+            material_table.user_id = 1
+            widgets.append(material_table)
+            backup_name = material_table.db.backup_projects_and_materials(1, 'bench')
+            material_table.is_viewing_history = True
+            material_table.current_book_name = backup_name
+            projects = material_table.db.load_closed_book(backup_name + "_projects")
+            self.record('MaterialTable.load_history_project', measure(
+                lambda: material_table.load_history_project(projects[0][0], projects)))
+
+        for widget in widgets:
+            widget.db.conn.close()
+            widget.deleteLater()
+        self.app.processEvents()
+        return self.results
+
+    def bench_filter(self, table):
+        keystrokes = []
+
+        def type_search_text():
+            for length in range(1, len(SEARCH_TEXT) + 1):
+                start = time.perf_counter()
+                table.search_input.setText(SEARCH_TEXT[:length])
+                keystrokes.append((time.perf_counter() - start) * 1000)
+            table.search_input.clear()
+
+        result = measure(type_search_text)
+        result['keystrokes'] = len(SEARCH_TEXT)
+        result['per_keystroke_ms'] = keystrokes
+        result['max_keystroke_ms'] = max(keystrokes)
+        self.record('TableWidget.filter_table', result)
+
+    def cleanup(self):
+        os.chdir(ROOT_DIR)
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark widget tabel tanpa tampilan (QT_QPA_PLATFORM=offscreen)")
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help="Daftar jumlah baris dipisah koma (default: 1000,10000,100000)")
+    parser.add_argument('--sales-sizes', default=','.join(str(size) for size in DEFAULT_SALES_SIZES),
+                        help="Jumlah baris untuk SalesTable.load_data (default: 1000,3000,10000)")
+    parser.add_argument('--output', help="File JSON hasil (default: benchmarks/results/ui_<versi>_<waktu>.json)")
+    args = parser.parse_args()
+
+    version = get_setting('version', 'unknown')
+    output = os.path.abspath(args.output) if args.output else None
+    app = QApplication(sys.argv)
+
+    sizes = [int(value) for value in args.sizes.split(',')]
+    sales_sizes = [int(value) for value in args.sales_sizes.split(',')]
+    table_sizes = {
+        'ConsumerTable.load_data': sizes,
+        'SalesTable.load_data': sales_sizes,
+        'MaterialTable.load_history_project': sizes,
+    }
+    results = {}
+    for size in sorted(set(sizes) | set(sales_sizes)):
+        print(f"{size} baris:")
+        benchmark = UiBenchmark(app, size, table_sizes)
+        try:
+            benchmark.prepare()
+            results[str(size)] = benchmark.run()
+        finally:
+            benchmark.cleanup()
+
+    report = {
+        'version': version,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'qt_platform': os.environ.get('QT_QPA_PLATFORM'),
+        'sizes': {name: sorted(values) for name, values in table_sizes.items()},
+        'results': results,
+    }
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"ui_{version}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nHasil disimpan di {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cloud_backup import (CHUNK_SIZE, UPLOAD_BLOCK_SIZE, CloudUploader, StorageBackend, StorageError,
+                          TransientStorageError, manifest_name)
+
+
+class Interrupted(Exception):
+    # Meniru aplikasi yang ditutup atau komputer yang mati di tengah upload
+    pass
+
+
+class FakeStorage(StorageBackend):
+    # Penyimpanan di memori yang mencatat urutan file selesai diunggah dan bisa diputus pada blok tertentu
+    def __init__(self):
+        self.files = {}
+        self.sessions = {}
+        self.completed = []
+        self.block_calls = 0
+        self.sent_bytes = 0
+        self.fail_blocks = {}
+
+    def list_names(self, prefix):
+        return {name for name in self.files if name.startswith(prefix)}
+
+    def start_upload(self, name, size):
+        session = f"session_{len(self.sessions)}"
+        self.sessions[session] = [name, bytearray()]
+        return session
+
+    def query_upload(self, session, size):
+        if session not in self.sessions:
+            raise StorageError(f"Sesi upload {session} tidak ditemukan")
+        name, received = self.sessions[session]
+        return size if name in self.files else len(received)
+
+    def upload_block(self, session, offset, data, size):
+        self.block_calls += 1
+        failure = self.fail_blocks.pop(self.block_calls, None)
+        name, received = self.sessions[session]
+        if failure == 'partial':
+            # Sebagian blok sudah diterima server sebelum koneksi putus
+            del received[offset:]
+            received.extend(data[:len(data) // 2])
+            raise TransientStorageError("Koneksi terputus")
+        if failure:
+            raise failure("Upload terputus")
+        del received[offset:]
+        received.extend(data)
+        self.sent_bytes += len(data)
+        if len(received) >= size:
+            self.files[name] = bytes(received)
+            self.completed.append(name)
+        return len(received)
+
+    def read(self, name):
+        if name not in self.files:
+            raise StorageError(f"File {name} tidak ada di penyimpanan")
+        return self.files[name]
+
+
+def write_file(path, size, seed):
+    with open(path, 'wb') as f:
+        f.write(os.urandom(size) if seed is None else bytes((seed + i * 7) % 251 for i in range(size)))
+    return path
+
+
+def check(condition, message):
+    print(f"{'OK   ' if condition else 'GAGAL'} {message}")
+    return condition
+
+
+def check_resume(work_dir):
+    # Upload diputus saat aplikasi ditutup, lalu dilanjutkan uploader baru dari state file tanpa mengirim ulang dari awal
+    storage = FakeStorage()
+    state_file = os.path.join(work_dir, 'upload_state.json')
+    db_path = write_file(os.path.join(work_dir, 'project_management.db'), CHUNK_SIZE * 2 + UPLOAD_BLOCK_SIZE, None)
+    files = [('project_management.db', db_path)]
+    blocks_per_chunk = CHUNK_SIZE // UPLOAD_BLOCK_SIZE
+    storage.fail_blocks = {2: 'partial', blocks_per_chunk + 3: Interrupted}
+
+    try:
+        CloudUploader(storage, state_file, sleep=lambda seconds: None).upload_snapshot('resume', files)
+        interrupted = False
+    except Interrupted:
+        interrupted = True
+    results = [
+        check(interrupted, "upload terputus di tengah potongan kedua"),
+        check(manifest_name('resume') not in storage.files, "manifest belum ada selama snapshot belum lengkap"),
+        check(os.path.exists(state_file), "sesi upload yang terputus tersimpan di state file"),
+    ]
+
+    sent_before = storage.sent_bytes
+    result = CloudUploader(storage, state_file, sleep=lambda seconds: None).upload_snapshot('resume', files)
+    total = os.path.getsize(db_path)
+    results += [
+        check(result['uploaded'] == 2 and result['skipped'] == 1, "potongan yang sudah selesai tidak diunggah ulang"),
+        check(storage.sent_bytes - sent_before < total - CHUNK_SIZE, "potongan yang terputus dilanjutkan dari posisi terakhir"),
+        check(storage.completed[-1] == manifest_name('resume'), "manifest diunggah paling akhir"),
+        check(all(name.startswith('chunk_') for name in storage.completed[:-1]), "semua potongan selesai sebelum manifest"),
+    ]
+
+    restore_dir = os.path.join(work_dir, 'restore')
+    paths = CloudUploader(storage, state_file, sleep=lambda seconds: None).download_snapshot('resume', restore_dir)
+    with open(db_path, 'rb') as f, open(paths[0], 'rb') as g:
+        results.append(check(f.read() == g.read(), "snapshot yang diunduh sama dengan file asli"))
+    return all(results)
+
+
+def check_manifest_last(work_dir):
+    # Potongan yang gagal permanen tidak boleh meninggalkan manifest yang menunjuk ke potongan yang tidak ada
+    storage = FakeStorage()
+    state_file = os.path.join(work_dir, 'upload_state_manifest.json')
+    files = [('a.db', write_file(os.path.join(work_dir, 'a.db'), UPLOAD_BLOCK_SIZE * 2, 1)),
+             ('arsip/archive_2024.db', write_file(os.path.join(work_dir, 'archive_2024.db'), UPLOAD_BLOCK_SIZE, 2))]
+    storage.fail_blocks = {3: StorageError}
+    try:
+        CloudUploader(storage, state_file, sleep=lambda seconds: None).upload_snapshot('manifest', files)
+        failed = False
+    except StorageError:
+        failed = True
+    results = [
+        check(failed, "kesalahan permanen menghentikan upload"),
+        check(manifest_name('manifest') not in storage.files, "tanpa manifest jika ada potongan yang gagal"),
+    ]
+
+    result = CloudUploader(storage, state_file, sleep=lambda seconds: None).upload_snapshot('manifest', files)
+    chunks = [name for name in storage.completed if name != manifest_name('manifest')]
+    results += [
+        check(not result['exists'] and storage.completed[-1] == manifest_name('manifest'), "manifest diunggah paling akhir setelah diulang"),
+        check(len(chunks) == 2 and all(name in storage.files for name in chunks), "kedua potongan ada di penyimpanan"),
+        check(CloudUploader(storage, state_file).upload_snapshot('manifest', files)['exists'], "snapshot yang sudah lengkap tidak diunggah lagi"),
+    ]
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Periksa upload resumable cloud_backup.py dengan penyimpanan tiruan")
+    parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='check_cloud_')
+    try:
+        passed = all([check_resume(work_dir), check_manifest_last(work_dir)])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("\nSemua pemeriksaan lulus" if passed else "\nAda pemeriksaan yang gagal")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+
+NAMES = ['Agus Wijaya', 'Budi Santoso', 'Citra Lestari', 'Dewi Anggraini', 'Eko Prasetyo', 'Fajar Nugroho']
+
+
+def rollup_rows(db):
+    rows = []
+    for table_name in ('report_rollup', 'report_rollup_monthly'):
+        db.cursor.execute(f"SELECT * FROM {table_name} ORDER BY user_id, year, month, sales, tukang, source")
+        rows.append(db.cursor.fetchall())
+    return rows
+
+
+def full_rebuild(db):
+    db.cursor.execute("DELETE FROM report_rollup_sources")
+    db.conn.commit()
+    db.refresh_report_rollup()
+    return rollup_rows(db)
+
+
+def check(condition, message):
+    print(f"{'OK   ' if condition else 'GAGAL'} {message}")
+    return condition
+
+
+class RollupScenario:
+    # Perubahan acak pada buku aktif dan tabel induk, diselingi tutup buku, dengan refresh bertahap di antaranya
+    def __init__(self, db, rng, user_ids=(1, 2)):
+        self.db = db
+        self.rng = rng
+        self.user_ids = user_ids
+        self.sales = []
+        self.tukang = []
+        self.projects = []
+
+    def year_month(self):
+        return self.rng.choice([2024, 2025]), self.rng.randint(1, 12)
+
+    def add_people(self):
+        for user_id in self.user_ids:
+            for name in NAMES[:3]:
+                self.sales.append((self.db.insert_sales(name, user_id), user_id))
+                self.tukang.append((self.db.insert_tukang(name, user_id), user_id))
+            project_id = self.db.insert_project(('Proyek', self.rng.choice(NAMES), self.rng.choice(NAMES),
+                                                 '01/01/2025', '01/02/2025', '5000000', '0'), user_id)
+            self.projects.append((project_id, user_id))
+
+    def add_rows(self, count):
+        for _ in range(count):
+            user_id = self.rng.choice(self.user_ids)
+            year, month = self.year_month()
+            amount = str(self.rng.randint(1, 500) * 1000)
+            kind = self.rng.randrange(4)
+            if kind == 0:
+                self.db.insert_consumer(('01/01/2025', 'Konsumen', 'Alamat', self.rng.choice(NAMES), 'Pasang', amount,
+                                         self.rng.choice(NAMES), ''), year, month, user_id)
+            elif kind == 1:
+                sales_id = self.rng.choice([s for s, owner in self.sales if owner == user_id])
+                self.db.insert_sales_project(sales_id, ('Pelanggan', 'Alamat', 'Pasang', amount, '100000', '10000', ''),
+                                             year, month, user_id)
+            elif kind == 2:
+                tukang_id = self.rng.choice([t for t, owner in self.tukang if owner == user_id])
+                self.db.insert_worker_project(tukang_id, ('Pelanggan', 'Alamat', 'Pasang', '3x4', amount, ''),
+                                              year, month, user_id)
+            else:
+                project_id = self.rng.choice([p for p, owner in self.projects if owner == user_id])
+                self.db.insert_material_usage(project_id, (f'{self.rng.randint(1, 28):02d}/{month:02d}/{year}', 'Semen',
+                                                           '2', amount, amount, ''), user_id)
+
+    def edit(self):
+        operation = self.rng.randrange(6)
+        if operation == 0:
+            sales_id, user_id = self.rng.choice(self.sales)
+            self.db.update_sales(sales_id, self.rng.choice(NAMES) + f" {self.rng.randint(1, 99)}", user_id)
+        elif operation == 1:
+            tukang_id, user_id = self.rng.choice(self.tukang)
+            self.db.update_tukang(tukang_id, self.rng.choice(NAMES) + f" {self.rng.randint(1, 99)}", user_id)
+        elif operation == 2:
+            project_id, user_id = self.rng.choice(self.projects)
+            self.db.cursor.execute("UPDATE projects SET sales_name = ?, worker_name = ? WHERE id = ?",
+                                   (self.rng.choice(NAMES), self.rng.choice(NAMES), project_id))
+            self.db.conn.commit()
+        elif operation == 3:
+            year, month = self.year_month()
+            table_name = self.rng.choice(['consumers', 'sales_projects', 'worker_projects'])
+            self.db.cursor.execute(f"UPDATE {table_name} SET year = ?, month = ? WHERE id IN (SELECT id FROM {table_name} ORDER BY RANDOM() LIMIT 3)",
+                                   (year, month))
+            self.db.conn.commit()
+        elif operation == 4:
+            table_name = self.rng.choice(['consumers', 'sales_projects', 'worker_projects', 'materials_usage'])
+            self.db.cursor.execute(f"DELETE FROM {table_name} WHERE id IN (SELECT id FROM {table_name} ORDER BY RANDOM() LIMIT 2)")
+            self.db.conn.commit()
+        else:
+            self.add_rows(5)
+
+    def close_books(self):
+        user_id = self.rng.choice(self.user_ids)
+        self.db.close_book('consumers', user_id)
+        for sales_id, owner in self.sales:
+            if owner == user_id:
+                self.db.close_book_for_person('sales_projects', sales_id, user_id)
+        for tukang_id, owner in self.tukang:
+            if owner == user_id:
+                self.db.close_book_for_person('worker_projects', tukang_id, user_id)
+
+
+def check_incremental(work_dir, seed, edits):
+    db = DatabaseManager(os.path.join(work_dir, f'rollup_{seed}.db'))
+    scenario = RollupScenario(db, random.Random(seed))
+    scenario.add_people()
+    scenario.add_rows(200)
+    db.refresh_report_rollup()
+    scenario.close_books()
+    scenario.add_rows(100)
+    db.refresh_report_rollup()
+
+    results = []
+    for step in range(edits):
+        scenario.edit()
+        if step % 10 == 9:
+            db.refresh_report_rollup()
+    incremental = rollup_rows(db)
+    results.append(check(incremental == full_rebuild(db), f"seed {seed}: refresh bertahap sama dengan hitung ulang penuh setelah {edits} perubahan"))
+
+    # Ganti nama setiap sales dan tukang: buku yang ditutup dan buku aktif harus tetap satu kelompok per orang
+    for sales_id, user_id in scenario.sales:
+        db.update_sales(sales_id, f"Sales {sales_id}", user_id)
+    for tukang_id, user_id in scenario.tukang:
+        db.update_tukang(tukang_id, f"Tukang {tukang_id}", user_id)
+    db.refresh_report_rollup()
+    incremental = rollup_rows(db)
+    db.cursor.execute("SELECT COUNT(*) FROM report_rollup WHERE kind IN ('sales_projects', 'worker_projects') AND sales NOT LIKE 'Sales %' AND tukang NOT LIKE 'Tukang %'")
+    results.append(check(db.cursor.fetchone()[0] == 0, f"seed {seed}: buku yang ditutup memakai nama sales/tukang terbaru"))
+    results.append(check(incremental == full_rebuild(db), f"seed {seed}: refresh bertahap sama dengan hitung ulang penuh setelah ganti nama"))
+    db.close()
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Periksa bahwa refresh_report_rollup bertahap sama dengan hitung ulang penuh")
+    parser.add_argument('--seeds', type=int, default=3)
+    parser.add_argument('--edits', type=int, default=200)
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='check_rollup_')
+    try:
+        passed = all([check_incremental(work_dir, seed, args.edits) for seed in range(args.seeds)])
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    print("\nSemua pemeriksaan lulus" if passed else "\nAda pemeriksaan yang gagal")
+    sys.exit(0 if passed else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager
+
+DEFAULT_COUNTS = {
+    'consumers': 100000,
+    'sales': 500,
+    'tukang': 200,
+    'sales_projects': 20000,
+    'worker_projects': 20000,
+    'projects': 20000,
+    'materials_usage': 500000,
+    'closed_books': 300,
+}
+
+FIRST_NAMES = ['Budi', 'Siti', 'Agus', 'Dewi', 'Joko', 'Rina', 'Andi', 'Wati', 'Hendra', 'Sri', 'Yusuf', 'Lina']
+LAST_NAMES = ['Santoso', 'Wijaya', 'Pratama', 'Saputra', 'Lestari', 'Hidayat', 'Kurniawan', 'Susanti']
+STREETS = ['Jl. Merdeka', 'Jl. Sudirman', 'Jl. Diponegoro', 'Jl. Gatot Subroto', 'Jl. Ahmad Yani', 'Jl. Pahlawan']
+JOBS = ['Kanopi', 'Pagar', 'Teralis', 'Pintu Besi', 'Railing Tangga', 'Atap Baja Ringan', 'Plafon', 'Keramik']
+MATERIALS = ['Besi Hollow', 'Plat Besi', 'Cat Besi', 'Baut', 'Kawat Las', 'Semen', 'Pasir', 'Baja Ringan', 'Genteng']
+BATCH_SIZE = 10000
+
+
+def person_name(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def address(rng):
+    return f"{rng.choice(STREETS)} No. {rng.randint(1, 300)}"
+
+
+def random_date(rng, start=date(2022, 1, 1), days=1000):
+    return start + timedelta(days=rng.randrange(days))
+
+
+def insert_batched(cursor, query, rows):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= BATCH_SIZE:
+            cursor.executemany(query, batch)
+            batch.clear()
+    if batch:
+        cursor.executemany(query, batch)
+
+
+def generate(db_name, counts, user_id=1, seed=42):
+    rng = random.Random(seed)
+    db = DatabaseManager(db_name)
+    cursor = db.cursor
+
+    insert_batched(cursor, "INSERT INTO sales (name, user_id) VALUES (?, ?)",
+                   ((person_name(rng), user_id) for _ in range(counts['sales'])))
+    sales_ids = [row[0] for row in cursor.execute("SELECT id FROM sales WHERE user_id = ?", (user_id,)).fetchall()]
+
+    insert_batched(cursor, "INSERT INTO tukang (name, user_id) VALUES (?, ?)",
+                   ((person_name(rng), user_id) for _ in range(counts['tukang'])))
+    tukang_ids = [row[0] for row in cursor.execute("SELECT id FROM tukang WHERE user_id = ?", (user_id,)).fetchall()]
+
+    def consumers():
+        for _ in range(counts['consumers']):
+            day = random_date(rng)
+            yield (day.strftime("%d/%m/%Y"), person_name(rng), address(rng), person_name(rng), rng.choice(JOBS),
+                   str(rng.randrange(1, 200) * 500000), person_name(rng), '', day.year, day.month, user_id)
+    insert_batched(cursor, '''
+    INSERT INTO consumers (date, name, address, sales, job, total_projects, worker, notes, year, month, user_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', consumers())
+
+    def sales_projects():
+        for _ in range(counts['sales_projects']):
+            day = random_date(rng)
+            total = rng.randrange(1, 200) * 500000
+            yield (rng.choice(sales_ids), person_name(rng), address(rng), rng.choice(JOBS), str(total),
+                   str(total // 20), rng.choice(['', 'KB']), '', day.year, day.month, user_id)
+    insert_batched(cursor, '''
+    INSERT INTO sales_projects (sales_id, customer_name, address, job, total_project, commission, kb, notes, year, month, user_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', sales_projects())
+
+    def worker_projects():
+        for _ in range(counts['worker_projects']):
+            day = random_date(rng)
+            yield (rng.choice(tukang_ids), person_name(rng), address(rng), rng.choice(JOBS),
+                   f"{rng.randint(1, 20)}x{rng.randint(1, 10)} m", rng.choice(['', 'KB']), '', day.year, day.month, user_id)
+    insert_batched(cursor, '''
+    INSERT INTO worker_projects (tukang_id, customer_name, address, job, size, kb, notes, year, month, user_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', worker_projects())
+
+    def projects():
+        for _ in range(counts['projects']):
+            start = random_date(rng)
+            total = rng.randrange(1, 200) * 500000
+            yield (f"{rng.choice(JOBS)} {person_name(rng)}", person_name(rng), person_name(rng),
+                   start.strftime("%d/%m/%Y"), (start + timedelta(days=rng.randint(3, 60))).strftime("%d/%m/%Y"),
+                   str(total), str(total // 2), user_id)
+    insert_batched(cursor, '''
+    INSERT INTO projects (name, sales_name, worker_name, start_date, end_date, total_project, dp, user_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', projects())
+    project_ids = [row[0] for row in cursor.execute("SELECT id FROM projects WHERE user_id = ?", (user_id,)).fetchall()]
+
+    def materials():
+        for _ in range(counts['materials_usage']):
+            quantity = rng.randint(1, 50)
+            unit_price = rng.randrange(1, 100) * 5000
+            yield (rng.choice(project_ids), random_date(rng).strftime("%d/%m/%Y"), rng.choice(MATERIALS),
+                   str(quantity), str(unit_price), str(quantity * unit_price), '', user_id)
+    insert_batched(cursor, '''
+    INSERT INTO materials_usage (project_id, date, item_name, quantity, unit_price, total, notes, user_id)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', materials())
+
+    generate_closed_books(cursor, counts, user_id, sales_ids, tukang_ids, rng)
+    db.conn.commit()
+    db.conn.close()
+
+
+def generate_closed_books(cursor, counts, user_id, sales_ids, tukang_ids, rng):
+    # Tutup buku dibagi rata: konsumen, per sales dan per tukang, dengan nama tabel seperti buatan aplikasi
+    used = set()
+    for index in range(counts['closed_books']):
+        day = random_date(rng)
+        kind = index % 3
+        if kind == 0:
+            name = f"consumers_backup_{user_id}_{day.year}_{day.month}_{day.day}"
+            source = "SELECT * FROM consumers WHERE user_id = ? LIMIT 300 OFFSET ?"
+            params = (user_id, rng.randrange(max(1, counts['consumers'] - 300)))
+        elif kind == 1:
+            person_id = rng.choice(sales_ids)
+            name = f"sales_projects_backup_{person_id}_{user_id}_{day.year}_{day.month}_{day.day}"
+            source = "SELECT * FROM sales_projects WHERE sales_id = ? AND user_id = ?"
+            params = (person_id, user_id)
+        else:
+            person_id = rng.choice(tukang_ids)
+            name = f"worker_projects_backup_{person_id}_{user_id}_{day.year}_{day.month}_{day.day}"
+            source = "SELECT * FROM worker_projects WHERE tukang_id = ? AND user_id = ?"
+            params = (person_id, user_id)
+
+        counter = 1
+        while f"{name}_{counter}" in used:
+            counter += 1
+        name = f"{name}_{counter}"
+        used.add(name)
+        cursor.execute(f"CREATE TABLE {name} AS {source}", params)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Isi database dengan data sintetis untuk benchmark")
+    parser.add_argument('--db', default='benchmark.db', help="File database tujuan (default: benchmark.db)")
+    parser.add_argument('--scale', type=float, default=1.0, help="Pengali jumlah baris (mis. 0.01 untuk uji cepat)")
+    parser.add_argument('--user-id', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--force', action='store_true', help="Timpa file database yang sudah ada")
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        if not args.force:
+            parser.error(f"{args.db} sudah ada, gunakan --force untuk menimpa")
+        os.remove(args.db)
+
+    counts = {key: max(1, int(value * args.scale)) for key, value in DEFAULT_COUNTS.items()}
+    generate(args.db, counts, args.user_id, args.seed)
+    for key, value in counts.items():
+        print(f"{key}: {value}")
+    print(f"Database benchmark dibuat di {os.path.abspath(args.db)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,485 @@
+import argparse
+import csv
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+import db_stats
+import sync
+from cloud_backup import StorageError, open_storage, upload_backup
+from database import DatabaseManager, COLUMN_MAPPINGS, ARCHIVE_KEEP_YEARS
+from backup import BACKUP_ROOT, RestoreError, create_snapshot, next_snapshot_path, apply_retention, verify_backups, restore_snapshot
+
+# CLI sengaja tidak mengimpor PyQt5 agar bisa dijalankan lewat cron di mesin tanpa layar
+DEFAULT_DB = 'project_management.db'
+
+MATERIAL_COLUMNS = {
+    'Tanggal': 'date',
+    'Nama Barang': 'item_name',
+    'Quantity': 'quantity',
+    'Harga Satuan': 'unit_price',
+    'Total': 'total',
+    'Keterangan': 'notes'
+}
+PROJECT_COLUMNS = {
+    'Nama Proyek': 'name',
+    'Sales': 'sales_name',
+    'Tukang': 'worker_name',
+    'Tanggal Mulai': 'start_date',
+    'Tanggal Selesai': 'end_date',
+    'Total Proyek': 'total_project',
+    'DP': 'dp'
+}
+TABLE_COLUMNS = dict(COLUMN_MAPPINGS, materials_usage=MATERIAL_COLUMNS, projects=PROJECT_COLUMNS)
+BOOK_TABLES = ('consumers', 'sales_projects', 'worker_projects', 'materials')
+
+
+class CliError(Exception):
+    pass
+
+
+def parse_currency(value):
+    cleaned_value = str(value).replace('Rp', '').replace('.', '').replace(',', '').strip()
+    try:
+        return int(float(cleaned_value))
+    except ValueError:
+        return 0
+
+
+def format_currency(value):
+    return f"Rp {int(value):,}".replace(',', '.')
+
+
+def resolve_user_id(db, args):
+    if args.user_id is not None:
+        return args.user_id
+    if not args.user:
+        raise CliError("Gunakan --user NAMA atau --user-id ID")
+    db.cursor.execute("SELECT id FROM users WHERE username = ?", (args.user,))
+    row = db.cursor.fetchone()
+    if not row:
+        raise CliError(f"User '{args.user}' tidak ditemukan")
+    return row[0]
+
+
+def find_person(db, table, person, user_id):
+    # Orang bisa dipilih dengan ID atau nama, sama seperti dialog pilih sales/tukang
+    people = db.get_sales_list(user_id) if table == 'sales_projects' else db.get_tukang_list(user_id)
+    for person_id, name, _ in people:
+        if str(person_id) == str(person) or name.lower() == str(person).lower():
+            return person_id, name
+    label = 'Sales' if table == 'sales_projects' else 'Tukang'
+    raise CliError(f"{label} '{person}' tidak ditemukan")
+
+
+def list_books(db, user_id, table=None):
+    books = []
+    if table in (None, 'consumers'):
+        books.extend(('consumers', None, name) for name in db.get_closed_books('consumers', user_id))
+    if table in (None, 'sales_projects'):
+        for person_id, person_name, _ in db.get_sales_list(user_id):
+            books.extend(('sales_projects', person_name, name) for name in db.get_closed_books_for_person('sales_projects', person_id, user_id))
+    if table in (None, 'worker_projects'):
+        for person_id, person_name, _ in db.get_tukang_list(user_id):
+            books.extend(('worker_projects', person_name, name) for name in db.get_closed_books_for_person('worker_projects', person_id, user_id))
+    if table in (None, 'materials'):
+        books.extend(('materials', None, name) for name in db.get_backup_books(user_id))
+    return books
+
+
+def table_exists(db, name):
+    # Buku yang sudah diarsipkan ikut ditemukan, file arsipnya dipasang oleh get_table_columns
+    return bool(db.get_table_columns(name))
+
+
+def read_table(db, table_name, base_table, where=None, params=()):
+    # Hanya kolom yang juga tampil di aplikasi yang diekspor, dengan judul kolom yang sama
+    mapping = TABLE_COLUMNS.get(base_table, {})
+    actual_columns = db.get_table_columns(table_name)
+    columns = [(label, column) for label, column in mapping.items() if column in actual_columns]
+    if not columns:
+        columns = [(column, column) for column in actual_columns]
+    query = f'SELECT {", ".join(column for _, column in columns)} FROM "{table_name}"'
+    if where:
+        query += f" WHERE {where}"
+    db.cursor.execute(query, params)
+    return [label for label, _ in columns], db.cursor.fetchall()
+
+
+def write_sheets(output, sheets):
+    if output.lower().endswith('.csv'):
+        with open(output, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f)
+            for index, (title, headers, rows) in enumerate(sheets):
+                if len(sheets) > 1:
+                    if index:
+                        writer.writerow([])
+                    writer.writerow([title])
+                writer.writerow(headers)
+                writer.writerows(rows)
+        return
+
+    import openpyxl
+    from openpyxl.styles import Font
+
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for title, headers, rows in sheets:
+        sheet = workbook.create_sheet(title[:31])
+        sheet.append(headers)
+        for cell in sheet[1]:
+            cell.font = Font(bold=True)
+        for row in rows:
+            sheet.append(list(row))
+    workbook.save(output)
+
+
+def cmd_close_book(db, args):
+    user_id = resolve_user_id(db, args)
+    if args.table == 'consumers':
+        book = db.close_book('consumers', user_id)
+    elif args.table in ('sales_projects', 'worker_projects'):
+        if args.person is None:
+            raise CliError("Tutup buku sales/tukang membutuhkan --person")
+        person_id, _ = find_person(db, args.table, args.person, user_id)
+        book = db.close_book_for_person(args.table, person_id, user_id)
+    else:
+        if not db.count_projects(user_id):
+            raise CliError("Tidak dapat menutup buku karena tidak ada proyek di dalam database.")
+        book = db.close_materials_book(user_id)
+    print(f"Buku ditutup: {book}")
+    # Foto dipindah setelah commit; jika terputus, sisanya dilanjutkan saat aplikasi dibuka
+    _, _, failures = db.relocate_photos()
+    for old_path, error in failures:
+        print(f"Foto {old_path} belum bisa dipindahkan, dicoba lagi nanti: {error}", file=sys.stderr)
+
+
+def cmd_books(db, args):
+    user_id = resolve_user_id(db, args)
+    for table, person, name in list_books(db, user_id, args.table):
+        print(f"{table}\t{person or '-'}\t{name}")
+
+
+def cmd_export(db, args):
+    user_id = resolve_user_id(db, args)
+    sheets = []
+    if args.book:
+        if table_exists(db, f"{args.book}_projects"):
+            headers, rows = read_table(db, f"{args.book}_projects", 'projects')
+            sheets.append(("Proyek", headers, rows))
+            headers, rows = read_table(db, f"{args.book}_materials", 'materials_usage')
+            sheets.append(("Bahan", headers, rows))
+        elif table_exists(db, args.book) and '_backup_' in args.book:
+            base_table = args.book.split('_backup_')[0]
+            headers, rows = read_table(db, args.book, base_table)
+            sheets.append((base_table, headers, rows))
+        else:
+            raise CliError(f"Buku '{args.book}' tidak ditemukan")
+    elif args.table == 'consumers':
+        sheets.append(("consumers",) + read_table(db, 'consumers', 'consumers', "user_id = ?", (user_id,)))
+    elif args.table in ('sales_projects', 'worker_projects'):
+        if args.person is None:
+            raise CliError("Export sales/tukang membutuhkan --person")
+        person_id, name = find_person(db, args.table, args.person, user_id)
+        person_column = 'sales_id' if args.table == 'sales_projects' else 'tukang_id'
+        sheets.append((name,) + read_table(db, args.table, args.table, f"{person_column} = ? AND user_id = ?", (person_id, user_id)))
+    elif args.table == 'materials':
+        sheets.append(("Proyek",) + read_table(db, 'projects', 'projects', "user_id = ?", (user_id,)))
+        sheets.append(("Bahan",) + read_table(db, 'materials_usage', 'materials_usage', "user_id = ?", (user_id,)))
+    else:
+        raise CliError("Gunakan --book NAMA atau --table TABEL")
+
+    write_sheets(args.output, sheets)
+    print(f"Data diekspor ke {args.output} ({sum(len(rows) for _, _, rows in sheets)} baris)")
+
+
+def cmd_backup(db, args):
+    destination_path = args.output or next_snapshot_path(args.dest)
+    archive_folder = os.path.join(args.dest if not args.output else os.path.dirname(os.path.abspath(args.output)), 'arsip')
+    destination_path, entry = create_snapshot(db.db_name, destination_path=destination_path, reason='cli',
+                                              max_mb_per_second=args.max_mb_per_second, archive_folder=archive_folder)
+    print(f"Database di-backup ke {destination_path} ({entry['size'] // 1024} KB, {len(entry['tables'])} tabel)")
+    for name in entry['archives']:
+        print(f"Arsip disalin ke {os.path.join(archive_folder, name)}")
+    if args.prune and not args.output:
+        for folder in apply_retention(args.dest):
+            print(f"Backup lama dihapus: {folder}")
+    if args.upload:
+        storage = open_storage()
+        if storage is None:
+            raise CliError("Atur backup_storage ('drive' atau 'local') di config.json untuk upload")
+        result = upload_backup(storage, destination_path, archive_folder,
+                               lambda value, text: print(f"\r{value:3d}% {text}", end='', flush=True))
+        print()
+        if result['exists']:
+            print(f"Snapshot {result['manifest']} sudah ada di penyimpanan")
+        else:
+            print(f"{result['uploaded']} potongan ({result['uploaded_bytes'] // 1024} KB) diunggah, {result['skipped']} sudah ada")
+
+
+def read_rows(path):
+    if path.lower().endswith('.csv'):
+        with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+            rows = list(csv.reader(f))
+    else:
+        import openpyxl
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        rows = [['' if value is None else str(value) for value in row] for row in workbook.active.iter_rows(values_only=True)]
+        workbook.close()
+    rows = [row for row in rows if any(str(value).strip() for value in row)]
+    if not rows:
+        return [], []
+    return [str(header).strip() for header in rows[0]], rows[1:]
+
+
+def cmd_import(db, args):
+    user_id = resolve_user_id(db, args)
+    base_table = 'materials_usage' if args.table == 'materials' else args.table
+    labels = list(TABLE_COLUMNS[base_table].keys())
+    headers, rows = read_rows(args.file)
+    missing = [label for label in labels if label not in headers and label != 'Tanggal']
+    if missing:
+        raise CliError(f"Kolom tidak ditemukan di {args.file}: {', '.join(missing)}")
+
+    now = datetime.now()
+    year = args.year or now.year
+    month = args.month or now.month
+    if args.table in ('sales_projects', 'worker_projects'):
+        if args.person is None:
+            raise CliError("Import sales/tukang membutuhkan --person")
+        person_id, _ = find_person(db, args.table, args.person, user_id)
+    if args.table == 'materials' and args.project is None:
+        raise CliError("Import bahan membutuhkan --project ID")
+
+    count = 0
+    for row in rows:
+        values = dict(zip(headers, row))
+        data = [str(values.get(label, '') or '').strip() for label in labels]
+        if args.table == 'consumers':
+            data[0] = data[0] or now.strftime("%d/%m/%Y")
+            data[5] = format_currency(parse_currency(data[5]))
+            db.insert_consumer(data, year, month, user_id)
+        elif args.table == 'sales_projects':
+            db.insert_sales_project(person_id, data, year, month, user_id)
+        elif args.table == 'worker_projects':
+            db.insert_worker_project(person_id, data, year, month, user_id)
+        else:
+            data[0] = data[0] or now.strftime("%d/%m/%Y")
+            db.insert_material_usage(args.project, data, user_id)
+        count += 1
+    print(f"{count} baris diimpor ke {args.table}")
+
+
+def cmd_report(db, args):
+    user_id = resolve_user_id(db, args)
+    consumers = db.get_consumers(args.year, args.month, user_id) if args.year and args.month else db.get_consumers(user_id=user_id)
+    print(f"Konsumen: {len(consumers)} data, total proyek {format_currency(sum(parse_currency(row[6]) for row in consumers))}")
+
+    print("\nSales:")
+    for sales_id, name, _ in db.get_sales_list(user_id):
+        projects = db.get_sales_projects(sales_id, user_id)
+        commission = sum(parse_currency(row[5]) for row in projects)
+        kb = sum(parse_currency(row[6]) for row in projects)
+        print(f"  {name}: {len(projects)} proyek, komisi bersih {format_currency(commission - kb)}, KB {format_currency(kb)}")
+
+    print("\nTukang:")
+    for tukang_id, name, _ in db.get_tukang_list(user_id):
+        print(f"  {name}: {len(db.get_worker_projects(tukang_id, user_id))} proyek")
+
+    print("\nProyek:")
+    for project in db.get_projects(user_id):
+        cost = sum(parse_currency(row[6]) for row in db.get_material_usage(project[0], user_id))
+        total = parse_currency(project[6])
+        print(f"  {project[1]}: total {format_currency(total)}, bahan {format_currency(cost)}, keuntungan {format_currency(total - cost)}")
+
+    books = list_books(db, user_id)
+    print(f"\nBuku yang sudah ditutup: {len(books)}")
+
+
+def cmd_vacuum(db, args):
+    size_before = os.path.getsize(db.db_name)
+    db.cursor.execute("PRAGMA integrity_check")
+    result = db.cursor.fetchone()[0]
+    if result != 'ok':
+        raise CliError(f"Pemeriksaan integritas gagal: {result}")
+    db.conn.execute("VACUUM")
+    db.conn.execute("ANALYZE")
+    size_after = os.path.getsize(db.db_name)
+    print(f"VACUUM selesai: {size_before / 1024:.0f} KB -> {size_after / 1024:.0f} KB")
+
+
+def cmd_archive(db, args):
+    before_year = args.before_year or datetime.now().year - args.keep_years
+    archived = db.archive_closed_books(before_year)
+    if not archived:
+        print(f"Tidak ada buku yang ditutup sebelum tahun {before_year}")
+        return
+    counts = {}
+    for name in archived:
+        archive_file = db.get_archive_file(name)
+        counts[archive_file] = counts.get(archive_file, 0) + 1
+    for archive_file, count in sorted(counts.items()):
+        print(f"{count} buku diarsipkan ke {archive_file}")
+    if args.vacuum:
+        cmd_vacuum(db, args)
+
+
+def cmd_verify(db, args):
+    paths = {os.path.abspath(path) for path in args.snapshot} if args.snapshot else None
+    results = verify_backups(args.dest, paths)
+    if not results:
+        print(f"Tidak ada snapshot di {args.dest}")
+        return
+    failed = 0
+    for path, result in results:
+        note = '' if result['manifest'] else ' (tanpa manifest, jumlah baris tidak dibandingkan)'
+        print(f"{'OK' if result['ok'] else 'GAGAL'}\t{path}{note}")
+        for error in result['errors']:
+            print(f"\t{error}")
+        failed += not result['ok']
+    if failed:
+        raise CliError(f"{failed} dari {len(results)} snapshot gagal diperiksa")
+
+
+def cmd_restore(db, args):
+    # Koneksi CLI sendiri ditutup agar tidak menghalangi penggantian file
+    db.conn.close()
+    safety_path, diff = restore_snapshot(args.snapshot, db.db_name, args.dest, dry_run=args.dry_run)
+    if diff:
+        print("Tabel\tSekarang\tSnapshot")
+        for table_name, current, snapshot in diff:
+            print(f"{table_name}\t{'-' if current is None else current}\t{'-' if snapshot is None else snapshot}")
+    else:
+        print("Jumlah baris semua tabel sama dengan snapshot")
+    if args.dry_run:
+        print("Dry run: database tidak diubah")
+        return
+    print(f"Database dipulihkan dari {args.snapshot}")
+    if safety_path:
+        print(f"Database sebelumnya disimpan di {safety_path}")
+
+
+def cmd_sync_export(db, args):
+    count, since, until = sync.export_changes(db, args.output, args.since)
+    print(f"{count} perubahan (urutan {since + 1} s/d {until}) diekspor ke {args.output}")
+
+
+def cmd_sync_import(db, args):
+    applied, skipped = sync.import_changes(db, args.file)
+    print(f"{applied} perubahan diterapkan, {skipped} dilewati karena data di sini lebih baru")
+
+
+def cmd_sync_copy(db, args):
+    node_id = db.reset_node_id()
+    print(f"Database ditandai sebagai salinan dengan node {node_id}; perubahan dari database asal tidak akan diimpor ulang")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Perintah pembukuan tanpa tampilan (untuk cron/terjadwal)")
+    parser.add_argument('--db', default=DEFAULT_DB, help=f"File database (default: {DEFAULT_DB})")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_user_arguments(subparser):
+        subparser.add_argument('--user', help="Username pemilik data")
+        subparser.add_argument('--user-id', type=int, help="ID user pemilik data")
+
+    close_book = subparsers.add_parser('close-book', help="Tutup buku dan pindahkan data ke riwayat")
+    close_book.add_argument('table', choices=BOOK_TABLES)
+    close_book.add_argument('--person', help="ID atau nama sales/tukang")
+    add_user_arguments(close_book)
+    close_book.set_defaults(func=cmd_close_book)
+
+    books = subparsers.add_parser('books', help="Daftar buku yang sudah ditutup")
+    books.add_argument('--table', choices=BOOK_TABLES)
+    add_user_arguments(books)
+    books.set_defaults(func=cmd_books)
+
+    export = subparsers.add_parser('export', help="Ekspor data saat ini atau buku yang sudah ditutup ke .xlsx/.csv")
+    export.add_argument('--book', help="Nama buku (lihat perintah books)")
+    export.add_argument('--table', choices=BOOK_TABLES)
+    export.add_argument('--person', help="ID atau nama sales/tukang")
+    export.add_argument('-o', '--output', required=True)
+    add_user_arguments(export)
+    export.set_defaults(func=cmd_export)
+
+    backup = subparsers.add_parser('backup', help="Backup database ke folder backup/<tanggal>")
+    backup.add_argument('--dest', default=BACKUP_ROOT, help=f"Folder induk backup (default: {BACKUP_ROOT})")
+    backup.add_argument('-o', '--output', help="Path file backup (menggantikan --dest)")
+    backup.add_argument('--upload', action='store_true', help="Unggah snapshot ke penyimpanan di pengaturan backup_storage")
+    backup.add_argument('--prune', action='store_true', help="Hapus folder backup lama sesuai aturan simpan harian/mingguan/bulanan")
+    backup.add_argument('--max-mb-per-second', type=float, help="Batasi kecepatan baca agar aplikasi yang sedang dipakai tetap lancar")
+    backup.set_defaults(func=cmd_backup)
+
+    import_parser = subparsers.add_parser('import', help="Impor baris dari .xlsx/.csv dengan judul kolom seperti di aplikasi")
+    import_parser.add_argument('table', choices=BOOK_TABLES)
+    import_parser.add_argument('file')
+    import_parser.add_argument('--person', help="ID atau nama sales/tukang")
+    import_parser.add_argument('--project', type=int, help="ID proyek untuk data bahan")
+    import_parser.add_argument('--year', type=int)
+    import_parser.add_argument('--month', type=int)
+    add_user_arguments(import_parser)
+    import_parser.set_defaults(func=cmd_import)
+
+    report = subparsers.add_parser('report', help="Ringkasan konsumen, komisi sales, tukang dan proyek")
+    report.add_argument('--year', type=int)
+    report.add_argument('--month', type=int)
+    add_user_arguments(report)
+    report.set_defaults(func=cmd_report)
+
+    archive = subparsers.add_parser('archive', help="Pindahkan buku lama ke file archive_<tahun>.db agar database utama tetap kecil")
+    archive.add_argument('--before-year', type=int, help="Arsipkan buku yang ditutup sebelum tahun ini")
+    archive.add_argument('--keep-years', type=int, default=ARCHIVE_KEEP_YEARS,
+                         help=f"Jika --before-year tidak diisi, simpan buku tahun ini dan {ARCHIVE_KEEP_YEARS} tahun sebelumnya (default: {ARCHIVE_KEEP_YEARS})")
+    archive.add_argument('--vacuum', action='store_true', help="Jalankan VACUUM setelah mengarsipkan agar ukuran file ikut mengecil")
+    archive.set_defaults(func=cmd_archive)
+
+    verify = subparsers.add_parser('verify', help="Periksa snapshot di folder backup (quick_check dan jumlah baris dibanding manifest)")
+    verify.add_argument('snapshot', nargs='*', help="File snapshot tertentu (default: semua)")
+    verify.add_argument('--dest', default=BACKUP_ROOT, help=f"Folder induk backup (default: {BACKUP_ROOT})")
+    verify.set_defaults(func=cmd_verify)
+
+    restore = subparsers.add_parser('restore', help="Pulihkan database dari snapshot; aplikasi harus ditutup")
+    restore.add_argument('snapshot')
+    restore.add_argument('--dest', default=BACKUP_ROOT, help=f"Folder induk backup (default: {BACKUP_ROOT})")
+    restore.add_argument('--dry-run', action='store_true', help="Hanya tampilkan perbedaan jumlah baris tanpa mengganti database")
+    restore.set_defaults(func=cmd_restore)
+
+    sync_export = subparsers.add_parser('sync-export', help="Ekspor perubahan komputer ini untuk diimpor di komputer lain")
+    sync_export.add_argument('-o', '--output', required=True)
+    sync_export.add_argument('--since', type=int, help="Nomor urut awal (default: yang terakhir diterima semua komputer lain)")
+    sync_export.set_defaults(func=cmd_sync_export)
+
+    sync_copy = subparsers.add_parser('sync-copy', help="Tandai database hasil salinan agar tercatat sebagai komputer baru (sekali saja)")
+    sync_copy.set_defaults(func=cmd_sync_copy)
+
+    sync_import = subparsers.add_parser('sync-import', help="Terapkan file perubahan dari komputer lain")
+    sync_import.add_argument('file')
+    sync_import.set_defaults(func=cmd_sync_import)
+
+    vacuum = subparsers.add_parser('vacuum', help="Periksa integritas lalu VACUUM dan ANALYZE database")
+    vacuum.set_defaults(func=cmd_vacuum)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    db_stats.enable_from_args(argv)
+    args = build_parser().parse_args(argv)
+    if not os.path.exists(args.db):
+        print(f"Database {args.db} tidak ditemukan", file=sys.stderr)
+        return 1
+
+    db = DatabaseManager(args.db)
+    try:
+        args.func(db, args)
+    except (CliError, RestoreError, StorageError, sync.SyncError, sqlite3.Error, OSError, ValueError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.conn.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
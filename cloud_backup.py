@@ -0,0 +1,380 @@
+import abc
+import hashlib
+import json
+import os
+import random
+import time
+from datetime import datetime
+
+from settings import get_setting
+
+# Snapshot dipecah menjadi potongan berukuran tetap yang diberi nama sesuai hash isinya,
+# jadi halaman database yang tidak berubah sejak backup sebelumnya tidak diunggah ulang
+CHUNK_SIZE = 4 * 1024 * 1024
+# Google Drive mensyaratkan setiap potongan upload resumable kelipatan 256 KB
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 32.0
+MANIFEST_FORMAT = 1
+STATE_FILE = os.path.join('backup', 'upload_state.json')
+DRIVE_SCOPES = ['https://www.googleapis.com/auth/drive.file']
+DRIVE_API_URL = 'https://www.googleapis.com/drive/v3'
+DRIVE_UPLOAD_URL = 'https://www.googleapis.com/upload/drive/v3'
+DRIVE_FOLDER_NAME = 'Backup Pembukuan'
+DRIVE_FOLDER_MIME = 'application/vnd.google-apps.folder'
+
+
+class StorageError(Exception):
+    pass
+
+
+class TransientStorageError(StorageError):
+    # Gangguan jaringan, 429 atau 5xx: upload boleh dicoba lagi
+    pass
+
+
+def chunk_name(digest):
+    return f"chunk_{digest}"
+
+
+def manifest_name(snapshot_name):
+    return f"manifest_{snapshot_name.replace('/', '_').replace(os.sep, '_')}.json"
+
+
+class StorageBackend(abc.ABC):
+    # Upload mengikuti protokol resumable: sesi dibuka, isi dikirim per blok, posisi terakhir bisa ditanyakan
+    @abc.abstractmethod
+    def list_names(self, prefix):
+        pass
+
+    @abc.abstractmethod
+    def start_upload(self, name, size):
+        pass
+
+    @abc.abstractmethod
+    def query_upload(self, session, size):
+        pass
+
+    @abc.abstractmethod
+    def upload_block(self, session, offset, data, size):
+        pass
+
+    @abc.abstractmethod
+    def read(self, name):
+        pass
+
+
+class LocalDirectoryStorage(StorageBackend):
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def list_names(self, prefix):
+        return {name for name in os.listdir(self.root) if name.startswith(prefix) and not name.endswith('.part')}
+
+    def start_upload(self, name, size):
+        open(self.path(name) + '.part', 'wb').close()
+        return name
+
+    def query_upload(self, session, size):
+        if os.path.exists(self.path(session)):
+            return size
+        if not os.path.exists(self.path(session) + '.part'):
+            raise StorageError(f"Sesi upload {session} tidak ditemukan")
+        return os.path.getsize(self.path(session) + '.part')
+
+    def upload_block(self, session, offset, data, size):
+        part_path = self.path(session) + '.part'
+        with open(part_path, 'r+b') as f:
+            f.truncate(offset)
+            f.seek(offset)
+            f.write(data)
+        if offset + len(data) >= size:
+            os.replace(part_path, self.path(session))
+        return offset + len(data)
+
+    def read(self, name):
+        if not os.path.exists(self.path(name)):
+            raise StorageError(f"File {name} tidak ada di penyimpanan")
+        with open(self.path(name), 'rb') as f:
+            return f.read()
+
+
+class GoogleDriveStorage(StorageBackend):
+    # Memakai protokol upload resumable Drive v3 langsung lewat session HTTP, sehingga alamat API
+    # bisa diarahkan ke server tiruan saat pengujian
+    def __init__(self, session, folder_id, api_url=DRIVE_API_URL, upload_url=DRIVE_UPLOAD_URL, timeout=60):
+        self.session = session
+        self.folder_id = folder_id
+        self.api_url = api_url.rstrip('/')
+        self.upload_url = upload_url.rstrip('/')
+        self.timeout = timeout
+        self.file_ids = {}
+
+    def request(self, method, url, **kwargs):
+        import requests
+
+        try:
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise TransientStorageError(str(e))
+        if response.status_code == 429 or response.status_code >= 500:
+            raise TransientStorageError(f"Google Drive membalas HTTP {response.status_code}")
+        return response
+
+    def check(self, response, *statuses):
+        if response.status_code not in statuses:
+            raise StorageError(f"Google Drive membalas HTTP {response.status_code}: {response.text[:200]}")
+        return response
+
+    def list_names(self, prefix):
+        query = f"'{self.folder_id}' in parents and trashed = false and name contains '{prefix}'"
+        params = {'q': query, 'fields': 'nextPageToken, files(id, name)', 'pageSize': 1000}
+        names = set()
+        while True:
+            body = self.check(self.request('GET', f"{self.api_url}/files", params=params), 200).json()
+            for item in body.get('files', []):
+                if item['name'].startswith(prefix):
+                    self.file_ids[item['name']] = item['id']
+                    names.add(item['name'])
+            if not body.get('nextPageToken'):
+                return names
+            params['pageToken'] = body['nextPageToken']
+
+    def start_upload(self, name, size):
+        response = self.check(self.request(
+            'POST', f"{self.upload_url}/files", params={'uploadType': 'resumable'},
+            json={'name': name, 'parents': [self.folder_id]},
+            headers={'X-Upload-Content-Type': 'application/octet-stream', 'X-Upload-Content-Length': str(size)}), 200)
+        return response.headers['Location']
+
+    def received(self, response, size):
+        if response.status_code in (200, 201):
+            return size
+        self.check(response, 308)
+        # Header Range berbentuk "bytes=0-N"; tanpa header berarti belum ada byte yang diterima
+        byte_range = response.headers.get('Range')
+        return int(byte_range.rsplit('-', 1)[1]) + 1 if byte_range else 0
+
+    def query_upload(self, session, size):
+        response = self.request('PUT', session, headers={'Content-Range': f"bytes */{size}", 'Content-Length': '0'})
+        if response.status_code in (404, 410):
+            raise StorageError("Sesi upload sudah kedaluwarsa")
+        return self.received(response, size)
+
+    def upload_block(self, session, offset, data, size):
+        content_range = f"bytes {offset}-{offset + len(data) - 1}/{size}" if data else f"bytes */{size}"
+        response = self.request('PUT', session, data=data, headers={'Content-Range': content_range})
+        return self.received(response, size)
+
+    def read(self, name):
+        if name not in self.file_ids:
+            self.list_names(name)
+        if name not in self.file_ids:
+            raise StorageError(f"File {name} tidak ada di Google Drive")
+        return self.check(self.request('GET', f"{self.api_url}/files/{self.file_ids[name]}", params={'alt': 'media'}), 200).content
+
+    def ensure_folder(self, name):
+        query = f"name = '{name}' and mimeType = '{DRIVE_FOLDER_MIME}' and trashed = false"
+        body = self.check(self.request('GET', f"{self.api_url}/files", params={'q': query, 'fields': 'files(id)'}), 200).json()
+        if body.get('files'):
+            self.folder_id = body['files'][0]['id']
+        else:
+            response = self.request('POST', f"{self.api_url}/files", json={'name': name, 'mimeType': DRIVE_FOLDER_MIME})
+            self.folder_id = self.check(response, 200).json()['id']
+        return self.folder_id
+
+
+def drive_credentials():
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+
+    token_file = get_setting('drive_token', 'token.json')
+    credentials = Credentials.from_authorized_user_file(token_file, DRIVE_SCOPES) if os.path.exists(token_file) else None
+    if credentials and credentials.valid:
+        return credentials
+    if credentials and credentials.expired and credentials.refresh_token:
+        credentials.refresh(Request())
+    else:
+        from google_auth_oauthlib.flow import InstalledAppFlow
+        # Izin pertama kali dibuka di browser, token disimpan agar backup berikutnya berjalan tanpa ditanya
+        flow = InstalledAppFlow.from_client_secrets_file(get_setting('drive_credentials', 'credentials.json'), DRIVE_SCOPES)
+        credentials = flow.run_local_server(port=0)
+    with open(token_file, 'w') as f:
+        f.write(credentials.to_json())
+    return credentials
+
+
+def open_storage():
+    # Tanpa pengaturan backup_storage backup hanya disimpan di folder lokal
+    kind = get_setting('backup_storage')
+    if kind == 'local':
+        return LocalDirectoryStorage(get_setting('backup_storage_dir', os.path.join('backup', 'remote')))
+    if kind == 'drive':
+        from google.auth.transport.requests import AuthorizedSession
+
+        storage = GoogleDriveStorage(AuthorizedSession(drive_credentials()), get_setting('drive_folder_id'))
+        if not storage.folder_id:
+            storage.ensure_folder(DRIVE_FOLDER_NAME)
+        return storage
+    if kind:
+        raise StorageError(f"Jenis penyimpanan backup tidak dikenal: {kind}")
+    return None
+
+
+def storage_label():
+    return {'drive': 'Google Drive', 'local': 'folder backup kedua'}.get(get_setting('backup_storage'))
+
+
+def read_chunks(path, chunk_size=CHUNK_SIZE):
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(chunk_size)
+            if not data:
+                return
+            yield data
+
+
+class CloudUploader:
+    def __init__(self, storage, state_file=STATE_FILE, sleep=time.sleep):
+        self.storage = storage
+        self.state_file = state_file
+        self.sleep = sleep
+        self.state = self.load_state()
+
+    def load_state(self):
+        # Sesi upload yang terputus disimpan agar bisa dilanjutkan setelah aplikasi dibuka lagi
+        if not os.path.exists(self.state_file):
+            return {}
+        try:
+            with open(self.state_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_state(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_file)), exist_ok=True)
+        temp_path = f"{self.state_file}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(temp_path, self.state_file)
+
+    def backoff(self, attempt):
+        self.sleep(min(BACKOFF_BASE * 2 ** attempt, BACKOFF_MAX) * random.uniform(0.5, 1.0))
+
+    def retry(self, func, *args):
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return func(*args)
+            except TransientStorageError:
+                if attempt == MAX_RETRIES:
+                    raise
+                self.backoff(attempt)
+
+    def resume_offset(self, name, size):
+        session = self.state.get(name)
+        if session:
+            try:
+                return session, self.retry(self.storage.query_upload, session, size)
+            except TransientStorageError:
+                raise
+            except StorageError:
+                pass
+        session = self.retry(self.storage.start_upload, name, size)
+        self.state[name] = session
+        self.save_state()
+        return session, 0
+
+    def upload_object(self, name, data):
+        size = len(data)
+        session, offset = self.resume_offset(name, size)
+        attempt = 0
+        while offset < size or size == 0:
+            block = data[offset:offset + UPLOAD_BLOCK_SIZE]
+            try:
+                new_offset = self.storage.upload_block(session, offset, block, size)
+            except TransientStorageError:
+                if attempt == MAX_RETRIES:
+                    raise
+                self.backoff(attempt)
+                attempt += 1
+                # Posisi yang benar ditanyakan ke server karena blok terakhir mungkin sudah sebagian diterima
+                offset = self.retry(self.storage.query_upload, session, size)
+                continue
+            attempt = 0 if new_offset > offset else attempt
+            offset = new_offset
+            if size == 0:
+                break
+        self.state.pop(name, None)
+        self.save_state()
+
+    def upload_snapshot(self, snapshot_name, files, progress=None):
+        # files: daftar (nama di dalam snapshot, path lokal); manifest diunggah terakhir
+        # sehingga snapshot di penyimpanan selalu lengkap
+        manifest_file = manifest_name(snapshot_name)
+        if manifest_file in self.retry(self.storage.list_names, manifest_file):
+            return {'uploaded': 0, 'skipped': 0, 'uploaded_bytes': 0, 'manifest': manifest_file, 'exists': True}
+        remote_chunks = self.retry(self.storage.list_names, 'chunk_')
+        total = sum(os.path.getsize(path) for _, path in files) or 1
+        done = uploaded = skipped = uploaded_bytes = 0
+        manifest = {'format': MANIFEST_FORMAT, 'snapshot': snapshot_name, 'created_at': datetime.now().isoformat(timespec='seconds'),
+                    'chunk_size': CHUNK_SIZE, 'files': {}}
+        for file_name, path in files:
+            file_hash = hashlib.sha256()
+            chunks = []
+            for data in read_chunks(path):
+                digest = hashlib.sha256(data).hexdigest()
+                file_hash.update(data)
+                chunks.append(digest)
+                if chunk_name(digest) in remote_chunks:
+                    skipped += 1
+                else:
+                    self.upload_object(chunk_name(digest), data)
+                    remote_chunks.add(chunk_name(digest))
+                    uploaded += 1
+                    uploaded_bytes += len(data)
+                done += len(data)
+                if progress:
+                    progress(int(done * 100 / total), f"Mengunggah {file_name} ({done // 1024} / {total // 1024} KB)")
+            manifest['files'][file_name] = {'size': os.path.getsize(path), 'sha256': file_hash.hexdigest(), 'chunks': chunks}
+        self.upload_object(manifest_file, json.dumps(manifest, indent=2).encode('utf-8'))
+        return {'uploaded': uploaded, 'skipped': skipped, 'uploaded_bytes': uploaded_bytes, 'manifest': manifest_file, 'exists': False}
+
+    def download_snapshot(self, snapshot_name, dest_folder):
+        manifest = json.loads(self.retry(self.storage.read, manifest_name(snapshot_name)))
+        paths = []
+        for file_name, entry in manifest['files'].items():
+            path = os.path.join(dest_folder, file_name)
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            file_hash = hashlib.sha256()
+            with open(path + '.part', 'wb') as f:
+                for digest in entry['chunks']:
+                    data = self.retry(self.storage.read, chunk_name(digest))
+                    if hashlib.sha256(data).hexdigest() != digest:
+                        raise StorageError(f"Potongan {digest} rusak")
+                    file_hash.update(data)
+                    f.write(data)
+            if file_hash.hexdigest() != entry['sha256']:
+                raise StorageError(f"Isi {file_name} tidak cocok dengan manifest")
+            os.replace(path + '.part', path)
+            paths.append(path)
+        return paths
+
+
+def snapshot_files(db_path, archive_folder=None):
+    files = [(os.path.basename(db_path), db_path)]
+    if archive_folder and os.path.isdir(archive_folder):
+        for file in sorted(os.listdir(archive_folder)):
+            if file.startswith('archive_') and file.endswith('.db'):
+                files.append((f"arsip/{file}", os.path.join(archive_folder, file)))
+    return files
+
+
+def upload_backup(storage, db_path, archive_folder=None, progress=None):
+    # Nama snapshot diambil dari folder tanggal dan nama file backup lokal, mis. 19-10-2026_project_management.db
+    snapshot_name = f"{os.path.basename(os.path.dirname(os.path.abspath(db_path)))}_{os.path.basename(db_path)}"
+    return CloudUploader(storage).upload_snapshot(snapshot_name, snapshot_files(db_path, archive_folder), progress)
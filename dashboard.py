@@ -0,0 +1,253 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QLabel, QComboBox
+from PyQt5.QtGui import QPainter, QColor, QFont, QPen
+from PyQt5.QtCore import Qt, QThread, QRectF, pyqtSignal
+from datetime import datetime
+from database import open_database
+import json
+import os
+
+CACHE_DIR = 'cache'
+MONTH_LABELS = ["Jan", "Feb", "Mar", "Apr", "Mei", "Jun", "Jul", "Agu", "Sep", "Okt", "Nov", "Des"]
+# Sales dan tukang di luar urutan teratas digabung agar grafik tetap terbaca
+MAX_BARS = 10
+
+
+def short_amount(value):
+    value = int(value or 0)
+    for limit, suffix in ((1000000000000, "T"), (1000000000, "M"), (1000000, "jt"), (1000, "rb")):
+        if abs(value) >= limit:
+            return f"{value / limit:.1f}".rstrip('0').rstrip('.') + f" {suffix}"
+    return str(value)
+
+
+def top_rows(rows):
+    rows = [(name or "-", value or 0) for name, value in rows]
+    if len(rows) <= MAX_BARS:
+        return rows
+    return rows[:MAX_BARS - 1] + [("Lainnya", sum(value for _, value in rows[MAX_BARS - 1:]))]
+
+
+def cache_path(user_id):
+    return os.path.join(CACHE_DIR, f"dashboard_{user_id}.json")
+
+
+def load_cache(user_id):
+    try:
+        with open(cache_path(user_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cache(user_id, data):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    temp_path = cache_path(user_id) + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+    os.replace(temp_path, cache_path(user_id))
+
+
+class BarChart(QWidget):
+    def __init__(self, title, parent=None):
+        super().__init__(parent)
+        self.title = title
+        self.labels = []
+        self.series = []
+        self.format_value = short_amount
+        self.setMinimumHeight(220)
+
+    def set_data(self, labels, series, format_value=short_amount):
+        # series berisi (nama, nilai, warna); beberapa series digambar berdampingan per label
+        self.labels = labels
+        self.series = series
+        self.format_value = format_value
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        rect = QRectF(self.rect()).adjusted(50, 30, -10, -40)
+        text_color = self.palette().color(self.foregroundRole())
+
+        painter.setPen(text_color)
+        painter.setFont(QFont("Arial", 10, QFont.Bold))
+        painter.drawText(QRectF(0, 0, self.width(), 24), Qt.AlignCenter, self.title)
+        painter.setFont(QFont("Arial", 8))
+
+        values = [value for _, series_values, _ in self.series for value in series_values]
+        if not self.labels or not values:
+            painter.drawText(rect, Qt.AlignCenter, "Belum ada data")
+            return
+
+        maximum = max(max(values), 0) or 1
+        minimum = min(min(values), 0)
+        span = maximum - minimum
+        zero_y = rect.bottom() - (0 - minimum) / span * rect.height()
+
+        painter.setPen(QPen(QColor("#7f8c8d"), 1))
+        painter.drawLine(int(rect.left()), int(zero_y), int(rect.right()), int(zero_y))
+        painter.drawText(QRectF(0, rect.top() - 6, 46, 12), Qt.AlignRight | Qt.AlignVCenter, self.format_value(maximum))
+        if minimum < 0:
+            painter.drawText(QRectF(0, rect.bottom() - 6, 46, 12), Qt.AlignRight | Qt.AlignVCenter, self.format_value(minimum))
+
+        slot_width = rect.width() / len(self.labels)
+        bar_width = max(slot_width * 0.8 / len(self.series), 1)
+        for index, label in enumerate(self.labels):
+            slot_left = rect.left() + index * slot_width + slot_width * 0.1
+            for series_index, (_, series_values, color) in enumerate(self.series):
+                value = series_values[index]
+                height = abs(value) / span * rect.height()
+                top = zero_y - height if value >= 0 else zero_y
+                painter.fillRect(QRectF(slot_left + series_index * bar_width, top, bar_width - 1, height), color)
+            painter.setPen(text_color)
+            painter.drawText(QRectF(rect.left() + index * slot_width, rect.bottom() + 4, slot_width, 16),
+                             Qt.AlignCenter, painter.fontMetrics().elidedText(str(label), Qt.ElideRight, int(slot_width)))
+
+        if len(self.series) > 1:
+            legend_x = rect.left()
+            for name, _, color in self.series:
+                painter.fillRect(QRectF(legend_x, self.height() - 14, 10, 10), color)
+                painter.drawText(QRectF(legend_x + 14, self.height() - 17, 150, 16), Qt.AlignLeft | Qt.AlignVCenter, name)
+                legend_x += 160
+
+
+class DashboardWorker(QThread):
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, user_id, year):
+        super().__init__()
+        self.user_id = user_id
+        self.year = year
+
+    def run(self):
+        # Rollup diperbarui dan dibaca di koneksi milik thread ini
+        db = open_database()
+        try:
+            db.refresh_report_rollup()
+            years = db.get_report_years(self.user_id) or [datetime.now().year]
+            year = self.year if self.year in years else years[0]
+            self.result.emit({'years': years, 'data': db.get_dashboard_data(self.user_id, year)})
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            db.close()
+
+
+class DashboardPage(QWidget):
+    data_changed = pyqtSignal(tuple)
+    # Cache per pengguna di memori; salinannya di cache/ dipakai saat aplikasi dibuka lagi
+    _cache = {}
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.user_id = None
+        self.watched_tables = ()
+        self.dirty = True
+        self.worker = None
+        self.pending_refresh = False
+
+        layout = QVBoxLayout(self)
+        header_layout = QHBoxLayout()
+        title_label = QLabel("Dashboard")
+        title_label.setFont(QFont("Arial", 18, QFont.Bold))
+        header_layout.addWidget(title_label)
+        header_layout.addStretch()
+        self.status_label = QLabel("")
+        header_layout.addWidget(self.status_label)
+        header_layout.addWidget(QLabel("Tahun:"))
+        self.year_combo = QComboBox()
+        self.year_combo.currentIndexChanged.connect(self.on_year_changed)
+        header_layout.addWidget(self.year_combo)
+        layout.addLayout(header_layout)
+
+        grid = QGridLayout()
+        self.revenue_chart = BarChart("Pendapatan per Bulan (Total Proyek)")
+        self.commission_chart = BarChart("Komisi Bersih per Sales (Komisi - KB)")
+        self.tukang_chart = BarChart("Jumlah Pekerjaan per Tukang")
+        self.material_chart = BarChart("Biaya Bahan dibanding Total Proyek")
+        grid.addWidget(self.revenue_chart, 0, 0)
+        grid.addWidget(self.commission_chart, 0, 1)
+        grid.addWidget(self.tukang_chart, 1, 0)
+        grid.addWidget(self.material_chart, 1, 1)
+        layout.addLayout(grid)
+
+    def set_user_id(self, user_id, load=True):
+        self.user_id = user_id
+        self.dirty = True
+        if load:
+            self.load_data()
+
+    def mark_dirty(self):
+        self.dirty = True
+
+    def refresh_if_changed(self):
+        # Grafik dari cache langsung tampil, angka terbaru menyusul dari thread latar belakang
+        if self.user_id is None:
+            return False
+        if self.dirty:
+            self.load_data()
+        else:
+            self.start_refresh()
+        return True
+
+    def load_data(self):
+        self.dirty = False
+        cached = DashboardPage._cache.get(self.user_id) or load_cache(self.user_id)
+        if cached:
+            DashboardPage._cache[self.user_id] = cached
+            self.show_data(cached)
+        self.start_refresh()
+
+    def start_refresh(self):
+        if self.worker is not None and self.worker.isRunning():
+            self.pending_refresh = True
+            return
+        self.status_label.setText("Memperbarui...")
+        self.worker = DashboardWorker(self.user_id, self.year_combo.currentData())
+        self.worker.result.connect(self.on_refresh_finished)
+        self.worker.error.connect(self.on_refresh_error)
+        self.worker.finished.connect(self.on_worker_finished)
+        self.worker.start()
+
+    def on_worker_finished(self):
+        if self.pending_refresh:
+            self.pending_refresh = False
+            self.start_refresh()
+
+    def on_refresh_finished(self, result):
+        self.status_label.setText("")
+        if DashboardPage._cache.get(self.user_id) != result:
+            DashboardPage._cache[self.user_id] = result
+            save_cache(self.user_id, result)
+            self.show_data(result)
+
+    def on_refresh_error(self, error_message):
+        self.status_label.setText("Gagal memperbarui dashboard")
+        print(f"Error saat memperbarui dashboard: {error_message}")
+
+    def on_year_changed(self):
+        year = self.year_combo.currentData()
+        cached = DashboardPage._cache.get(self.user_id)
+        if year is not None and cached and cached['data']['year'] != year:
+            self.start_refresh()
+
+    def show_data(self, result):
+        data = result['data']
+        self.year_combo.blockSignals(True)
+        self.year_combo.clear()
+        for year in result['years']:
+            self.year_combo.addItem(str(year), year)
+        if data['year'] in result['years']:
+            self.year_combo.setCurrentIndex(result['years'].index(data['year']))
+        self.year_combo.blockSignals(False)
+
+        self.revenue_chart.set_data(MONTH_LABELS, [("Total Proyek", data['revenue'], QColor("#3498db"))])
+        sales = top_rows(data['sales_commission'])
+        self.commission_chart.set_data([name for name, _ in sales], [("Komisi Bersih", [value for _, value in sales], QColor("#27ae60"))])
+        tukang = top_rows(data['tukang_jobs'])
+        self.tukang_chart.set_data([name for name, _ in tukang], [("Pekerjaan", [value for _, value in tukang], QColor("#e67e22"))], str)
+        self.material_chart.set_data(MONTH_LABELS, [
+            ("Total Proyek", data['revenue'], QColor("#3498db")),
+            ("Biaya Bahan", data['material_cost'], QColor("#e74c3c")),
+        ])
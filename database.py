@@ -1,9 +1,13 @@
 import sqlite3
 from datetime import datetime
-from error_handling import setup_error_handling
 import os
+import re
 import shutil
+import threading
 import uuid
+from urllib.request import pathname2url
+import db_stats
+from settings import get_setting
 
 COLUMN_MAPPINGS = {
     'consumers': {
@@ -35,15 +39,113 @@ COLUMN_MAPPINGS = {
     }
 }
 
+# Tabel buku aktif yang memakai kolom version untuk mendeteksi edit bersamaan
+VERSIONED_TABLES = ('consumers', 'sales_projects', 'worker_projects', 'projects', 'materials_usage')
+# Setiap perubahan pada tabel ini menaikkan counter di table_changes lewat trigger
+TRACKED_TABLES = ('consumers', 'sales', 'sales_projects', 'tukang', 'worker_projects', 'projects', 'materials_usage')
+# Sumber rollup laporan beserta tabel induk (dan kolom penghubungnya) yang namanya ikut dikelompokkan di laporan
+REPORT_SOURCES = {
+    'consumers': None,
+    'sales_projects': ('sales', 'sales_id'),
+    'worker_projects': ('tukang', 'tukang_id'),
+    'materials_usage': ('projects', 'project_id'),
+}
+# Alias tabel sumber di report_source_query
+REPORT_ALIASES = {'consumers': 'c', 'sales_projects': 'p', 'worker_projects': 'p', 'materials_usage': 'm'}
+# Buku yang ditutup dari sumber ini tetap memakai nama sales/tukang terbaru dari tabel induk aktif
+REPORT_LIVE_PARENT_KINDS = ('sales_projects', 'worker_projects')
+# Signature buku yang ditutup; diganti jika rollup buku lama perlu dihitung ulang sekali
+REPORT_CLOSED_SIGNATURE = 'closed:2'
+
+# Jumlah baris per halaman saat buku yang ditutup dimuat bertahap
+CLOSED_BOOK_PAGE_SIZE = 200
+# Buku yang ditutup sebelum (tahun ini - ARCHIVE_KEEP_YEARS) dipindah ke file archive_<tahun>.db
+ARCHIVE_KEEP_YEARS = 1
+# SQLite membatasi jumlah database yang di-ATTACH per koneksi
+MAX_ATTACHED_ARCHIVES = 8
+BOOK_DATE_PATTERN = re.compile(r'_backup_.*?(\d{4})_(\d{1,2})_(\d{1,2})_\d+(?:_projects|_materials)?$')
+
+def amount_sql(column):
+    # Nilai uang disimpan sebagai teks, baik berformat "Rp 1.500.000" maupun angka biasa seperti "600000.00" dari dialog bahan
+    value = f"TRIM(COALESCE({column}, ''))"
+    return f'''(CASE
+        WHEN {value} LIKE '%Rp%' OR {value} LIKE '%,%' OR LENGTH({value}) - LENGTH(REPLACE({value}, '.', '')) > 1 OR {value} GLOB '*.[0-9][0-9][0-9]'
+        THEN CAST(REPLACE(REPLACE(REPLACE({value}, 'Rp', ''), '.', ''), ',', '') AS INTEGER)
+        ELSE CAST(CAST({value} AS REAL) AS INTEGER)
+    END)'''
+
+def date_year_sql(column):
+    return f"CAST(substr({column}, 7, 4) AS INTEGER)"
+
+def date_month_sql(column):
+    return f"CAST(substr({column}, 4, 2) AS INTEGER)"
+
+def report_bucket_sql(kind, row):
+    # (user_id, year, month) satu baris sumber rollup; bulan bahan diambil dari tanggal pemakaian
+    if kind == 'materials_usage':
+        return f"{row}.user_id", date_year_sql(f"{row}.date"), date_month_sql(f"{row}.date")
+    return f"{row}.user_id", f"{row}.year", f"{row}.month"
+
+def archive_path(db_name, archive_file):
+    # File arsip selalu disimpan di folder yang sama dengan database utama
+    return os.path.join(os.path.dirname(os.path.abspath(db_name)), archive_file)
+
+def copy_archives(db_name, destination_folder):
+    # Isi arsip jarang berubah, jadi hanya file yang baru atau berubah yang disalin ke folder backup
+    copied = []
+    source_folder = os.path.dirname(os.path.abspath(db_name))
+    for file_name in sorted(os.listdir(source_folder)):
+        if not re.fullmatch(r'archive_\d{4}\.db', file_name):
+            continue
+        source = os.path.join(source_folder, file_name)
+        destination = os.path.join(destination_folder, file_name)
+        if os.path.exists(destination) and os.path.getsize(destination) == os.path.getsize(source) \
+                and os.path.getmtime(destination) >= os.path.getmtime(source):
+            continue
+        os.makedirs(destination_folder, exist_ok=True)
+        shutil.copy2(source, destination)
+        copied.append(destination)
+    return copied
+
+def open_database(db_name='project_management.db'):
+    # Jika api_url diatur, semua komputer memakai server API bersama (api_server.py) sebagai backend
+    api_url = get_setting('api_url')
+    if api_url:
+        from api_client import RemoteDatabaseManager
+        return RemoteDatabaseManager(api_url, get_setting('api_token'))
+    return DatabaseManager(db_name)
+
+@db_stats.instrument_methods
 class DatabaseManager:
+    # Migrasi cukup dijalankan sekali per file database dalam satu proses
+    _migrated_databases = set()
+    _migration_lock = threading.Lock()
+
     def __init__(self, db_name='project_management.db'):
-        setup_error_handling()
-        self.conn = sqlite3.connect(db_name)
-        self.cursor = self.conn.cursor()
-        self.create_tables()
-        self.check_and_update_closed_books()
-        self.check_and_update_closed_books_photo()
-        self.migrate_materials_usage_table()
+        self.db_name = db_name
+        # uri=True agar file arsip bisa di-ATTACH dengan mode=ro
+        self.conn = sqlite3.connect(db_name, uri=True)
+        self.cursor = db_stats.create_cursor(self.conn)
+        self.attached_archives = set()
+        self.archived_books = set()
+        self.run_migrations()
+
+    def run_migrations(self):
+        db_key = os.path.abspath(self.db_name)
+        with DatabaseManager._migration_lock:
+            if db_key in DatabaseManager._migrated_databases:
+                return
+            self.create_tables()
+            self.create_archive_registry()
+            self.create_photo_moves()
+            self.check_and_update_closed_books()
+            self.check_and_update_closed_books_photo()
+            self.migrate_materials_usage_table()
+            self.create_change_tracking()
+            self.create_report_rollup()
+            self.create_project_summary()
+            self.create_change_log()
+            DatabaseManager._migrated_databases.add(db_key)
 
 
     def check_and_update_closed_books_photo(self):
@@ -92,6 +194,38 @@ class DatabaseManager:
 
         self.conn.commit()
 
+    def create_change_tracking(self):
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS table_changes (
+            table_name TEXT PRIMARY KEY,
+            counter INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+        for table_name in TRACKED_TABLES:
+            self.cursor.execute("INSERT OR IGNORE INTO table_changes (table_name) VALUES (?)", (table_name,))
+            for event in ('INSERT', 'UPDATE', 'DELETE'):
+                self.cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {table_name}_{event.lower()}_changes AFTER {event} ON {table_name}
+                BEGIN
+                    UPDATE table_changes SET counter = counter + 1 WHERE table_name = '{table_name}';
+                END
+                ''')
+        self.conn.commit()
+
+    def get_data_version(self):
+        # data_version berubah saat koneksi lain commit, total_changes saat koneksi ini sendiri menulis
+        self.cursor.execute("PRAGMA data_version")
+        return (self.cursor.fetchone()[0], self.conn.total_changes)
+
+    def get_change_counters(self, table_names):
+        placeholders = ', '.join('?' for _ in table_names)
+        self.cursor.execute(f"SELECT table_name, counter FROM table_changes WHERE table_name IN ({placeholders})", tuple(table_names))
+        return dict(self.cursor.fetchall())
+
+    def get_row_versions(self, table_name, user_id):
+        self.cursor.execute(f"SELECT id, version FROM {table_name} WHERE user_id = ? ORDER BY id", (user_id,))
+        return self.cursor.fetchall()
+
     def column_exists(self, table_name, column_name):
         self.cursor.execute(f"PRAGMA table_info({table_name})")
         columns = [column[1] for column in self.cursor.fetchall()]
@@ -209,6 +343,10 @@ class DatabaseManager:
         
         if not self.column_exists('worker_projects', 'photo_path'):
               self.cursor.execute("ALTER TABLE worker_projects ADD COLUMN photo_path TEXT")
+
+        for table_name in VERSIONED_TABLES:
+            if not self.column_exists(table_name, 'version'):
+                self.cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
         
         # Periksa apakah kolom 'date' sudah ada
         if not self.column_exists('consumers', 'date'):
@@ -243,6 +381,8 @@ class DatabaseManager:
 
             self.cursor.execute("ALTER TABLE consumers_temp RENAME TO consumers")
 
+            self.cursor.execute("ALTER TABLE consumers ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+
             self.conn.commit()
     
     def migrate_materials_usage_table(self):
@@ -279,6 +419,7 @@ class DatabaseManager:
         VALUES (?, ?, ?, ?, ?, ?, ?, ?)
         ''', (project_id, *data, user_id))
         self.conn.commit()
+        return self.cursor.lastrowid
 
     def get_consumers(self, year=None, month=None, user_id=None):
         query = "SELECT * FROM consumers WHERE user_id = ?"
@@ -289,6 +430,16 @@ class DatabaseManager:
         self.cursor.execute(query, params)
         return self.cursor.fetchall()
 
+    def get_consumers_by_ids(self, consumer_ids, user_id):
+        rows = []
+        consumer_ids = list(consumer_ids)
+        for start in range(0, len(consumer_ids), 500):
+            chunk = consumer_ids[start:start + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            self.cursor.execute(f"SELECT * FROM consumers WHERE user_id = ? AND id IN ({placeholders})", (user_id, *chunk))
+            rows.extend(self.cursor.fetchall())
+        return rows
+
     def get_sales_projects(self, year=None, month=None, user_id=None):
         query = "SELECT * FROM sales_projects WHERE user_id = ?"
         params = [user_id]
@@ -300,7 +451,7 @@ class DatabaseManager:
 
     def get_worker_projects(self, tukang_id, user_id):
         self.cursor.execute('''
-        SELECT id, customer_name, address, job, size, kb, notes 
+        SELECT id, customer_name, address, job, size, kb, notes, version
         FROM worker_projects 
         WHERE tukang_id = ? AND user_id = ?
         ''', (tukang_id, user_id))
@@ -319,73 +470,372 @@ class DatabaseManager:
         self.conn.commit()
     
     def close_book_for_person(self, table_name, person_id, user_id):
+        # Backup, photo_path baru dan penghapusan data aktif di-commit bersama; file fotonya
+        # dipindah setelahnya oleh relocate_photos berdasarkan jurnal photo_moves
         current_date = datetime.now()
         year, month, day = current_date.year, current_date.month, current_date.day
-    
-        counter = 1
-        while True:
-            backup_table_name = f"{table_name}_backup_{person_id}_{user_id}_{year}_{month}_{day}_{counter}"
-            self.cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name=?", (backup_table_name,))
-            if not self.cursor.fetchone():
-                break
-            counter += 1
-
-        # Buat backup tabel
-        if table_name == 'sales_projects':
-            self.cursor.execute(f"CREATE TABLE {backup_table_name} AS SELECT * FROM {table_name} WHERE sales_id = ? AND user_id = ?", (person_id, user_id))
-        elif table_name == 'worker_projects':
-            self.cursor.execute(f"CREATE TABLE {backup_table_name} AS SELECT * FROM {table_name} WHERE tukang_id = ? AND user_id = ?", (person_id, user_id))
-
-        # Rename foto folder
-        old_folder = f"foto/{user_id}/sales_projects/{person_id}"
-        new_folder = f"foto/{user_id}/sales_projects/{backup_table_name}"
-        if os.path.exists(old_folder):
-            os.rename(old_folder, new_folder)
-
-        # Update photo_path in backup table
-        self.cursor.execute(f"UPDATE {backup_table_name} SET photo_path = REPLACE(photo_path, ?, ?)", (old_folder, new_folder))
-
-        # Clear data for this person from the original table
-        if table_name == 'sales_projects':
-            self.cursor.execute(f"DELETE FROM {table_name} WHERE sales_id = ? AND user_id = ?", (person_id, user_id))
-        elif table_name == 'worker_projects':
-            self.cursor.execute(f"DELETE FROM {table_name} WHERE tukang_id = ? AND user_id = ?", (person_id, user_id))
-    
-        self.conn.commit()
+        person_column = 'sales_id' if table_name == 'sales_projects' else 'tukang_id'
+
+        self.begin_immediate()
+        try:
+            counter = 1
+            while True:
+                backup_table_name = f"{table_name}_backup_{person_id}_{user_id}_{year}_{month}_{day}_{counter}"
+                if not self.find_book_tables(backup_table_name):
+                    break
+                counter += 1
+
+            # Buat backup tabel
+            self.cursor.execute(f"CREATE TABLE {backup_table_name} AS SELECT {self.backup_columns(table_name)} FROM {table_name} WHERE {person_column} = ? AND user_id = ?", (person_id, user_id))
+
+            # Foto pindah dari folder orang ini ke folder buku
+            old_folder = f"foto/{user_id}/{table_name}/{person_id}"
+            new_folder = f"foto/{user_id}/{table_name}/{backup_table_name}"
+            in_old_folder = "substr(photo_path, 1, ?) IN (?, ?)"
+            folder_params = (len(old_folder) + 1, old_folder + '/', old_folder + '\\')
+            self.cursor.execute(f'''
+            INSERT INTO photo_moves (book_name, old_path, new_path)
+            SELECT ?, photo_path, ? || substr(photo_path, ?) FROM {backup_table_name} WHERE {in_old_folder}
+            ''', (backup_table_name, new_folder, len(old_folder) + 1) + folder_params)
+            self.cursor.execute(f"UPDATE {backup_table_name} SET photo_path = ? || substr(photo_path, ?) WHERE {in_old_folder}",
+                                (new_folder, len(old_folder) + 1) + folder_params)
+
+            # Clear data for this person from the original table
+            self.set_sync_state('close_book', backup_table_name)
+            self.cursor.execute(f"DELETE FROM {table_name} WHERE {person_column} = ? AND user_id = ?", (person_id, user_id))
+            self.set_sync_state('close_book', None)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
         return backup_table_name
 
+    def create_change_log(self):
+        # Setiap perubahan buku aktif dicatat dengan nomor urut agar bisa dikirim ke komputer lain (lihat sync.py)
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            node_id TEXT NOT NULL,
+            changed_at TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL,
+            data TEXT,
+            book TEXT
+        )
+        ''')
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_change_log_row ON change_log (table_name, row_id)")
+        self.cursor.execute("CREATE TABLE IF NOT EXISTS sync_state (key TEXT PRIMARY KEY, value TEXT)")
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_peers (
+            node_id TEXT PRIMARY KEY,
+            imported_seq INTEGER NOT NULL DEFAULT 0,
+            acked_seq INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS sync_ids (
+            node_id TEXT NOT NULL,
+            table_name TEXT NOT NULL,
+            remote_id INTEGER NOT NULL,
+            local_id INTEGER NOT NULL,
+            PRIMARY KEY (node_id, table_name, remote_id)
+        )
+        ''')
+
+        # node_id milik database, bukan komputer: satu file yang dibuka beberapa PC lewat folder bersama tetap satu node
+        if self.get_sync_state('node_id') is None:
+            self.set_sync_state('node_id', uuid.uuid4().hex)
+
+        # Trigger dibuat ulang agar kolom hasil migrasi terbaru ikut tercatat
+        for table_name in TRACKED_TABLES:
+            for event, row in (('INSERT', 'NEW'), ('UPDATE', 'NEW'), ('DELETE', 'OLD')):
+                data = ', '.join(f"'{column}', {row}.\"{column}\"" for column in self.get_table_columns(table_name))
+                book = "(SELECT value FROM sync_state WHERE key = 'close_book')" if event == 'DELETE' else 'NULL'
+                self.cursor.execute(f"DROP TRIGGER IF EXISTS {table_name}_{event.lower()}_log")
+                self.cursor.execute(f'''
+                CREATE TRIGGER {table_name}_{event.lower()}_log AFTER {event} ON {table_name}
+                BEGIN
+                    INSERT INTO change_log (node_id, changed_at, table_name, row_id, op, data, book)
+                    VALUES (COALESCE((SELECT value FROM sync_state WHERE key = 'apply_node'), (SELECT value FROM sync_state WHERE key = 'node_id')),
+                            COALESCE((SELECT value FROM sync_state WHERE key = 'apply_time'), strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+                            '{table_name}', {row}.id, '{event.lower()}', json_object({data}), {book});
+                END
+                ''')
+        self.conn.commit()
+
+    def reset_node_id(self):
+        # Dipanggil sekali pada salinan database yang akan dipakai di komputer lain;
+        # isi salinan sudah sama dengan database asal sampai nomor urut terakhir
+        self.begin_immediate()
+        try:
+            self.cursor.execute('''
+            INSERT OR REPLACE INTO sync_peers (node_id, imported_seq, acked_seq)
+            SELECT ?, COALESCE(MAX(seq), 0), 0 FROM change_log
+            ''', (self.get_sync_state('node_id'),))
+            node_id = uuid.uuid4().hex
+            self.set_sync_state('node_id', node_id)
+            self.set_sync_state('node_host', None)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return node_id
+
+    def get_sync_state(self, key):
+        self.cursor.execute("SELECT value FROM sync_state WHERE key = ?", (key,))
+        result = self.cursor.fetchone()
+        return result[0] if result else None
+
+    def set_sync_state(self, key, value):
+        # close_book, apply_node dan apply_time hanya diisi di dalam transaksi lalu dihapus lagi sebelum commit
+        if value is None:
+            self.cursor.execute("DELETE FROM sync_state WHERE key = ?", (key,))
+        else:
+            self.cursor.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, value))
+
+    def begin_immediate(self):
+        # Kunci tulis diambil di awal agar nama buku yang dipilih tidak bentrok dengan penulis lain
+        if self.conn.in_transaction:
+            self.conn.commit()
+        self.cursor.execute("BEGIN IMMEDIATE")
+
+    def create_photo_moves(self):
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS photo_moves (
+            id INTEGER PRIMARY KEY,
+            book_name TEXT NOT NULL,
+            old_path TEXT NOT NULL,
+            new_path TEXT NOT NULL
+        )
+        ''')
+        self.conn.commit()
+
+    def count_photo_moves(self):
+        self.cursor.execute("SELECT COUNT(*) FROM photo_moves")
+        return self.cursor.fetchone()[0]
+
+    def relocate_photos(self, limit=None, after_id=0):
+        # Aman diulang setelah crash: file yang sudah ada di tujuan hanya dihapus dari jurnal.
+        # File yang gagal dipindah (mis. masih dikunci) tetap di jurnal dan dicoba lagi lain kali
+        query = "SELECT id, old_path, new_path FROM photo_moves WHERE id > ? ORDER BY id"
+        if limit:
+            query += f" LIMIT {int(limit)}"
+        self.cursor.execute(query, (after_id,))
+        moves = self.cursor.fetchall()
+        failures = []
+        for move_id, old_path, new_path in moves:
+            try:
+                if os.path.exists(old_path) and not os.path.exists(new_path):
+                    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+                    os.replace(old_path, new_path)
+                    old_folder = os.path.dirname(old_path)
+                    if os.path.isdir(old_folder) and not os.listdir(old_folder):
+                        os.rmdir(old_folder)
+            except OSError as e:
+                failures.append((old_path, str(e)))
+                continue
+            self.cursor.execute("DELETE FROM photo_moves WHERE id = ?", (move_id,))
+        self.conn.commit()
+        # id terakhir dipakai sebagai awal batch berikutnya agar file yang gagal tidak diambil berulang
+        return (moves[-1][0] if moves else None), len(moves), failures
+
 
     def get_closed_books_for_person(self, table_name, person_id, user_id):
-        self.cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name LIKE '{table_name}_backup_{person_id}_{user_id}_%'")
-        return [row[0] for row in self.cursor.fetchall()]
+        return self.find_book_tables(f"{table_name}_backup_{person_id}_{user_id}_%")
 
     def close_book(self, table_name, user_id):
         current_date = datetime.now()
         year, month, day = current_date.year, current_date.month, current_date.day
-    
-        # Dapatkan jumlah backup yang sudah ada untuk bulan ini
-        self.cursor.execute(f"SELECT COUNT(*) FROM sqlite_master WHERE type='table' AND name LIKE '{table_name}_backup_{user_id}_{year}_{month}%'")
-        count = self.cursor.fetchone()[0] + 1
-    
-        # Buat nama tabel backup baru
-        backup_table_name = f"{table_name}_backup_{user_id}_{year}_{month}_{day}_{count}"
-    
-        # Buat backup tabel
-        self.cursor.execute(f"CREATE TABLE {backup_table_name} AS SELECT * FROM {table_name} WHERE user_id = ?", (user_id,))
-    
-        # Clear original table
-        self.cursor.execute(f"DELETE FROM {table_name} WHERE user_id = ?", (user_id,))
-    
-        self.conn.commit()
+
+        self.begin_immediate()
+        try:
+            # Dapatkan jumlah backup yang sudah ada untuk bulan ini
+            count = len(self.find_book_tables(f"{table_name}_backup_{user_id}_{year}_{month}%")) + 1
+
+            # Buat nama tabel backup baru
+            backup_table_name = f"{table_name}_backup_{user_id}_{year}_{month}_{day}_{count}"
+
+            # Buat backup tabel
+            self.cursor.execute(f"CREATE TABLE {backup_table_name} AS SELECT {self.backup_columns(table_name)} FROM {table_name} WHERE user_id = ?", (user_id,))
+
+            # Clear original table
+            self.set_sync_state('close_book', backup_table_name)
+            self.cursor.execute(f"DELETE FROM {table_name} WHERE user_id = ?", (user_id,))
+            self.set_sync_state('close_book', None)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
         return backup_table_name
     
+    def backup_columns(self, table_name):
+        # Kolom version hanya untuk data aktif, buku yang ditutup tetap berbentuk sama seperti sebelumnya
+        return ', '.join(f'"{column}"' for column in self.get_table_columns(table_name) if column != 'version')
+
+    def get_row_version(self, table_name, record_id, user_id):
+        self.cursor.execute(f"SELECT version FROM {table_name} WHERE id = ? AND user_id = ?", (record_id, user_id))
+        result = self.cursor.fetchone()
+        return result[0] if result else None
+
     def get_closed_books(self, table_name, user_id):
-        self.cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name LIKE '{table_name}_backup_{user_id}_%'")
-        return [row[0] for row in self.cursor.fetchall()]
+        return self.find_book_tables(f"{table_name}_backup_{user_id}_%")
+
+    def find_book_tables(self, pattern):
+        # Buku yang sudah dipindah ke file arsip tetap ikut terdaftar, urut dari yang lama
+        self.cursor.execute("SELECT name FROM archived_books WHERE name LIKE ? ORDER BY rowid", (pattern,))
+        names = [row[0] for row in self.cursor.fetchall()]
+        self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE ?", (pattern,))
+        return names + [row[0] for row in self.cursor.fetchall() if row[0] not in names]
+
+    def create_archive_registry(self):
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS archived_books (
+            name TEXT PRIMARY KEY,
+            archive_file TEXT NOT NULL,
+            archived_at TEXT NOT NULL
+        )
+        ''')
+        self.conn.commit()
+
+    def get_archive_file(self, backup_table_name):
+        self.cursor.execute("SELECT archive_file FROM archived_books WHERE name = ?", (backup_table_name,))
+        result = self.cursor.fetchone()
+        return result[0] if result else None
+
+    def open_archived_book(self, backup_table_name):
+        # File arsip dipasang read-only ke koneksi ini saat bukunya pertama kali dibaca;
+        # setelah itu nama tabel tanpa prefix schema otomatis ditemukan SQLite di database arsip
+        if backup_table_name in self.archived_books:
+            return True
+        archive_file = self.get_archive_file(backup_table_name)
+        if archive_file is None:
+            return False
+        schema = os.path.splitext(archive_file)[0]
+        if schema not in self.attached_archives:
+            if len(self.attached_archives) >= MAX_ATTACHED_ARCHIVES:
+                self.detach_archives()
+            uri = 'file:' + pathname2url(archive_path(self.db_name, archive_file)) + '?mode=ro'
+            self.cursor.execute(f"ATTACH DATABASE ? AS {schema}", (uri,))
+            self.attached_archives.add(schema)
+        self.archived_books.add(backup_table_name)
+        return True
+
+    def detach_archives(self):
+        for schema in self.attached_archives:
+            self.cursor.execute(f"DETACH DATABASE {schema}")
+        self.attached_archives.clear()
+        self.archived_books.clear()
+
+    def archive_closed_books(self, before_year=None):
+        # Buku yang ditutup sebelum before_year dipindah ke archive_<tahun>.db per tahun tutup buku.
+        # Salinan di arsip di-commit dulu, baru tabel di database utama dihapus, jadi jika terputus di tengah
+        # buku hanya ada dua kali dan perintah ini cukup dijalankan ulang.
+        if before_year is None:
+            before_year = datetime.now().year - ARCHIVE_KEEP_YEARS
+        books_by_year = {}
+        self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name LIKE '%\\_backup\\_%' ESCAPE '\\'")
+        for (name,) in self.cursor.fetchall():
+            match = BOOK_DATE_PATTERN.search(name)
+            if match and int(match.group(1)) < before_year:
+                books_by_year.setdefault(int(match.group(1)), []).append(name)
+        if not books_by_year:
+            return []
+
+        # Rollup laporan buku lama disimpan dulu agar tetap ada tanpa membaca arsip
+        self.refresh_report_rollup()
+        self.detach_archives()
+        archived = []
+        for year, names in sorted(books_by_year.items()):
+            archive_file = f"archive_{year}.db"
+            self.cursor.execute("ATTACH DATABASE ? AS archive_target", (archive_path(self.db_name, archive_file),))
+            try:
+                self.cursor.execute("BEGIN")
+                for name in names:
+                    self.cursor.execute(f'DROP TABLE IF EXISTS archive_target."{name}"')
+                    self.cursor.execute(f'CREATE TABLE archive_target."{name}" AS SELECT * FROM main."{name}"')
+                self.conn.commit()
+
+                self.cursor.execute("BEGIN")
+                for name in names:
+                    self.cursor.execute(f'SELECT (SELECT COUNT(*) FROM main."{name}") = (SELECT COUNT(*) FROM archive_target."{name}")')
+                    if not self.cursor.fetchone()[0]:
+                        raise sqlite3.DatabaseError(f"Jumlah baris {name} di arsip tidak sama")
+                    self.cursor.execute("INSERT OR REPLACE INTO archived_books (name, archive_file, archived_at) VALUES (?, ?, ?)",
+                                        (name, archive_file, datetime.now().isoformat(timespec='seconds')))
+                    self.cursor.execute(f'DROP TABLE main."{name}"')
+                self.conn.commit()
+            except sqlite3.Error:
+                self.conn.rollback()
+                raise
+            finally:
+                self.cursor.execute("DETACH DATABASE archive_target")
+            archived.extend(names)
+        return archived
 
     def load_closed_book(self, backup_table_name):
-        self.cursor.execute(f"SELECT * FROM {backup_table_name}")
+        self.open_archived_book(backup_table_name)
+        self.cursor.execute(f'SELECT * FROM "{backup_table_name}" ORDER BY rowid')
         return self.cursor.fetchall()
+
+    def get_closed_book_row(self, backup_table_name, rowid):
+        # rowid disimpan di item tabel riwayat saat halaman dimuat, jadi cukup satu baris yang dibaca
+        self.open_archived_book(backup_table_name)
+        self.cursor.execute(f'SELECT * FROM "{backup_table_name}" WHERE rowid = ?', (rowid,))
+        return self.cursor.fetchone()
+
+    def get_closed_book_record(self, backup_table_name, record_id):
+        self.open_archived_book(backup_table_name)
+        self.cursor.execute(f'SELECT * FROM "{backup_table_name}" WHERE id = ? LIMIT 1', (record_id,))
+        return self.cursor.fetchone()
+
+    def get_closed_book_counter(self, backup_table_name):
+        self.cursor.execute("SELECT counter FROM table_changes WHERE table_name = ?", (backup_table_name,))
+        result = self.cursor.fetchone()
+        return result[0] if result else 0
+
+    def touch_closed_book(self, backup_table_name):
+        self.cursor.execute("INSERT OR IGNORE INTO table_changes (table_name) VALUES (?)", (backup_table_name,))
+        self.cursor.execute("UPDATE table_changes SET counter = counter + 1 WHERE table_name = ?", (backup_table_name,))
+        return self.get_closed_book_counter(backup_table_name)
+
+    def load_closed_book_page(self, backup_table_name, after_rowid=0, limit=CLOSED_BOOK_PAGE_SIZE, project_id=None, with_rowid=False):
+        # Keyset memakai rowid karena tabel hasil CREATE TABLE AS tidak punya index pada kolom id
+        self.open_archived_book(backup_table_name)
+        query = f'SELECT rowid, * FROM "{backup_table_name}" WHERE rowid > ?'
+        params = [after_rowid]
+        if project_id is not None:
+            query += " AND project_id = ?"
+            params.append(project_id)
+        query += " ORDER BY rowid LIMIT ?"
+        self.cursor.execute(query, params + [limit])
+        rows = self.cursor.fetchall()
+        return [row if with_rowid else row[1:] for row in rows], (rows[-1][0] if rows else after_rowid)
+
+    def iter_closed_book(self, backup_table_name, page_size=CLOSED_BOOK_PAGE_SIZE, project_id=None, with_rowid=False):
+        # Setiap halaman adalah query tersendiri, jadi tidak ada transaksi baca yang tertahan di antara halaman
+        after_rowid = 0
+        while True:
+            rows, after_rowid = self.load_closed_book_page(backup_table_name, after_rowid, page_size, project_id, with_rowid)
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+
+    def get_closed_book_totals(self, backup_table_name, columns):
+        self.open_archived_book(backup_table_name)
+        self.cursor.execute(f'SELECT {", ".join(f"COALESCE(SUM({amount_sql(column)}), 0)" for column in columns)} FROM "{backup_table_name}"')
+        return self.cursor.fetchone()
+
+    def get_closed_material_summaries(self, backup_name, project_id=None):
+        self.open_archived_book(f"{backup_name}_materials")
+        query = f'SELECT project_id, COUNT(*), COALESCE(SUM({amount_sql("total")}), 0) FROM "{backup_name}_materials"'
+        params = []
+        if project_id is not None:
+            query += " WHERE project_id = ?"
+            params.append(project_id)
+        self.cursor.execute(query + " GROUP BY project_id", params)
+        return {row[0]: row[1:] for row in self.cursor.fetchall()}
     
     def add_to_closed_book(self, backup_table_name, data, photo_path=None, user_id=None, person_id=None):
         table_name = backup_table_name.split('_backup_')[0]
@@ -414,6 +864,8 @@ class DatabaseManager:
             new_photo_path = self.save_project_photo(user_id, person_id, mapped_data['customer_name'], photo_path, is_tukang='worker' in table_name, is_history=True, backup_table_name=backup_table_name)
             self.cursor.execute(f'UPDATE "{backup_table_name}" SET photo_path = ? WHERE id = ?', (new_photo_path, new_id))
 
+        self.invalidate_report_source(backup_table_name)
+        self.touch_closed_book(backup_table_name)
         self.conn.commit()
         return new_id
 
@@ -440,28 +892,38 @@ class DatabaseManager:
             new_photo_path = self.save_project_photo(user_id, person_id, mapped_data['customer_name'], photo_path, is_tukang='worker' in table_name, is_history=True, backup_table_name=backup_table_name)
             self.cursor.execute(f'UPDATE "{backup_table_name}" SET photo_path = ? WHERE id = ?', (new_photo_path, record_id))
 
+        self.invalidate_report_source(backup_table_name)
+        self.touch_closed_book(backup_table_name)
         self.conn.commit()
 
     def delete_from_closed_book(self, backup_table_name, record_id):
         query = f"DELETE FROM {backup_table_name} WHERE id = ?"
         self.cursor.execute(query, (record_id,))
+        self.invalidate_report_source(backup_table_name)
+        self.touch_closed_book(backup_table_name)
         self.conn.commit()
     
-    def update_consumer(self, consumer_id, data, user_id):
+    def update_consumer(self, consumer_id, data, user_id, expected_version=None):
+        # Mengembalikan False jika baris sudah diubah instance lain (version tidak cocok)
         self.cursor.execute('''
         UPDATE consumers
-        SET date=?, name=?, address=?, sales=?, job=?, total_projects=?, worker=?, notes=?
-        WHERE id=? AND user_id=?
-        ''', (*data, consumer_id, user_id))
+        SET date=?, name=?, address=?, sales=?, job=?, total_projects=?, worker=?, notes=?, version=version + 1
+        WHERE id=? AND user_id=? AND (? IS NULL OR version=?)
+        ''', (*data, consumer_id, user_id, expected_version, expected_version))
+        updated = self.cursor.rowcount > 0
         self.conn.commit()
+        return updated
 
 
-    def update_sales_project(self, project_id, data, user_id, photo_path=None):
+    def update_sales_project(self, project_id, data, user_id, photo_path=None, expected_version=None):
         self.cursor.execute('''
         UPDATE sales_projects
-        SET customer_name=?, address=?, job=?, total_project=?, commission=?, kb=?, notes=?
-        WHERE id=? AND user_id=?
-        ''', (*data, project_id, user_id))
+        SET customer_name=?, address=?, job=?, total_project=?, commission=?, kb=?, notes=?, version=version + 1
+        WHERE id=? AND user_id=? AND (? IS NULL OR version=?)
+        ''', (*data, project_id, user_id, expected_version, expected_version))
+        if self.cursor.rowcount == 0:
+            self.conn.commit()
+            return False
 
         if photo_path:
             # Get the current photo path
@@ -483,34 +945,43 @@ class DatabaseManager:
                 ''', (new_photo_path, project_id))
 
         self.conn.commit()
+        return True
 
-    def update_worker_project(self, project_id, data, user_id, photo_path=None):
+    def update_worker_project(self, project_id, data, user_id, photo_path=None, expected_version=None):
         self.cursor.execute('''
-        UPDATE worker_projects SET customer_name=?, address=?, job=?, size=?, kb=?, notes=?
-        WHERE id=? AND user_id=?
-        ''', (*data, project_id, user_id))
+        UPDATE worker_projects SET customer_name=?, address=?, job=?, size=?, kb=?, notes=?, version=version + 1
+        WHERE id=? AND user_id=? AND (? IS NULL OR version=?)
+        ''', (*data, project_id, user_id, expected_version, expected_version))
+        if self.cursor.rowcount == 0:
+            self.conn.commit()
+            return False
         if photo_path:
             new_photo_path = self.save_project_photo(user_id, data[0], data[1], photo_path, is_tukang=True)
             self.cursor.execute('''
             UPDATE worker_projects SET photo_path = ? WHERE id = ?
             ''', (new_photo_path, project_id))
         self.conn.commit()
+        return True
 
-    def update_material_usage(self, material_id, data, user_id):
+    def update_material_usage(self, material_id, data, user_id, expected_version=None):
         self.cursor.execute('''
         UPDATE materials_usage
-        SET date=?, item_name=?, quantity=?, unit_price=?, total=?, notes=?
-        WHERE id=? AND user_id=?
-        ''', (*data, material_id, user_id))
+        SET date=?, item_name=?, quantity=?, unit_price=?, total=?, notes=?, version=version + 1
+        WHERE id=? AND user_id=? AND (? IS NULL OR version=?)
+        ''', (*data, material_id, user_id, expected_version, expected_version))
+        updated = self.cursor.rowcount > 0
         self.conn.commit()
+        return updated
     
-    def update_project(self, data, user_id):
+    def update_project(self, data, user_id, expected_version=None):
         self.cursor.execute('''
         UPDATE projects
-        SET name=?, sales_name=?, worker_name=?, start_date=?, end_date=?, total_project=?, dp=?
-        WHERE id=? AND user_id=?
-        ''', (*data, user_id))
+        SET name=?, sales_name=?, worker_name=?, start_date=?, end_date=?, total_project=?, dp=?, version=version + 1
+        WHERE id=? AND user_id=? AND (? IS NULL OR version=?)
+        ''', (*data, user_id, expected_version, expected_version))
+        updated = self.cursor.rowcount > 0
         self.conn.commit()
+        return updated
     
     def update_sales_project_photo(self, project_id, photo_path, user_id):
        self.cursor.execute('''
@@ -530,6 +1001,7 @@ class DatabaseManager:
         self.conn.commit()
 
     def get_table_columns(self, table_name):
+        self.open_archived_book(table_name)
         self.cursor.execute(f"PRAGMA table_info({table_name})")
         return [column[1] for column in self.cursor.fetchall()]
 
@@ -633,7 +1105,7 @@ class DatabaseManager:
 
     def get_sales_projects(self, sales_id, user_id):
         self.cursor.execute('''
-        SELECT id, customer_name, address, job, total_project, commission, kb, notes 
+        SELECT id, customer_name, address, job, total_project, commission, kb, notes, version
         FROM sales_projects 
         WHERE sales_id = ? AND user_id = ?
         ''', (sales_id, user_id))
@@ -676,7 +1148,21 @@ class DatabaseManager:
         result = self.cursor.fetchone()
         return result[0] if result else None
     
-    def backup_projects_and_materials(self, user_id, backup_name):
+    def close_materials_book(self, user_id):
+        # Backup dan penghapusan proyek serta bahan dalam satu transaksi
+        self.begin_immediate()
+        try:
+            backup_name = self.backup_projects_and_materials(user_id, None, commit=False)
+            self.set_sync_state('close_book', backup_name)
+            self.clear_projects_and_materials(user_id, commit=False)
+            self.set_sync_state('close_book', None)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        return backup_name
+
+    def backup_projects_and_materials(self, user_id, backup_name, commit=True):
         current_date = datetime.now().strftime("%Y_%m_%d")
         base_name = f"materials_backup_{user_id}_{current_date}"
         
@@ -685,27 +1171,27 @@ class DatabaseManager:
             unique_backup_name = f"{base_name}_{count}"
             
             # Check if a table with this name already exists
-            self.cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{unique_backup_name}_projects'")
-            if not self.cursor.fetchone():
+            if not self.find_book_tables(f"{unique_backup_name}_projects"):
                 break
             count += 1
 
         # Backup projects
         self.cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS {unique_backup_name}_projects AS
-        SELECT * FROM projects WHERE user_id = ?
+        SELECT {self.backup_columns('projects')} FROM projects WHERE user_id = ?
         ''', (user_id,))
 
         # Backup materials_usage
         self.cursor.execute(f'''
         CREATE TABLE IF NOT EXISTS {unique_backup_name}_materials AS
-        SELECT * FROM materials_usage WHERE project_id IN (SELECT id FROM projects WHERE user_id = ?)
+        SELECT {self.backup_columns('materials_usage')} FROM materials_usage WHERE project_id IN (SELECT id FROM projects WHERE user_id = ?)
         ''', (user_id,))
 
-        self.conn.commit()
+        if commit:
+            self.conn.commit()
         return unique_backup_name
 
-    def clear_projects_and_materials(self, user_id):
+    def clear_projects_and_materials(self, user_id, commit=True):
         # Clear materials_usage for the user's projects
         self.cursor.execute('''
         DELETE FROM materials_usage 
@@ -714,13 +1200,12 @@ class DatabaseManager:
     
         # Clear projects
         self.cursor.execute("DELETE FROM projects WHERE user_id = ?", (user_id,))
-    
-        self.conn.commit()
+
+        if commit:
+            self.conn.commit()
 
     def get_backup_books(self, user_id):
-        self.cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name LIKE 'materials_backup_{user_id}_%_projects'")
-    
-        backup_names = [row[0][:-9] for row in self.cursor.fetchall()]  # Menghapus '_projects' suffix
+        backup_names = [name[:-9] for name in self.find_book_tables(f"materials_backup_{user_id}_%_projects")]  # Menghapus '_projects' suffix
         unique_backups = sorted(set(backup_names), reverse=True)
 
         return unique_backups
@@ -730,6 +1215,8 @@ class DatabaseManager:
         return self.cursor.fetchone()[0]
 
     def load_backup_book(self, backup_name):
+        self.open_archived_book(f"{backup_name}_projects")
+        self.open_archived_book(f"{backup_name}_materials")
         # Load projects
         self.cursor.execute(f"SELECT * FROM {backup_name}_projects")
         projects = self.cursor.fetchall()
@@ -740,5 +1227,351 @@ class DatabaseManager:
 
         return projects, materials
 
+    def create_project_summary(self):
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='project_summary'")
+        exists = self.cursor.fetchone() is not None
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS project_summary (
+            project_id INTEGER PRIMARY KEY,
+            user_id INTEGER,
+            material_count INTEGER NOT NULL DEFAULT 0,
+            material_cost INTEGER NOT NULL DEFAULT 0,
+            total_project INTEGER NOT NULL DEFAULT 0,
+            profit INTEGER NOT NULL DEFAULT 0
+        )
+        ''')
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_materials_usage_project ON materials_usage (project_id)")
+
+        # Ringkasan dijaga trigger sehingga biaya dan keuntungan proyek bisa dibaca tanpa menjumlah ulang bahan
+        new_total = amount_sql('NEW.total')
+        old_total = amount_sql('OLD.total')
+        self.cursor.executescript(f'''
+        CREATE TRIGGER IF NOT EXISTS projects_summary_insert AFTER INSERT ON projects
+        BEGIN
+            INSERT OR REPLACE INTO project_summary (project_id, user_id, material_count, material_cost, total_project, profit)
+            SELECT NEW.id, NEW.user_id, COUNT(m.id), COALESCE(SUM({amount_sql('m.total')}), 0), {amount_sql('NEW.total_project')},
+                   {amount_sql('NEW.total_project')} - COALESCE(SUM({amount_sql('m.total')}), 0)
+            FROM materials_usage m WHERE m.project_id = NEW.id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS projects_summary_update AFTER UPDATE OF total_project, user_id ON projects
+        BEGIN
+            UPDATE project_summary SET user_id = NEW.user_id, total_project = {amount_sql('NEW.total_project')},
+                   profit = {amount_sql('NEW.total_project')} - material_cost
+            WHERE project_id = NEW.id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS projects_summary_delete AFTER DELETE ON projects
+        BEGIN
+            DELETE FROM project_summary WHERE project_id = OLD.id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS materials_summary_insert AFTER INSERT ON materials_usage
+        BEGIN
+            UPDATE project_summary SET material_count = material_count + 1, material_cost = material_cost + {new_total},
+                   profit = profit - {new_total}
+            WHERE project_id = NEW.project_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS materials_summary_update AFTER UPDATE OF total, project_id ON materials_usage
+        BEGIN
+            UPDATE project_summary SET material_count = material_count - 1, material_cost = material_cost - {old_total},
+                   profit = profit + {old_total}
+            WHERE project_id = OLD.project_id;
+            UPDATE project_summary SET material_count = material_count + 1, material_cost = material_cost + {new_total},
+                   profit = profit - {new_total}
+            WHERE project_id = NEW.project_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS materials_summary_delete AFTER DELETE ON materials_usage
+        BEGIN
+            UPDATE project_summary SET material_count = material_count - 1, material_cost = material_cost - {old_total},
+                   profit = profit + {old_total}
+            WHERE project_id = OLD.project_id;
+        END;
+        ''')
+
+        if not exists:
+            self.cursor.execute(f'''
+            INSERT INTO project_summary (project_id, user_id, material_count, material_cost, total_project, profit)
+            SELECT p.id, p.user_id, COUNT(m.id), COALESCE(SUM({amount_sql('m.total')}), 0), {amount_sql('p.total_project')},
+                   {amount_sql('p.total_project')} - COALESCE(SUM({amount_sql('m.total')}), 0)
+            FROM projects p LEFT JOIN materials_usage m ON m.project_id = p.id
+            GROUP BY p.id
+            ''')
+        self.conn.commit()
+
+    def get_project_summaries(self, user_id):
+        self.cursor.execute("SELECT project_id, material_count, material_cost, profit FROM project_summary WHERE user_id = ?", (user_id,))
+        return {row[0]: row[1:] for row in self.cursor.fetchall()}
+
+    def get_project_summary(self, project_id):
+        self.cursor.execute("SELECT material_count, material_cost, profit FROM project_summary WHERE project_id = ?", (project_id,))
+        return self.cursor.fetchone()
+
+    def create_report_rollup(self):
+        # report_rollup_monthly berisi angka yang sama tanpa rincian sales/tukang untuk ringkasan per bulan
+        for table_name in ('report_rollup', 'report_rollup_monthly'):
+            self.cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                user_id INTEGER,
+                year INTEGER,
+                month INTEGER,
+                sales TEXT,
+                tukang TEXT,
+                kind TEXT,
+                source TEXT,
+                record_count INTEGER,
+                total_project INTEGER,
+                commission INTEGER,
+                kb INTEGER,
+                material_cost INTEGER,
+                PRIMARY KEY (user_id, year, month, sales, tukang, source)
+            )
+            ''')
+            self.cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table_name}_source ON {table_name} (source)")
+        # signature 'live' berarti tabel aktif sudah dihitung penuh sekali, buku yang ditutup cukup dihitung sekali
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_rollup_sources (
+            source TEXT PRIMARY KEY,
+            signature TEXT
+        )
+        ''')
+        # Bulan (per user) yang berubah sejak refresh terakhir, diisi trigger; hanya bulan ini yang dihitung ulang
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_rollup_dirty (
+            source TEXT,
+            user_id INTEGER,
+            year INTEGER,
+            month INTEGER,
+            PRIMARY KEY (source, user_id, year, month)
+        )
+        ''')
+        # Sales/tukang yang ada di tiap buku yang ditutup, agar rollup buku itu dihitung ulang saat namanya berubah
+        self.cursor.execute('''
+        CREATE TABLE IF NOT EXISTS report_rollup_people (
+            source TEXT,
+            kind TEXT,
+            person_id INTEGER,
+            PRIMARY KEY (source, person_id)
+        )
+        ''')
+        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_report_rollup_people_person ON report_rollup_people (kind, person_id)")
+        for kind, parent in REPORT_SOURCES.items():
+            for event, rows in (('INSERT', ('NEW',)), ('UPDATE', ('OLD', 'NEW')), ('DELETE', ('OLD',))):
+                marks = ''.join(f'''
+                    INSERT OR IGNORE INTO report_rollup_dirty (source, user_id, year, month)
+                    VALUES ('{kind}', {', '.join(report_bucket_sql(kind, row))});''' for row in rows)
+                self.cursor.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS {kind}_{event.lower()}_rollup AFTER {event} ON {kind}
+                BEGIN{marks}
+                END
+                ''')
+            if parent is None:
+                continue
+            # Nama sales/tukang/proyek ikut dikelompokkan, jadi perubahan induk menandai bulan semua baris anaknya
+            # dan membatalkan rollup buku yang ditutup yang memuat orang itu
+            parent_table, parent_column = parent
+            for event in ('UPDATE', 'DELETE'):
+                self.cursor.execute(f"DROP TRIGGER IF EXISTS {parent_table}_{event.lower()}_rollup")
+                self.cursor.execute(f'''
+                CREATE TRIGGER {parent_table}_{event.lower()}_rollup AFTER {event} ON {parent_table}
+                BEGIN
+                    INSERT OR IGNORE INTO report_rollup_dirty (source, user_id, year, month)
+                    SELECT '{kind}', {', '.join(report_bucket_sql(kind, kind))} FROM {kind} WHERE {parent_column} = OLD.id;
+                    DELETE FROM report_rollup_sources WHERE source IN (
+                        SELECT source FROM report_rollup_people WHERE kind = '{kind}' AND person_id = OLD.id);
+                END
+                ''')
+        self.conn.commit()
+
+    def report_source_query(self, kind, source, dirty_only=False):
+        where = ''
+        if dirty_only:
+            user_id, year, month = report_bucket_sql(kind, REPORT_ALIASES[kind])
+            where = f'''WHERE EXISTS (SELECT 1 FROM report_rollup_dirty d WHERE d.source = '{kind}'
+                     AND d.user_id IS {user_id} AND d.year IS {year} AND d.month IS {month})'''
+        if kind == 'consumers':
+            return f'''
+            SELECT c.user_id, c.year, c.month, COALESCE(c.sales, ''), COALESCE(c.worker, ''), COUNT(*),
+                   SUM({amount_sql('c.total_projects')}), 0, 0, 0
+            FROM "{source}" c {where} GROUP BY 1, 2, 3, 4, 5
+            '''
+        if kind == 'sales_projects':
+            return f'''
+            SELECT p.user_id, p.year, p.month, COALESCE(s.name, ''), '', COUNT(*),
+                   SUM({amount_sql('p.total_project')}), SUM({amount_sql('p.commission')}), SUM({amount_sql('p.kb')}), 0
+            FROM "{source}" p LEFT JOIN sales s ON s.id = p.sales_id {where} GROUP BY 1, 2, 3, 4, 5
+            '''
+        if kind == 'worker_projects':
+            return f'''
+            SELECT p.user_id, p.year, p.month, '', COALESCE(t.name, ''), COUNT(*), 0, 0, SUM({amount_sql('p.kb')}), 0
+            FROM "{source}" p LEFT JOIN tukang t ON t.id = p.tukang_id {where} GROUP BY 1, 2, 3, 4, 5
+            '''
+        projects = 'projects' if source == 'materials_usage' else source[:-len('_materials')] + '_projects'
+        return f'''
+        SELECT m.user_id, {date_year_sql('m.date')}, {date_month_sql('m.date')}, COALESCE(p.sales_name, ''), COALESCE(p.worker_name, ''),
+               COUNT(*), 0, 0, 0, SUM({amount_sql('m.total')})
+        FROM "{source}" m LEFT JOIN "{projects}" p ON p.id = m.project_id {where} GROUP BY 1, 2, 3, 4, 5
+        '''
+
+    def get_report_sources(self):
+        sources = {kind: (kind, 'live') for kind in REPORT_SOURCES}
+        for name in self.find_book_tables('%_backup_%'):
+            if name.startswith(('consumers_backup_', 'sales_projects_backup_', 'worker_projects_backup_')):
+                sources[name] = (name.split('_backup_')[0], REPORT_CLOSED_SIGNATURE)
+            elif name.startswith('materials_backup_') and name.endswith('_materials'):
+                sources[name] = ('materials_usage', REPORT_CLOSED_SIGNATURE)
+        return sources
+
+    def refresh_report_rollup(self):
+        # Tabel aktif: hanya bulan yang ditandai trigger yang dihitung ulang. Buku yang ditutup: dihitung sekali
+        sources = self.get_report_sources()
+        self.cursor.execute("SELECT source, signature FROM report_rollup_sources")
+        stored = dict(self.cursor.fetchall())
+        refreshed = 0
+        for source in set(stored) - set(sources):
+            self.cursor.execute("DELETE FROM report_rollup WHERE source = ?", (source,))
+            self.cursor.execute("DELETE FROM report_rollup_monthly WHERE source = ?", (source,))
+            self.cursor.execute("DELETE FROM report_rollup_sources WHERE source = ?", (source,))
+            self.cursor.execute("DELETE FROM report_rollup_people WHERE source = ?", (source,))
+        for kind in REPORT_SOURCES:
+            if stored.get(kind) == 'live':
+                refreshed += self.refresh_report_buckets(kind)
+            else:
+                self.rebuild_report_source(kind, kind, 'live')
+                refreshed += 1
+        self.conn.commit()
+
+        # Satu buku per transaksi karena ATTACH tidak bisa dilakukan di dalam transaksi; diurutkan per file arsip
+        # agar arsip yang dilepas saat batas MAX_ATTACHED_ARCHIVES tercapai tidak perlu dipasang lagi
+        pending = sorted((self.get_archive_file(source) or '', source) for source, (kind, signature) in sources.items()
+                         if kind != source and stored.get(source) != signature)
+        for _, source in pending:
+            kind, signature = sources[source]
+            if self.open_archived_book(source) and kind == 'materials_usage':
+                self.open_archived_book(source[:-len('_materials')] + '_projects')
+            self.rebuild_report_source(source, kind, signature)
+            self.conn.commit()
+            refreshed += 1
+        return refreshed
+
+    def rebuild_report_source(self, source, kind, signature):
+        self.cursor.execute("DELETE FROM report_rollup WHERE source = ?", (source,))
+        self.cursor.execute("DELETE FROM report_rollup_monthly WHERE source = ?", (source,))
+        self.cursor.execute(f'''
+        INSERT INTO report_rollup (user_id, year, month, sales, tukang, record_count, total_project, commission, kb, material_cost, source, kind)
+        SELECT *, ?, ? FROM ({self.report_source_query(kind, source)})
+        ''', (source, kind))
+        self.cursor.execute('''
+        INSERT INTO report_rollup_monthly (user_id, year, month, sales, tukang, record_count, total_project, commission, kb, material_cost, source, kind)
+        SELECT user_id, year, month, '', '', SUM(record_count), SUM(total_project), SUM(commission), SUM(kb), SUM(material_cost), source, kind
+        FROM report_rollup WHERE source = ? GROUP BY user_id, year, month
+        ''', (source,))
+        self.cursor.execute("DELETE FROM report_rollup_dirty WHERE source = ?", (source,))
+        self.cursor.execute("DELETE FROM report_rollup_people WHERE source = ?", (source,))
+        if source != kind and kind in REPORT_LIVE_PARENT_KINDS:
+            self.cursor.execute(f'''
+            INSERT OR IGNORE INTO report_rollup_people (source, kind, person_id)
+            SELECT DISTINCT ?, ?, {REPORT_SOURCES[kind][1]} FROM "{source}"
+            ''', (source, kind))
+        self.cursor.execute("INSERT OR REPLACE INTO report_rollup_sources (source, signature) VALUES (?, ?)", (source, signature))
+
+    def refresh_report_buckets(self, kind):
+        self.cursor.execute("SELECT COUNT(*) FROM report_rollup_dirty WHERE source = ?", (kind,))
+        if not self.cursor.fetchone()[0]:
+            return 0
+        for table_name in ('report_rollup', 'report_rollup_monthly'):
+            self.cursor.execute(f'''
+            DELETE FROM {table_name} WHERE source = ? AND EXISTS (
+                SELECT 1 FROM report_rollup_dirty d WHERE d.source = {table_name}.source AND d.user_id IS {table_name}.user_id
+                AND d.year IS {table_name}.year AND d.month IS {table_name}.month)
+            ''', (kind,))
+        self.cursor.execute(f'''
+        INSERT INTO report_rollup (user_id, year, month, sales, tukang, record_count, total_project, commission, kb, material_cost, source, kind)
+        SELECT *, ?, ? FROM ({self.report_source_query(kind, kind, dirty_only=True)})
+        ''', (kind, kind))
+        self.cursor.execute('''
+        INSERT INTO report_rollup_monthly (user_id, year, month, sales, tukang, record_count, total_project, commission, kb, material_cost, source, kind)
+        SELECT r.user_id, r.year, r.month, '', '', SUM(r.record_count), SUM(r.total_project), SUM(r.commission), SUM(r.kb), SUM(r.material_cost), r.source, r.kind
+        FROM report_rollup r WHERE r.source = ? AND EXISTS (
+            SELECT 1 FROM report_rollup_dirty d WHERE d.source = r.source AND d.user_id IS r.user_id AND d.year IS r.year AND d.month IS r.month)
+        GROUP BY r.user_id, r.year, r.month
+        ''', (kind,))
+        self.cursor.execute("DELETE FROM report_rollup_dirty WHERE source = ?", (kind,))
+        return 1
+
+    def invalidate_report_source(self, backup_table_name):
+        # Buku yang sudah ditutup diubah, jadi rollup-nya dihitung ulang pada refresh berikutnya
+        if backup_table_name.startswith('materials_backup_') and backup_table_name.endswith('_projects'):
+            backup_table_name = backup_table_name[:-len('_projects')] + '_materials'
+        self.cursor.execute("DELETE FROM report_rollup_sources WHERE source = ?", (backup_table_name,))
+
+    def get_report_years(self, user_id):
+        self.cursor.execute("SELECT DISTINCT year FROM report_rollup WHERE user_id = ? ORDER BY year DESC", (user_id,))
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def get_report_summary(self, user_id, year, month=None, group_by=('sales', 'tukang')):
+        sales = 'sales' if 'sales' in group_by else "''"
+        tukang = 'tukang' if 'tukang' in group_by else "''"
+        query = f'''
+        SELECT month, {sales}, {tukang},
+               SUM(CASE WHEN kind = 'consumers' THEN record_count ELSE 0 END),
+               SUM(CASE WHEN kind = 'consumers' THEN total_project ELSE 0 END),
+               SUM(CASE WHEN kind = 'sales_projects' THEN record_count ELSE 0 END),
+               SUM(commission),
+               SUM(CASE WHEN kind = 'sales_projects' THEN kb ELSE 0 END),
+               SUM(CASE WHEN kind = 'worker_projects' THEN record_count ELSE 0 END),
+               SUM(CASE WHEN kind = 'worker_projects' THEN kb ELSE 0 END),
+               SUM(material_cost)
+        FROM {'report_rollup' if group_by else 'report_rollup_monthly'} WHERE user_id = ? AND year = ?
+        '''
+        params = [user_id, year]
+        if month is not None:
+            query += " AND month = ?"
+            params.append(month)
+        query += " GROUP BY 1, 2, 3 ORDER BY 1, 2, 3"
+        self.cursor.execute(query, params)
+        return self.cursor.fetchall()
+
+    def get_dashboard_data(self, user_id, year):
+        # Semua angka dashboard dibaca dari rollup laporan, bukan dari tabel buku
+        revenue = [0] * 12
+        material_cost = [0] * 12
+        self.cursor.execute('''
+        SELECT month, SUM(CASE WHEN kind = 'consumers' THEN total_project ELSE 0 END), SUM(material_cost)
+        FROM report_rollup_monthly WHERE user_id = ? AND year = ? GROUP BY month
+        ''', (user_id, year))
+        for month, month_revenue, month_cost in self.cursor.fetchall():
+            if month and 1 <= month <= 12:
+                revenue[month - 1] = month_revenue or 0
+                material_cost[month - 1] = month_cost or 0
+
+        self.cursor.execute('''
+        SELECT sales, SUM(commission) - SUM(kb) FROM report_rollup
+        WHERE user_id = ? AND year = ? AND kind = 'sales_projects' GROUP BY sales ORDER BY 2 DESC
+        ''', (user_id, year))
+        sales_commission = self.cursor.fetchall()
+
+        self.cursor.execute('''
+        SELECT tukang, SUM(record_count) FROM report_rollup
+        WHERE user_id = ? AND year = ? AND kind = 'worker_projects' GROUP BY tukang ORDER BY 2 DESC
+        ''', (user_id, year))
+        tukang_jobs = self.cursor.fetchall()
+
+        return {
+            'year': year,
+            'revenue': revenue,
+            'material_cost': material_cost,
+            'sales_commission': [list(row) for row in sales_commission],
+            'tukang_jobs': [list(row) for row in tukang_jobs],
+        }
+
+    def fetch_photo(self, photo_path):
+        return photo_path
+
+    def close(self):
+        self.conn.close()
+
     def __del__(self):
         self.conn.close()
\ No newline at end of file
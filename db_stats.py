@@ -0,0 +1,215 @@
+import atexit
+import functools
+import inspect
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from settings import get_setting
+
+DB_STATS_ENV_VAR = 'APP_DB_STATS'
+DB_STATS_FLAG = '--db-stats'
+DB_STATS_DIR = 'db_stats'
+DEFAULT_SLOW_QUERY_MS = 100
+
+# Batas atas tiap bucket histogram dalam milidetik, bucket terakhir untuk sisanya
+HISTOGRAM_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)
+_EXPLAINABLE = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE')
+
+_enabled = False
+_output_dir = DB_STATS_DIR
+_slow_query_ms = DEFAULT_SLOW_QUERY_MS
+_lock = threading.Lock()
+_query_stats = {}
+_method_stats = {}
+_slow_logger = logging.getLogger('slow_queries')
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable_from_args(argv=None):
+    argv = sys.argv if argv is None else argv
+    if DB_STATS_FLAG in argv:
+        argv.remove(DB_STATS_FLAG)
+        enable()
+    elif os.environ.get(DB_STATS_ENV_VAR, '') not in ('', '0') or get_setting('db_stats', False):
+        enable()
+    return _enabled
+
+
+def enable(output_dir=DB_STATS_DIR, slow_query_ms=None):
+    global _enabled, _output_dir, _slow_query_ms
+    if _enabled:
+        return
+    _enabled = True
+    _output_dir = output_dir
+    _slow_query_ms = slow_query_ms if slow_query_ms is not None else get_setting('slow_query_ms', DEFAULT_SLOW_QUERY_MS)
+    os.makedirs(_output_dir, exist_ok=True)
+
+    handler = logging.FileHandler(os.path.join(_output_dir, 'slow_queries.log'), encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+    _slow_logger.addHandler(handler)
+    _slow_logger.setLevel(logging.INFO)
+    _slow_logger.propagate = False
+    atexit.register(dump)
+
+
+def _new_entry():
+    return {'calls': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'rows': 0,
+            'histogram': [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)}
+
+
+def _record(table, key, elapsed_ms, rows=0):
+    with _lock:
+        entry = table.get(key)
+        if entry is None:
+            entry = table[key] = _new_entry()
+        entry['calls'] += 1
+        entry['total_ms'] += elapsed_ms
+        entry['max_ms'] = max(entry['max_ms'], elapsed_ms)
+        entry['rows'] += rows
+        bucket = next((i for i, limit in enumerate(HISTOGRAM_BUCKETS_MS) if elapsed_ms <= limit), len(HISTOGRAM_BUCKETS_MS))
+        entry['histogram'][bucket] += 1
+
+
+def _add_rows(table, key, rows):
+    with _lock:
+        if key in table:
+            table[key]['rows'] += rows
+
+
+def normalize_sql(sql):
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    # Cursor pengganti yang mencatat waktu setiap execute dan jumlah baris yang diambil
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._after_execute(sql, parameters, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self._after_execute(sql, None, time.perf_counter() - start)
+
+    def _after_execute(self, sql, parameters, elapsed):
+        self._stats_key = normalize_sql(sql)
+        elapsed_ms = elapsed * 1000
+        rows = self.rowcount if self.rowcount > 0 else 0
+        _record(_query_stats, self._stats_key, elapsed_ms, rows)
+        if elapsed_ms >= _slow_query_ms:
+            log_slow_query(self.connection, sql, parameters, elapsed_ms)
+
+    def fetchone(self):
+        row = super().fetchone()
+        if row is not None:
+            self._count_rows(1)
+        return row
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._count_rows(len(rows))
+        return rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        self._count_rows(len(rows))
+        return rows
+
+    def _count_rows(self, rows):
+        key = getattr(self, '_stats_key', None)
+        if key and rows:
+            _add_rows(_query_stats, key, rows)
+
+
+def create_cursor(conn):
+    if _enabled:
+        return conn.cursor(InstrumentedCursor)
+    return conn.cursor()
+
+
+def explain_query_plan(conn, sql, parameters=None):
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return []
+    try:
+        rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}", parameters or ()).fetchall()
+    except sqlite3.Error as e:
+        return [f"(gagal mengambil query plan: {e})"]
+    return [row[-1] for row in rows]
+
+
+def log_slow_query(conn, sql, parameters, elapsed_ms):
+    plan = explain_query_plan(conn, sql, parameters)
+    lines = [f"{elapsed_ms:.1f} ms: {normalize_sql(sql)}"]
+    if parameters:
+        lines.append(f"  parameter: {parameters!r}")
+    lines.extend(f"  plan: {detail}" for detail in plan)
+    _slow_logger.info('\n'.join(lines))
+
+
+def instrument_methods(cls):
+    # Bungkus semua method publik agar waktu per method tercatat saat instrumentasi aktif
+    for name, func in list(vars(cls).items()):
+        if name.startswith('_') or not inspect.isfunction(func):
+            continue
+        setattr(cls, name, _timed_method(func, f"{cls.__name__}.{name}"))
+    return cls
+
+
+def _timed_method(func, key):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        result = None
+        try:
+            result = func(*args, **kwargs)
+            return result
+        finally:
+            rows = len(result) if isinstance(result, list) else 0
+            _record(_method_stats, key, (time.perf_counter() - start) * 1000, rows)
+    return wrapper
+
+
+def snapshot():
+    def summarize(table):
+        items = []
+        for key, entry in table.items():
+            item = dict(entry, histogram=list(entry['histogram']))
+            item['avg_ms'] = entry['total_ms'] / entry['calls'] if entry['calls'] else 0.0
+            items.append((key, item))
+        return dict(sorted(items, key=lambda item: item[1]['total_ms'], reverse=True))
+
+    with _lock:
+        return {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'slow_query_ms': _slow_query_ms,
+            'histogram_buckets_ms': list(HISTOGRAM_BUCKETS_MS) + ['inf'],
+            'methods': summarize(_method_stats),
+            'queries': summarize(_query_stats),
+        }
+
+
+def dump(path=None):
+    if not _enabled:
+        return None
+    if path is None:
+        path = os.path.join(_output_dir, f"db_stats_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(snapshot(), f, indent=2, ensure_ascii=False)
+    return path
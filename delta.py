@@ -0,0 +1,163 @@
+import hashlib
+import json
+import struct
+import zlib
+
+# Format file delta:
+#   MAGIC | panjang header (uint32) | header JSON | operasi (zlib)
+# Operasi:
+#   b'C' + offset (uint64) + panjang (uint32)  -> salin dari file lama
+#   b'D' + panjang (uint32) + data             -> data baru
+MAGIC = b'APDELTA1'
+DEFAULT_BLOCK_SIZE = 4096
+_MOD = 1 << 16
+HEADER_KEYS = ('source_sha256', 'target_sha256', 'target_size')
+
+
+class DeltaError(Exception):
+    pass
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def _weak_checksum(block):
+    a = sum(block) % _MOD
+    b = sum((len(block) - i) * x for i, x in enumerate(block)) % _MOD
+    return a, b
+
+
+def create_delta(old_data, new_data, block_size=DEFAULT_BLOCK_SIZE):
+    # Indeks blok file lama (rolling checksum ala rsync + md5 sebagai pembeda)
+    blocks = {}
+    for offset in range(0, len(old_data) - block_size + 1, block_size):
+        block = old_data[offset:offset + block_size]
+        a, b = _weak_checksum(block)
+        blocks.setdefault(a | (b << 16), []).append((hashlib.md5(block).digest(), offset))
+
+    ops = bytearray()
+    literal = bytearray()
+    last_copy = None
+
+    def flush_literal():
+        if literal:
+            ops.extend(b'D' + struct.pack('<I', len(literal)) + literal)
+            literal.clear()
+
+    def flush_copy():
+        nonlocal last_copy
+        if last_copy:
+            ops.extend(b'C' + struct.pack('<QI', *last_copy))
+            last_copy = None
+
+    pos = 0
+    end = len(new_data)
+    a = b = None
+    while pos + block_size <= end:
+        if a is None:
+            a, b = _weak_checksum(new_data[pos:pos + block_size])
+
+        match = None
+        candidates = blocks.get(a | (b << 16))
+        if candidates:
+            strong = hashlib.md5(new_data[pos:pos + block_size]).digest()
+            match = next((offset for digest, offset in candidates if digest == strong), None)
+
+        if match is not None:
+            flush_literal()
+            if last_copy and last_copy[0] + last_copy[1] == match:
+                last_copy = (last_copy[0], last_copy[1] + block_size)
+            else:
+                flush_copy()
+                last_copy = (match, block_size)
+            pos += block_size
+            a = b = None
+            continue
+
+        # Geser jendela satu byte
+        out_byte = new_data[pos]
+        if last_copy:
+            flush_copy()
+        literal.append(out_byte)
+        if pos + block_size < end:
+            in_byte = new_data[pos + block_size]
+            a = (a - out_byte + in_byte) % _MOD
+            b = (b - block_size * out_byte + a) % _MOD
+        else:
+            a = b = None
+        pos += 1
+
+    flush_copy()
+    literal.extend(new_data[pos:])
+    flush_literal()
+
+    header = json.dumps({
+        'source_sha256': sha256_bytes(old_data),
+        'target_sha256': sha256_bytes(new_data),
+        'target_size': len(new_data),
+        'block_size': block_size,
+    }).encode('utf-8')
+    return MAGIC + struct.pack('<I', len(header)) + header + zlib.compress(bytes(ops), 9)
+
+
+def read_delta_header(delta_data):
+    if not delta_data.startswith(MAGIC):
+        raise DeltaError("Format file delta tidak dikenali")
+    header_start = len(MAGIC) + 4
+    try:
+        (header_length,) = struct.unpack('<I', delta_data[len(MAGIC):header_start])
+        header = json.loads(delta_data[header_start:header_start + header_length].decode('utf-8'))
+    except (struct.error, UnicodeDecodeError, ValueError) as e:
+        raise DeltaError(f"Header delta rusak: {e}")
+    if not isinstance(header, dict) or any(key not in header for key in HEADER_KEYS):
+        raise DeltaError("Header delta tidak lengkap")
+    return header, header_start + header_length
+
+
+def apply_delta(old_data, delta_data):
+    header, ops_start = read_delta_header(delta_data)
+    if sha256_bytes(old_data) != header['source_sha256']:
+        raise DeltaError("File lama tidak cocok dengan sumber delta")
+
+    try:
+        ops = zlib.decompress(delta_data[ops_start:])
+    except zlib.error as e:
+        raise DeltaError(f"Data delta rusak: {e}")
+
+    output = bytearray()
+    pos = 0
+    try:
+        while pos < len(ops):
+            op = ops[pos:pos + 1]
+            if op == b'C':
+                offset, length = struct.unpack('<QI', ops[pos + 1:pos + 13])
+                if offset + length > len(old_data):
+                    raise DeltaError("Operasi salin di luar batas file lama")
+                output.extend(old_data[offset:offset + length])
+                pos += 13
+            elif op == b'D':
+                (length,) = struct.unpack('<I', ops[pos + 1:pos + 5])
+                if pos + 5 + length > len(ops):
+                    raise DeltaError("Data delta terpotong")
+                output.extend(ops[pos + 5:pos + 5 + length])
+                pos += 5 + length
+            else:
+                raise DeltaError(f"Operasi delta tidak dikenal: {op!r}")
+    except struct.error as e:
+        raise DeltaError(f"Operasi delta terpotong: {e}")
+
+    if len(output) != header['target_size'] or sha256_bytes(output) != header['target_sha256']:
+        raise DeltaError("Hash hasil patch tidak cocok")
+    return bytes(output)
+
+
+def create_delta_file(old_path, new_path, output_path, block_size=DEFAULT_BLOCK_SIZE):
+    with open(old_path, 'rb') as f:
+        old_data = f.read()
+    with open(new_path, 'rb') as f:
+        new_data = f.read()
+    delta_data = create_delta(old_data, new_data, block_size)
+    with open(output_path, 'wb') as f:
+        f.write(delta_data)
+    return len(delta_data)
@@ -1,19 +1,19 @@
 import webbrowser
-from PyQt5.QtWidgets import QDialog, QFileDialog, QVBoxLayout, QLabel, QTextEdit, QLineEdit, QPushButton, QFormLayout, QComboBox, QDateEdit, QDialogButtonBox, QMessageBox
+from PyQt5.QtWidgets import QDialog, QProgressDialog, QFileDialog, QVBoxLayout, QHBoxLayout, QLabel, QTextEdit, QLineEdit, QPushButton, QFormLayout, QComboBox, QDateEdit, QDialogButtonBox, QMessageBox, QTableWidget, QTableWidgetItem
 from PyQt5.QtCore import QThread, pyqtSignal, QDate, Qt
 from PyQt5.QtGui import QGuiApplication, QDoubleValidator
 
-import shutil
 import os
 from datetime import datetime
-from error_handling import setup_error_handling
+from database import open_database
+from backup import create_snapshot, next_snapshot_path
+from cloud_backup import open_storage, storage_label, upload_backup
 
 
 
 class AddDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
-        setup_error_handling()
         self.setMinimumSize(600, 400) 
         self.setWindowTitle("Tambah Data")
         self.layout = QVBoxLayout()
@@ -204,7 +204,6 @@ class ProjectInputDialog(QDialog):
 class AddMaterialDialog(QDialog):
     def __init__(self, parent=None, initial_data=None):
         super().__init__(parent)
-        setup_error_handling()
         self.setMinimumSize(600, 400) 
         self.setWindowTitle("Tambah/Edit Pemakaian Bahan")
         self.layout = QVBoxLayout(self)
@@ -434,20 +433,31 @@ class AddTukangProjectDialog(QDialog):
 
 class BackupWorker(QThread):
     finished = pyqtSignal()
+    progress = pyqtSignal(int, str)
     error = pyqtSignal(str)
 
-    def __init__(self, source_path, destination_path):
+    def __init__(self, source_path, destination_path, upload=False):
         super().__init__()
         self.source_path = source_path
         self.destination_path = destination_path
+        self.upload = upload
+        self.upload_result = None
 
     def run(self):
         try:
-            os.makedirs(os.path.dirname(self.destination_path), exist_ok=True)
-            shutil.copy2(self.source_path, self.destination_path)
-            self.finished.emit()
+            archive_folder = os.path.join(os.path.dirname(os.path.dirname(self.destination_path)), 'arsip')
+            create_snapshot(self.source_path, destination_path=self.destination_path, archive_folder=archive_folder)
         except Exception as e:
             self.error.emit(str(e))
+            return
+        try:
+            # Salinan lokal tetap tersimpan walaupun upload gagal; potongan yang sudah terkirim dilanjutkan di backup berikutnya
+            storage = open_storage() if self.upload else None
+            if storage:
+                self.upload_result = upload_backup(storage, self.destination_path, archive_folder, self.progress.emit)
+            self.finished.emit()
+        except Exception as e:
+            self.error.emit(f"Backup lokal tersimpan di {self.destination_path}, tetapi upload gagal: {str(e)}")
 
 class BackupDialog(QDialog):
     def __init__(self, parent=None):
@@ -484,33 +494,52 @@ class BackupDialog(QDialog):
             self.reject()  # Close the dialog if user selects No
 
     def start_backup(self):
-        current_date = datetime.now().strftime("%d-%m-%Y")
-        backup_folder = os.path.join("backup", current_date)
-        
         source_path = "project_management.db"
-        destination_path = os.path.join(backup_folder, "project_management.db")
-
-        # Check if a backup already exists for today
-        counter = 1
-        while os.path.exists(destination_path):
-            counter += 1
-            destination_path = os.path.join(backup_folder, f"project_management({counter}).db")
-
-        self.backup_worker = BackupWorker(source_path, destination_path)
+        destination_path = next_snapshot_path()
+
+        self.upload_label = storage_label()
+        self.backup_progress = None
+        if self.upload_label:
+            self.backup_progress = QProgressDialog(f"Menyiapkan upload ke {self.upload_label}...", None, 0, 100, self)
+            self.backup_progress.setWindowTitle("Backup")
+            self.backup_progress.setWindowModality(Qt.WindowModal)
+            self.backup_progress.setMinimumDuration(0)
+        self.backup_worker = BackupWorker(source_path, destination_path, upload=bool(self.upload_label))
+        self.backup_worker.progress.connect(self.on_backup_progress)
         self.backup_worker.finished.connect(self.on_backup_finished)
         self.backup_worker.error.connect(self.on_backup_error)
         self.backup_worker.start()
 
+    def on_backup_progress(self, value, text):
+        if self.backup_progress:
+            self.backup_progress.setLabelText(text)
+            self.backup_progress.setValue(value)
+
+    def close_backup_progress(self):
+        if self.backup_progress:
+            self.backup_progress.close()
+            self.backup_progress = None
+
     def on_backup_finished(self):
+        self.close_backup_progress()
+        message = "Database berhasil di-backup ke folder lokal."
+        result = self.backup_worker.upload_result
+        if result:
+            if result['exists']:
+                message += f" Snapshot ini sudah ada di {self.upload_label}."
+            else:
+                message += (f" {result['uploaded']} potongan ({result['uploaded_bytes'] // 1024} KB) diunggah ke {self.upload_label}, "
+                            f"{result['skipped']} potongan sudah ada sebelumnya.")
         msg_box = QMessageBox(self)
         msg_box.setIcon(QMessageBox.Information)
         msg_box.setWindowTitle("Backup Berhasil")
-        msg_box.setText("Database berhasil di-backup ke folder lokal.")
+        msg_box.setText(message)
         self.center_message_box(msg_box)
         msg_box.exec_()
         self.accept()  # Close the dialog
 
     def on_backup_error(self, error_message):
+        self.close_backup_progress()
         msg_box = QMessageBox(self)
         msg_box.setIcon(QMessageBox.Critical)
         msg_box.setWindowTitle("Backup Gagal")
@@ -523,4 +552,179 @@ class BackupDialog(QDialog):
         if hasattr(self, 'backup_worker') and self.backup_worker.isRunning():
             self.backup_worker.quit()
             self.backup_worker.wait()
-        event.accept()
\ No newline at end of file
+        event.accept()
+
+
+class CloseBookWorker(QThread):
+    progress = pyqtSignal(int, str)
+    result = pyqtSignal(str, str)
+    error = pyqtSignal(str)
+
+    # Jumlah foto yang dipindah per langkah sebelum progres diperbarui
+    PHOTO_BATCH = 20
+
+    def __init__(self, method=None, args=()):
+        super().__init__()
+        self.method = method
+        self.args = args
+
+    def run(self):
+        # Tutup buku dan pemindahan foto berjalan di koneksi sendiri agar tampilan tetap responsif;
+        # tanpa method hanya menyelesaikan pemindahan foto yang tertunda
+        db = open_database()
+        try:
+            backup_name = ''
+            if self.method:
+                self.progress.emit(0, "Menutup buku...")
+                try:
+                    backup_name = getattr(db, self.method)(*self.args)
+                except Exception as e:
+                    self.error.emit(str(e))
+                    return
+            self.result.emit(backup_name, self.relocate_photos(db))
+        finally:
+            db.close()
+
+    def relocate_photos(self, db):
+        # Buku sudah tertutup di sini; foto yang gagal dipindah hanya dilaporkan dan dicoba lagi saat aplikasi dibuka
+        failures = []
+        try:
+            total = db.count_photo_moves()
+            done, last_id = 0, 0
+            while True:
+                self.progress.emit(int(done * 100 / total) if total else 100, f"Memindahkan foto ({done}/{total})...")
+                last_id, moved, batch_failures = db.relocate_photos(self.PHOTO_BATCH, last_id)
+                if last_id is None:
+                    break
+                done += moved
+                failures += batch_failures
+        except Exception as e:
+            return f"Foto belum selesai dipindahkan dan akan dicoba lagi saat aplikasi dibuka: {str(e)}"
+        self.progress.emit(100, "Selesai")
+        if failures:
+            return f"{len(failures)} foto belum bisa dipindahkan dan akan dicoba lagi saat aplikasi dibuka: {failures[0][1]}"
+        return ''
+
+class ReportWorker(QThread):
+    finished = pyqtSignal(int)
+    error = pyqtSignal(str)
+
+    def run(self):
+        # Rollup diperbarui di koneksi sendiri agar dialog tetap responsif
+        try:
+            db = open_database()
+            refreshed = db.refresh_report_rollup()
+            db.close()
+            self.finished.emit(refreshed)
+        except Exception as e:
+            self.error.emit(str(e))
+
+class ReportDialog(QDialog):
+    MONTHS = ["Januari", "Februari", "Maret", "April", "Mei", "Juni", "Juli", "Agustus", "September", "Oktober", "November", "Desember"]
+    HEADERS = ["Bulan", "Sales", "Tukang", "Konsumen", "Total Proyek", "Proyek Sales", "Komisi", "KB Sales", "Proyek Tukang", "KB Tukang", "Biaya Bahan"]
+
+    def __init__(self, user_id, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Laporan Bulanan")
+        self.setMinimumSize(1000, 600)
+        self.user_id = user_id
+        self.db = open_database()
+
+        layout = QVBoxLayout(self)
+        filter_layout = QHBoxLayout()
+        self.year_combo = QComboBox()
+        self.month_combo = QComboBox()
+        self.month_combo.addItem("Semua Bulan", None)
+        for index, name in enumerate(self.MONTHS, start=1):
+            self.month_combo.addItem(name, index)
+        self.group_combo = QComboBox()
+        self.group_combo.addItem("Per Bulan", ())
+        self.group_combo.addItem("Per Sales", ('sales',))
+        self.group_combo.addItem("Per Tukang", ('tukang',))
+        self.group_combo.addItem("Per Sales dan Tukang", ('sales', 'tukang'))
+        self.status_label = QLabel("")
+        filter_layout.addWidget(QLabel("Tahun:"))
+        filter_layout.addWidget(self.year_combo)
+        filter_layout.addWidget(QLabel("Bulan:"))
+        filter_layout.addWidget(self.month_combo)
+        filter_layout.addWidget(QLabel("Kelompok:"))
+        filter_layout.addWidget(self.group_combo)
+        filter_layout.addStretch()
+        filter_layout.addWidget(self.status_label)
+        layout.addLayout(filter_layout)
+
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        layout.addWidget(self.table)
+
+        self.year_combo.currentIndexChanged.connect(self.load_summary)
+        self.month_combo.currentIndexChanged.connect(self.load_summary)
+        self.group_combo.currentIndexChanged.connect(self.load_summary)
+
+        # Rollup yang ada langsung ditampilkan, lalu diperbarui di latar belakang
+        self.load_years()
+        self.status_label.setText("Memperbarui ringkasan...")
+        self.report_worker = ReportWorker()
+        self.report_worker.finished.connect(self.on_refresh_finished)
+        self.report_worker.error.connect(self.on_refresh_error)
+        self.report_worker.start()
+
+    def load_years(self):
+        selected = self.year_combo.currentData()
+        years = self.db.get_report_years(self.user_id) or [datetime.now().year]
+        self.year_combo.blockSignals(True)
+        self.year_combo.clear()
+        for year in years:
+            self.year_combo.addItem(str(year), year)
+        if selected in years:
+            self.year_combo.setCurrentIndex(years.index(selected))
+        self.year_combo.blockSignals(False)
+        self.load_summary()
+
+    def load_summary(self):
+        year = self.year_combo.currentData()
+        if year is None:
+            return
+        rows = self.db.get_report_summary(self.user_id, year, self.month_combo.currentData(), self.group_combo.currentData())
+        self.table.setRowCount(0)
+        totals = [0] * (len(self.HEADERS) - 3)
+        for row in rows:
+            month = self.MONTHS[row[0] - 1] if row[0] and 1 <= row[0] <= 12 else str(row[0])
+            self.add_row([month, row[1], row[2]], row[3:])
+            totals = [total + (value or 0) for total, value in zip(totals, row[3:])]
+        if rows:
+            self.add_row(["Total", "", ""], totals, bold=True)
+
+    def add_row(self, labels, values, bold=False):
+        row_position = self.table.rowCount()
+        self.table.insertRow(row_position)
+        count_columns = (0, 2, 5)
+        for column, value in enumerate(labels + [
+                str(value or 0) if index in count_columns else self.format_currency(value)
+                for index, value in enumerate(values)]):
+            item = QTableWidgetItem(value)
+            if bold:
+                font = item.font()
+                font.setBold(True)
+                item.setFont(font)
+            self.table.setItem(row_position, column, item)
+
+    def format_currency(self, value):
+        return f"Rp {int(value or 0):,}".replace(',', '.')
+
+    def on_refresh_finished(self, refreshed):
+        self.status_label.setText(f"Diperbarui ({refreshed} sumber dihitung ulang)" if refreshed else "Sudah terbaru")
+        if refreshed:
+            self.load_years()
+
+    def on_refresh_error(self, error_message):
+        self.status_label.setText("Gagal memperbarui ringkasan")
+        QMessageBox.warning(self, "Error", f"Gagal memperbarui ringkasan: {error_message}")
+
+    def done(self, result):
+        if self.report_worker.isRunning():
+            self.report_worker.wait()
+        self.db.close()
+        super().done(result)
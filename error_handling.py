@@ -1,51 +1,237 @@
 import sys
 import traceback
 import logging
+import hashlib
+import json
+import queue
+import threading
+import time
+from collections import deque
 from datetime import datetime
-import requests
 import os
-from PyQt5.QtWidgets import QMessageBox
+from PyQt5.QtWidgets import QApplication, QMessageBox
 
 DISCORD_WEBHOOK_URL = "hidden"
+ERROR_REPORT_URL_ENV = 'ERROR_REPORT_URL'
+ERROR_SPOOL_DIR = 'error_spool'
+
+_installed = False
+_reporter = None
+_reporter_lock = threading.Lock()
 
 def setup_error_handling():
+    # Cukup dipasang sekali per proses
+    global _installed
+    if _installed:
+        return
+    _installed = True
+
     logging.basicConfig(filename='log.txt', level=logging.ERROR,
                         format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.excepthook = handle_exception
+    get_reporter()
 
-    def handle_exception(exc_type, exc_value, exc_traceback):
-        logging.error("Uncaught exception", exc_info=(exc_type, exc_value, exc_traceback))
-        
-        error_msg = f"An unexpected error occurred:\n{exc_value}"
-        error_box = QMessageBox(QMessageBox.Critical, "Error", error_msg)
-        error_box.setStandardButtons(QMessageBox.Ok | QMessageBox.Help)
-        button = error_box.exec_()
+def handle_exception(exc_type, exc_value, exc_traceback):
+    logging.error("Uncaught exception", exc_info=(exc_type, exc_value, exc_traceback))
 
-        if button == QMessageBox.Help:
-            send_to_discord(exc_type, exc_value, exc_traceback)
+    if QApplication.instance() is None:
+        sys.__excepthook__(exc_type, exc_value, exc_traceback)
+        return
 
-    sys.excepthook = handle_exception
+    error_msg = f"An unexpected error occurred:\n{exc_value}"
+    error_box = QMessageBox(QMessageBox.Critical, "Error", error_msg)
+    error_box.setStandardButtons(QMessageBox.Ok | QMessageBox.Help)
+    button = error_box.exec_()
 
-def send_to_discord(exc_type, exc_value, exc_traceback):
-    if not DISCORD_WEBHOOK_URL:
-        QMessageBox.warning(None, "Error", "Discord webhook URL is not set in the environment variables.")
-        return
-    
-    error_message = f"```\nType: {exc_type}\nValue: {exc_value}\n\nTraceback:\n{''.join(traceback.format_tb(exc_traceback))}```"
-    payload = {
-        "content": "An error occurred in the application:",
-        "embeds": [{
-            "title": "Error Details",
-            "description": error_message,
-            "color": 16711680  # Red color
-        }]
-    }
-
-    try:
-        response = requests.post(DISCORD_WEBHOOK_URL, json=payload)
+    if button == QMessageBox.Help:
+        send_to_discord(exc_type, exc_value, exc_traceback)
+
+class WebhookEndpoint:
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, reports):
+        import requests
+
+        if not self.url:
+            raise ValueError("URL webhook untuk laporan error belum diatur")
+
+        # Discord membatasi 10 embed per pesan dan 4096 karakter per deskripsi
+        embeds = []
+        for report in reports[:10]:
+            description = f"```\nType: {report['type']}\nValue: {report['value']}\nJumlah: {report['count']}\n\nTraceback:\n{report['traceback']}```"
+            if len(description) > 4096:
+                description = description[:4089] + "\n...```"
+            embeds.append({
+                "title": f"Error Details ({report['fingerprint'][:8]})",
+                "description": description,
+                "color": 16711680,  # Red color
+                "timestamp": report['time']
+            })
+        payload = {
+            "content": "An error occurred in the application:",
+            "embeds": embeds
+        }
+        response = requests.post(self.url, json=payload, timeout=self.timeout)
         response.raise_for_status()
-        QMessageBox.information(None, "Success", "Error report sent to Discord successfully.")
-    except requests.RequestException as e:
-        QMessageBox.warning(None, "Error", f"Failed to send error report to Discord: {str(e)}")
+
+class ErrorReporter:
+    def __init__(self, endpoint, spool_dir=ERROR_SPOOL_DIR, batch_size=10, batch_wait=2.0,
+                 max_reports_per_minute=5, retry_interval=60.0):
+        self.endpoint = endpoint
+        self.spool_dir = spool_dir
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.max_reports_per_minute = max_reports_per_minute
+        self.retry_interval = retry_interval
+        self.queue = queue.Queue()
+        self.sent_fingerprints = set()
+        self.send_times = deque()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.thread = threading.Thread(target=self.run, name="ErrorReporter", daemon=True)
+            self.thread.start()
+
+    @staticmethod
+    def fingerprint(exc_type, exc_traceback):
+        # Nomor baris tidak ikut dihitung agar error yang sama tetap satu sidik jari antar versi
+        frames = traceback.extract_tb(exc_traceback) if exc_traceback else []
+        parts = [getattr(exc_type, '__name__', str(exc_type))]
+        parts.extend(f"{os.path.basename(frame.filename)}:{frame.name}" for frame in frames)
+        return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def submit(self, exc_type, exc_value, exc_traceback):
+        report = {
+            "fingerprint": self.fingerprint(exc_type, exc_traceback),
+            "type": getattr(exc_type, '__name__', str(exc_type)),
+            "value": str(exc_value),
+            "traceback": ''.join(traceback.format_tb(exc_traceback)) if exc_traceback else '',
+            "time": datetime.now().astimezone().isoformat(timespec='seconds'),
+            "count": 1
+        }
+        self.queue.put(report)
+        return report['fingerprint']
+
+    def flush(self):
+        self.queue.join()
+
+    def run(self):
+        self.send_spooled()
+        while True:
+            try:
+                first = self.queue.get(timeout=self.retry_interval)
+            except queue.Empty:
+                self.send_spooled()
+                continue
+
+            batch = [first]
+            deadline = time.monotonic() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self.process_batch(batch)
+            except Exception as e:
+                logging.error(f"Error reporter gagal memproses laporan: {str(e)}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def deduplicate(self, reports):
+        merged = {}
+        for report in reports:
+            existing = merged.get(report['fingerprint'])
+            if existing:
+                existing['count'] += report['count']
+            else:
+                merged[report['fingerprint']] = dict(report)
+        return list(merged.values())
+
+    def process_batch(self, reports):
+        reports = [r for r in self.deduplicate(reports) if r['fingerprint'] not in self.sent_fingerprints]
+        if not reports:
+            return
+        if not self.acquire_rate_limit():
+            self.spool(reports)
+            return
+        if self.send(reports):
+            self.send_spooled()
+        else:
+            self.spool(reports)
+
+    def acquire_rate_limit(self):
+        now = time.monotonic()
+        while self.send_times and now - self.send_times[0] > 60:
+            self.send_times.popleft()
+        if len(self.send_times) >= self.max_reports_per_minute:
+            return False
+        self.send_times.append(now)
+        return True
+
+    def send(self, reports):
+        try:
+            self.endpoint.send(reports)
+        except Exception as e:
+            logging.error(f"Gagal mengirim laporan error: {str(e)}")
+            return False
+        self.sent_fingerprints.update(r['fingerprint'] for r in reports)
+        return True
+
+    def spool(self, reports):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        for report in reports:
+            path = os.path.join(self.spool_dir, f"{report['fingerprint']}.json")
+            if os.path.exists(path):
+                with open(path, 'r', encoding='utf-8') as f:
+                    report = dict(report, count=json.load(f)['count'] + report['count'])
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(report, f)
+
+    def send_spooled(self):
+        if not os.path.isdir(self.spool_dir):
+            return
+        paths = sorted(os.path.join(self.spool_dir, name) for name in os.listdir(self.spool_dir) if name.endswith('.json'))
+        for start in range(0, len(paths), self.batch_size):
+            chunk = paths[start:start + self.batch_size]
+            reports = []
+            for path in chunk:
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        reports.append(json.load(f))
+                except (OSError, ValueError):
+                    os.remove(path)
+            pending = [r for r in reports if r['fingerprint'] not in self.sent_fingerprints]
+            if pending and (not self.acquire_rate_limit() or not self.send(pending)):
+                return
+            for path in chunk:
+                if os.path.exists(path):
+                    os.remove(path)
+
+def get_reporter(endpoint=None):
+    global _reporter
+    with _reporter_lock:
+        if _reporter is None:
+            url = os.environ.get(ERROR_REPORT_URL_ENV) or DISCORD_WEBHOOK_URL
+            _reporter = ErrorReporter(endpoint or WebhookEndpoint(url))
+        elif endpoint is not None:
+            _reporter.endpoint = endpoint
+        _reporter.start()
+        return _reporter
+
+def send_to_discord(exc_type, exc_value, exc_traceback):
+    # Laporan diantrekan dan dikirim oleh thread latar belakang, GUI tidak ikut menunggu
+    get_reporter().submit(exc_type, exc_value, exc_traceback)
+    if QApplication.instance() is not None:
+        QMessageBox.information(None, "Laporan Error", "Laporan error sedang dikirim di latar belakang.")
 
 def error_handler(func):
     def wrapper(*args, **kwargs):
@@ -58,5 +244,5 @@ def error_handler(func):
             button = error_box.exec_()
 
             if button == QMessageBox.Help:
-                send_to_discord(type(e), str(e), e.__traceback__)
+                send_to_discord(type(e), e, e.__traceback__)
     return wrapper
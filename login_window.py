@@ -1,8 +1,32 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QDesktopWidget, QLineEdit, QPushButton, 
-                             QLabel, QStackedWidget, QMessageBox, QFrame)
+                             QLabel, QStackedWidget, QMessageBox, QFrame, QProgressBar, QCheckBox)
 from PyQt5.QtGui import QColor, QPalette, QFont, QIcon
-from PyQt5.QtCore import Qt, QSize
-from auth import Auth
+from PyQt5.QtCore import Qt, QSize, QThread, pyqtSignal
+from auth import open_auth, save_session_token
+
+class AuthWorker(QThread):
+    result = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, db_name, action, username, password):
+        super().__init__()
+        self.db_name = db_name
+        self.action = action
+        self.username = username
+        self.password = password
+
+    def run(self):
+        # Koneksi SQLite tidak boleh dipakai lintas thread, jadi worker membuat Auth sendiri
+        auth = open_auth(self.db_name)
+        try:
+            if self.action == 'login':
+                self.result.emit(auth.login(self.username, self.password))
+            else:
+                self.result.emit(auth.register(self.username, self.password))
+        except Exception as e:
+            self.error.emit(str(e))
+        finally:
+            auth.close()
 
 class ModernDarkPalette(QPalette):
     def __init__(self):
@@ -78,6 +102,7 @@ class AuthWidget(QWidget):
         self.auth = auth
         self.main_window = main_window
         self.is_login = is_login
+        self.worker = None
         self.init_ui()
 
     def init_ui(self):
@@ -109,11 +134,25 @@ class AuthWidget(QWidget):
             self.confirm_password_input.setStyleSheet(StyleHelper.get_line_edit_style())
             layout.addWidget(self.confirm_password_input)
 
+        if self.is_login:
+            self.remember_checkbox = QCheckBox("Ingat saya di komputer ini")
+            self.remember_checkbox.setStyleSheet("color: white; font-size: 14px;")
+            layout.addWidget(self.remember_checkbox)
+
         # Set up action button
-        action_button = QPushButton("Login" if self.is_login else "Register")
-        action_button.setStyleSheet(StyleHelper.get_button_style())
-        action_button.clicked.connect(self.login if self.is_login else self.register)
-        layout.addWidget(action_button)
+        self.action_text = "Login" if self.is_login else "Register"
+        self.action_button = QPushButton(self.action_text)
+        self.action_button.setStyleSheet(StyleHelper.get_button_style())
+        self.action_button.clicked.connect(self.login if self.is_login else self.register)
+        layout.addWidget(self.action_button)
+
+        # Indikator proses selama hashing password berjalan
+        self.busy_bar = QProgressBar()
+        self.busy_bar.setRange(0, 0)
+        self.busy_bar.setTextVisible(False)
+        self.busy_bar.setFixedHeight(6)
+        self.busy_bar.hide()
+        layout.addWidget(self.busy_bar)
 
         # Set up switch view link
         switch_text = "Don't have an account? Register" if self.is_login else "Already have an account? Login"
@@ -126,12 +165,38 @@ class AuthWidget(QWidget):
         layout.addStretch()
         self.setLayout(layout)
 
+    def set_busy(self, busy):
+        self.action_button.setEnabled(not busy)
+        self.action_button.setText("Memproses..." if busy else self.action_text)
+        self.username_input.setEnabled(not busy)
+        self.password_input.setEnabled(not busy)
+        if not self.is_login:
+            self.confirm_password_input.setEnabled(not busy)
+        self.busy_bar.setVisible(busy)
+
+    def run_auth_task(self, action, username, password, on_result):
+        if self.worker is not None and self.worker.isRunning():
+            return
+        self.set_busy(True)
+        self.worker = AuthWorker(self.auth.db_name, action, username, password)
+        self.worker.result.connect(on_result)
+        self.worker.error.connect(self.on_auth_error)
+        self.worker.start()
+
+    def on_auth_error(self, error_message):
+        self.set_busy(False)
+        QMessageBox.critical(self, 'Error', f'Terjadi kesalahan: {error_message}')
+
     def login(self):
         username = self.username_input.text()
         password = self.password_input.text()
-        
-        user_id = self.auth.login(username, password)
+        self.run_auth_task('login', username, password, self.on_login_finished)
+
+    def on_login_finished(self, user_id):
+        self.set_busy(False)
         if user_id:
+            if self.remember_checkbox.isChecked():
+                save_session_token(self.auth.create_session(user_id))
             self.main_window.set_user_id(user_id)
             self.main_window.show_fullscreen()
             self.window().close()
@@ -147,7 +212,11 @@ class AuthWidget(QWidget):
             QMessageBox.warning(self, 'Registration Failed', 'Passwords do not match')
             return
 
-        if self.auth.register(username, password):
+        self.run_auth_task('register', username, password, self.on_register_finished)
+
+    def on_register_finished(self, success):
+        self.set_busy(False)
+        if success:
             QMessageBox.information(self, 'Registration Successful', 'You can now login with your new account')
             self.switch_view(None)
         else:
@@ -159,7 +228,7 @@ class AuthWidget(QWidget):
 class LoginWindow(QWidget):
     def __init__(self, main_window):
         super().__init__()
-        self.auth = Auth()
+        self.auth = open_auth()
         self.main_window = main_window
         self.init_ui()
         self.center_on_screen()
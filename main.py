@@ -1,8 +1,16 @@
 import sys
+import profiler
+import db_stats
+
+# Profiler harus aktif sebelum modul lain diimpor agar waktu import tercatat
+profiler.enable_from_args(sys.argv)
+db_stats.enable_from_args(sys.argv)
+
 from PyQt5.QtWidgets import QApplication
 from PyQt5.QtGui import QFont
 from main_window import MainWindow
 from login_window import LoginWindow
+from auth import open_auth, load_session_token, clear_session_token
 from error_handling import setup_error_handling
 
 def set_app_style(app):
@@ -18,8 +26,22 @@ if __name__ == "__main__":
     setup_error_handling()
     set_app_style(app)
     
-    main_window = MainWindow()
-    login_window = LoginWindow(main_window)
-    login_window.show()
+    with profiler.section("startup"):
+        main_window = MainWindow()
+
+        # Sesi yang diingat langsung membuka jendela utama tanpa hashing password
+        auth = open_auth()
+        token = load_session_token()
+        user_id = auth.validate_session(token) if token else None
+        auth.close()
+
+        if user_id:
+            main_window.set_user_id(user_id)
+            main_window.show_fullscreen()
+        else:
+            if token:
+                clear_session_token()
+            login_window = LoginWindow(main_window)
+            login_window.show()
     
     sys.exit(app.exec_())
\ No newline at end of file
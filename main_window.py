@@ -1,26 +1,66 @@
 from PyQt5.QtWidgets import QMainWindow, QHBoxLayout, QWidget, QVBoxLayout, QLabel, QStackedWidget, QLineEdit, QMessageBox
 from PyQt5.QtGui import QIcon, QFont
-from PyQt5.QtCore import Qt, QSize
-from dialogs import BackupDialog
+from PyQt5.QtCore import Qt, QSize, QThread, QTimer, pyqtSignal
+from dialogs import BackupDialog, ReportDialog
 from table_views import ConsumerTable, SalesTable, TukangTable, MaterialTable
+from dashboard import DashboardPage
+from database import open_database
+from auth import open_auth, load_session_token, clear_session_token
+from backup import DEFAULT_INTERVAL_MINUTES, last_snapshot, run_scheduled_backup
+from settings import get_setting
+from login_window import LoginWindow
 from modern_button import ModernButton
-from error_handling import setup_error_handling
+import profiler
 import os
 import subprocess
+from datetime import datetime
 import sys
 
+class CacheWarmupWorker(QThread):
+    def __init__(self, user_id):
+        super().__init__()
+        self.user_id = user_id
+
+    def run(self):
+        # Menjalankan migrasi dan membaca data pengguna di latar belakang
+        # agar cache SQLite dan disk sudah hangat saat tabel pertama dimuat
+        db = open_database()
+        db.get_consumers(user_id=self.user_id)
+        db.get_sales_list(self.user_id)
+        db.get_tukang_list(self.user_id)
+        db.get_projects(self.user_id)
+        # Foto dari tutup buku yang terputus sebelum selesai dipindahkan sekarang
+        db.relocate_photos()
+        db.close()
+
+class ScheduledBackupWorker(QThread):
+    finished = pyqtSignal(str)
+    error = pyqtSignal(str)
+
+    def run(self):
+        # Snapshot dibaca bertahap dengan jeda agar input data tetap lancar
+        try:
+            path, _ = run_scheduled_backup()
+            self.finished.emit(path or '')
+        except Exception as e:
+            self.error.emit(str(e))
+
 class MainWindow(QMainWindow):
+    @profiler.timed
     def __init__(self):
         super().__init__()
-        setup_error_handling()
         self.setWindowTitle("Manajemen Proyek")
         self.setGeometry(100, 100, 1200, 800)
         self.setWindowIcon(QIcon('image/icon.png'))
 
         self.main_layout = QHBoxLayout()
+        self.user_id = None
+        self.warmup_worker = None
+        self.backup_worker = None
         
         self.setup_sidebar()
         self.setup_main_area()
+        self.setup_backup_schedule()
         
         central_widget = QWidget()
         central_widget.setLayout(self.main_layout)
@@ -29,20 +69,27 @@ class MainWindow(QMainWindow):
         self.dark_mode = False
         self.toggle_theme()
 
-        self.user_id = None
-
     def set_user_id(self, user_id):
         self.user_id = user_id
-        self.consumer_table.set_user_id(user_id)
-        self.sales_table.set_user_id(user_id)
-        self.tukang_table.set_user_id(user_id)
-        self.material_table.set_user_id(user_id)
+        if self.warmup_worker is None or not self.warmup_worker.isRunning():
+            self.warmup_worker = CacheWarmupWorker(user_id)
+            self.warmup_worker.start()
+        # Tabel dimuat setelah jendela sempat digambar
+        QTimer.singleShot(0, self.load_pages)
+
+    @profiler.action("login")
+    def load_pages(self):
+        # Hanya tab yang sedang tampil yang dimuat, tab lain dimuat saat pertama kali dibuka
+        for page in self.pages:
+            if page is not None:
+                page.set_user_id(self.user_id, load=False)
+        self.show_page(self.stack.currentIndex())
 
     def refresh_tables(self):
-        self.consumer_table.set_user_id(self.user_id)
-        self.sales_table.set_user_id(self.user_id)
-        self.tukang_table.set_user_id(self.user_id)
-        self.material_table.set_user_id(self.user_id)
+        # Tab lain diperiksa saat dibuka, jadi cukup tab yang sedang tampil
+        page = self.pages[self.stack.currentIndex()]
+        if page is not None:
+            page.refresh_if_changed()
 
     def show_fullscreen(self):
         self.showMaximized()
@@ -62,6 +109,11 @@ class MainWindow(QMainWindow):
         self.add_sidebar_button("Daftar Proyek Sales", 1, "briefcase")
         self.add_sidebar_button("Daftar Proyek Tukang", 2, "tools")
         self.add_sidebar_button("Daftar Pemakaian Bahan", 3, "box")
+        self.add_sidebar_button("Dashboard", 4, "adjust")
+
+        self.report_button = ModernButton("Laporan Bulanan", "briefcase")
+        self.report_button.clicked.connect(self.open_report_dialog)
+        self.sidebar_layout.addWidget(self.report_button)
 
         self.sidebar_layout.addStretch()
         
@@ -73,29 +125,65 @@ class MainWindow(QMainWindow):
         self.backup_button.clicked.connect(self.open_backup_dialog)
         self.sidebar_layout.addWidget(self.backup_button)
 
+        self.backup_status_label = QLabel()
+        self.backup_status_label.setAlignment(Qt.AlignCenter)
+        self.backup_status_label.setWordWrap(True)
+        self.backup_status_label.setStyleSheet("font-size: 11px; margin-bottom: 6px;")
+        self.sidebar_layout.addWidget(self.backup_status_label)
+
         self.toggle_theme_btn = ModernButton("Toggle Dark/Light Mode", "adjust")
         self.toggle_theme_btn.clicked.connect(self.toggle_theme)
         self.sidebar_layout.addWidget(self.toggle_theme_btn)
 
+        self.logout_button = ModernButton("Logout", "user")
+        self.logout_button.clicked.connect(self.logout)
+        self.sidebar_layout.addWidget(self.logout_button)
+
         self.main_layout.addWidget(self.sidebar)
 
     def setup_main_area(self):
         self.stack = QStackedWidget()
-        self.consumer_table = ConsumerTable(self)
-        self.sales_table = SalesTable(self)
-        self.tukang_table = TukangTable(self)
-        self.material_table = MaterialTable(self)
-
-        self.stack.addWidget(self.consumer_table)
-        self.stack.addWidget(self.sales_table)
-        self.stack.addWidget(self.tukang_table)
-        self.stack.addWidget(self.material_table)
+        # Tabel baru dibuat saat halamannya pertama kali ditampilkan
+        self.page_classes = [ConsumerTable, SalesTable, TukangTable, MaterialTable, DashboardPage]
+        self.pages = [None] * len(self.page_classes)
+        for _ in self.page_classes:
+            self.stack.addWidget(QWidget())
 
         self.main_layout.addWidget(self.stack)
 
+    def get_page(self, index):
+        if self.pages[index] is None:
+            page = self.page_classes[index](self)
+            page.data_changed.connect(lambda tables, source=page: self.mark_pages_dirty(tables, source))
+            if self.user_id is not None:
+                page.set_user_id(self.user_id, load=False)
+            placeholder = self.stack.widget(index)
+            self.stack.insertWidget(index, page)
+            self.stack.removeWidget(placeholder)
+            placeholder.deleteLater()
+            self.pages[index] = page
+        return self.pages[index]
+
+    def show_page(self, index):
+        page = self.get_page(index)
+        # Tab yang ditandai dimuat ulang; selain itu cukup membandingkan counter perubahan
+        page.refresh_if_changed()
+        self.stack.setCurrentIndex(index)
+
+    def mark_pages_dirty(self, tables, source):
+        current = self.stack.currentWidget()
+        for page in self.pages:
+            if page is None or page is source:
+                continue
+            if set(tables) & set(page.watched_tables):
+                if page is current:
+                    page.refresh_if_changed()
+                else:
+                    page.mark_dirty()
+
     def add_sidebar_button(self, name, index, icon):
         btn = ModernButton(name, icon)
-        btn.clicked.connect(lambda: self.stack.setCurrentIndex(index))
+        btn.clicked.connect(lambda: self.show_page(index))
         self.sidebar_layout.addWidget(btn)
 
     def toggle_theme(self):
@@ -179,9 +267,77 @@ class MainWindow(QMainWindow):
         """)
         self.dark_mode = not self.dark_mode
 
+    def logout(self):
+        # Cabut sesi yang diingat agar aplikasi kembali meminta password
+        token = load_session_token()
+        if token:
+            auth = open_auth()
+            auth.revoke_session(token)
+            auth.close()
+            clear_session_token()
+
+        self.user_id = None
+        self.hide()
+        self.login_window = LoginWindow(self)
+        self.login_window.show()
+
     def open_backup_dialog(self):
         dialog = BackupDialog(self)
         dialog.exec_()
+        self.update_backup_status()
+
+    def local_backup_enabled(self):
+        # Saat memakai server API database ada di komputer server, backup dijadwalkan di sana
+        return not get_setting('api_url')
+
+    def setup_backup_schedule(self):
+        self.backup_timer = QTimer(self)
+        self.backup_timer.timeout.connect(self.start_scheduled_backup)
+        interval = get_setting('backup_interval_minutes', DEFAULT_INTERVAL_MINUTES)
+        if self.local_backup_enabled() and interval:
+            self.backup_timer.start(int(interval * 60 * 1000))
+        self.update_backup_status()
+
+    def update_backup_status(self, error_message=None):
+        if error_message:
+            self.backup_status_label.setText("Backup otomatis gagal")
+            self.backup_status_label.setToolTip(error_message)
+            return
+        if not self.local_backup_enabled():
+            self.backup_status_label.setText("")
+            return
+        path, entry = last_snapshot()
+        if entry:
+            created_at = datetime.fromisoformat(entry['created_at']).strftime("%d-%m-%Y %H:%M")
+            self.backup_status_label.setText(f"Backup terakhir: {created_at}")
+            self.backup_status_label.setToolTip(path)
+        else:
+            self.backup_status_label.setText("Belum ada backup")
+            self.backup_status_label.setToolTip("")
+
+    def start_scheduled_backup(self):
+        if self.backup_worker is not None and self.backup_worker.isRunning():
+            return
+        self.backup_worker = ScheduledBackupWorker()
+        self.backup_worker.finished.connect(lambda path: self.update_backup_status())
+        self.backup_worker.error.connect(self.update_backup_status)
+        self.backup_worker.start()
+
+    def closeEvent(self, event):
+        # Snapshot terakhir diambil saat aplikasi ditutup, tanpa jeda karena tidak ada input lagi
+        self.backup_timer.stop()
+        if self.backup_worker is not None:
+            self.backup_worker.wait()
+        if self.user_id is not None and self.local_backup_enabled() and get_setting('backup_on_close', True):
+            try:
+                run_scheduled_backup(reason='tutup aplikasi', throttle=False)
+            except Exception as e:
+                print(f"Backup saat menutup aplikasi gagal: {str(e)}")
+        event.accept()
+
+    def open_report_dialog(self):
+        dialog = ReportDialog(self.user_id, self)
+        dialog.exec_()
     
     def check_for_updates(self):
         update_exe = 'update.exe'
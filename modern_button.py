@@ -2,12 +2,10 @@ from PyQt5.QtWidgets import QPushButton
 from PyQt5.QtGui import QFont, QIcon
 from PyQt5.QtCore import QSize
 from PyQt5.QtCore import Qt
-from error_handling import setup_error_handling
 
 class ModernButton(QPushButton):
     def __init__(self, text, icon_name=None, parent=None):
         super().__init__(text, parent)
-        setup_error_handling()
         self.setFont(QFont("Arial", 10))
         self.setCursor(Qt.PointingHandCursor)
         
@@ -0,0 +1,151 @@
+import atexit
+import builtins
+import cProfile
+import functools
+import inspect
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILE_ENV_VAR = 'APP_PROFILE'
+PROFILE_FLAG = '--profile'
+PROFILE_DIR = 'profile'
+
+_enabled = False
+_output_dir = PROFILE_DIR
+_original_import = None
+_profiler_active = False
+_import_times = {}
+_constructor_times = []
+_action_times = {}
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable_from_args(argv=None):
+    argv = sys.argv if argv is None else argv
+    if PROFILE_FLAG in argv:
+        argv.remove(PROFILE_FLAG)
+        enable()
+    elif os.environ.get(PROFILE_ENV_VAR, '') not in ('', '0'):
+        enable()
+    return _enabled
+
+
+def enable(output_dir=PROFILE_DIR):
+    global _enabled, _output_dir, _original_import
+    if _enabled:
+        return
+    _enabled = True
+    _output_dir = os.path.join(output_dir, datetime.now().strftime("%Y%m%d_%H%M%S"))
+    os.makedirs(_output_dir, exist_ok=True)
+
+    _original_import = builtins.__import__
+    builtins.__import__ = _timed_import
+    atexit.register(write_summary)
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    # Hanya modul yang belum pernah dimuat yang diukur (waktu inklusif)
+    if level != 0 or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _import_times.setdefault(name, time.perf_counter() - start)
+
+
+def _slot_args(func, args):
+    # Sinyal PyQt (mis. clicked) mengirim argumen tambahan; buang jika fungsi tidak menerimanya
+    code = func.__code__
+    if code.co_flags & inspect.CO_VARARGS:
+        return args
+    return args[:code.co_argcount]
+
+
+def timed(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        args = _slot_args(func, args)
+        if not _enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            name = func.__qualname__
+            if args and func.__name__ == '__init__' and type(args[0]).__name__ != name.split('.')[0]:
+                name = f"{name} [{type(args[0]).__name__}]"
+            _constructor_times.append((name, time.perf_counter() - start))
+    return wrapper
+
+
+def action(name):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            args = _slot_args(func, args)
+            if not _enabled:
+                return func(*args, **kwargs)
+            with section(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def section(name):
+    global _profiler_active
+    if not _enabled:
+        yield
+        return
+
+    profile = None
+    if not _profiler_active:
+        profile = cProfile.Profile()
+        _profiler_active = True
+        profile.enable()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        calls = _action_times.setdefault(name, [])
+        calls.append(elapsed)
+        if profile is not None:
+            profile.disable()
+            _profiler_active = False
+            profile.dump_stats(os.path.join(_output_dir, f"{name}_{len(calls)}.prof"))
+
+
+def write_summary():
+    if not _enabled:
+        return None
+
+    lines = [f"Profil aplikasi - {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}", ""]
+
+    lines.append("Waktu import (inklusif, 25 teratas):")
+    for module, elapsed in sorted(_import_times.items(), key=lambda item: item[1], reverse=True)[:25]:
+        lines.append(f"  {elapsed * 1000:9.1f} ms  {module}")
+    lines.append("")
+
+    lines.append("Konstruktor:")
+    for name, elapsed in _constructor_times:
+        lines.append(f"  {elapsed * 1000:9.1f} ms  {name}")
+    lines.append("")
+
+    lines.append("Aksi (jumlah, total, maks):")
+    for name, calls in sorted(_action_times.items(), key=lambda item: sum(item[1]), reverse=True):
+        lines.append(f"  {name}: {len(calls)}x, total {sum(calls) * 1000:.1f} ms, maks {max(calls) * 1000:.1f} ms")
+    lines.append("")
+    lines.append(f"File .prof tersimpan di {os.path.abspath(_output_dir)} (buka dengan pstats atau snakeviz).")
+
+    summary_path = os.path.join(_output_dir, 'summary.txt')
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    return summary_path
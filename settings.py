@@ -0,0 +1,13 @@
+import json
+import os
+
+CONFIG_FILE = 'config.json'
+
+def load_config():
+    if not os.path.exists(CONFIG_FILE):
+        return {}
+    with open(CONFIG_FILE, 'r') as f:
+        return json.load(f)
+
+def get_setting(key, default=None):
+    return load_config().get(key, default)
@@ -0,0 +1,235 @@
+import json
+import os
+from datetime import datetime
+
+from database import TRACKED_TABLES
+
+# Sinkronisasi antar komputer toko lewat file: setiap komputer mengekspor perubahan miliknya sendiri
+# sejak nomor urut terakhir yang sudah diterima komputer lain, lalu file itu diimpor di sana
+SYNC_FORMAT = 1
+FOREIGN_KEYS = {
+    'sales_projects': {'sales_id': 'sales'},
+    'worker_projects': {'tukang_id': 'tukang'},
+    'materials_usage': {'project_id': 'projects'},
+}
+BOOK_SUFFIXES = {'projects': '_projects', 'materials_usage': '_materials'}
+
+
+class SyncError(Exception):
+    pass
+
+
+def get_node_id(db):
+    return db.get_sync_state('node_id')
+
+
+def get_peers(db):
+    db.cursor.execute("SELECT node_id, imported_seq, acked_seq FROM sync_peers ORDER BY node_id")
+    return db.cursor.fetchall()
+
+
+def default_since(db):
+    # Perubahan yang sudah diterima semua komputer lain tidak perlu dikirim lagi
+    acked = [acked_seq for _, _, acked_seq in get_peers(db)]
+    return min(acked) if acked else 0
+
+
+def prune_change_log(db):
+    # Entri yang sudah diterima semua komputer lain tidak perlu dikirim lagi. Entri terakhir tiap baris tetap
+    # disimpan sebagai cap waktu untuk penentuan pemenang, isi baris yang sudah dihapus dikosongkan
+    db.cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log")
+    floor = db.cursor.fetchone()[0]
+    acked = [acked_seq for _, _, acked_seq in get_peers(db)]
+    floor = min(acked + [floor])
+    db.cursor.execute('''
+    DELETE FROM change_log WHERE seq <= ?
+    AND seq NOT IN (SELECT MAX(seq) FROM change_log GROUP BY table_name, row_id)
+    ''', (floor,))
+    pruned = db.cursor.rowcount
+    db.cursor.execute("UPDATE change_log SET data = NULL, book = NULL WHERE seq <= ? AND op = 'delete' AND data IS NOT NULL", (floor,))
+    return pruned
+
+
+def export_changes(db, path, since=None):
+    node_id = get_node_id(db)
+    since = default_since(db) if since is None else since
+    db.cursor.execute('''
+    SELECT seq, changed_at, table_name, row_id, op, data, book FROM change_log
+    WHERE seq > ? AND node_id = ? ORDER BY seq
+    ''', (since, node_id))
+    changes = [{'seq': seq, 'changed_at': changed_at, 'table': table_name, 'id': row_id, 'op': op,
+                'data': json.loads(data) if data else None, 'book': book}
+               for seq, changed_at, table_name, row_id, op, data, book in db.cursor.fetchall()]
+    db.cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log")
+    until = max(db.cursor.fetchone()[0], since)
+
+    # Pasangan id agar komputer tujuan tahu baris mana yang dulu berasal darinya
+    ids = {}
+    db.cursor.execute("SELECT node_id, table_name, local_id, remote_id FROM sync_ids ORDER BY node_id, table_name, local_id")
+    for peer, table_name, local_id, remote_id in db.cursor.fetchall():
+        ids.setdefault(peer, []).append([table_name, local_id, remote_id])
+
+    batch = {
+        'format': SYNC_FORMAT,
+        'node_id': node_id,
+        'since': since,
+        'until': until,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'acks': {peer: imported_seq for peer, imported_seq, _ in get_peers(db)},
+        'ids': ids,
+        'changes': changes,
+    }
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(batch, f, ensure_ascii=False)
+    os.replace(temp_path, path)
+    return len(changes), since, until
+
+
+def read_batch(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        batch = json.load(f)
+    if batch.get('format') != SYNC_FORMAT:
+        raise SyncError(f"Format file sinkronisasi tidak didukung: {batch.get('format')}")
+    return batch
+
+
+class BatchImporter:
+    def __init__(self, db, batch):
+        self.db = db
+        self.batch = batch
+        self.source = batch['node_id']
+        # id di komputer pengirim yang sebenarnya berasal dari komputer ini
+        self.aliases = {(table_name, remote_id): local_id
+                        for table_name, remote_id, local_id in batch['ids'].get(get_node_id(db), [])}
+        self.columns = {}
+        self.books = set()
+
+    def table_columns(self, table_name):
+        if table_name not in self.columns:
+            self.columns[table_name] = self.db.get_table_columns(table_name)
+        return self.columns[table_name]
+
+    def resolve_id(self, table_name, remote_id):
+        if (table_name, remote_id) in self.aliases:
+            return self.aliases[(table_name, remote_id)]
+        self.db.cursor.execute("SELECT local_id FROM sync_ids WHERE node_id = ? AND table_name = ? AND remote_id = ?",
+                               (self.source, table_name, remote_id))
+        result = self.db.cursor.fetchone()
+        return result[0] if result else None
+
+    def translate(self, table_name, data):
+        # Kolom yang belum ada di database ini diabaikan, id tabel induk diganti ke id lokal
+        values = {column: value for column, value in data.items() if column in self.table_columns(table_name)}
+        for column, parent in FOREIGN_KEYS.get(table_name, {}).items():
+            if values.get(column) is not None:
+                local_id = self.resolve_id(parent, values[column])
+                values[column] = values[column] if local_id is None else local_id
+        return values
+
+    def local_stamp(self, table_name, row_id):
+        self.db.cursor.execute('''
+        SELECT changed_at, node_id FROM change_log WHERE table_name = ? AND row_id = ? ORDER BY seq DESC LIMIT 1
+        ''', (table_name, row_id))
+        return self.db.cursor.fetchone()
+
+    def row_exists(self, table_name, row_id):
+        self.db.cursor.execute(f"SELECT 1 FROM {table_name} WHERE id = ?", (row_id,))
+        return self.db.cursor.fetchone() is not None
+
+    def insert_row(self, table_name, values):
+        columns = ', '.join(f'"{column}"' for column in values)
+        placeholders = ', '.join('?' for _ in values)
+        self.db.cursor.execute(f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})", list(values.values()))
+        return self.db.cursor.lastrowid
+
+    def update_row(self, table_name, row_id, values):
+        assignments = [f'"{column}" = ?' for column in values if column not in ('id', 'version')]
+        if 'version' in self.table_columns(table_name):
+            assignments.append("version = version + 1")
+        params = [value for column, value in values.items() if column not in ('id', 'version')]
+        self.db.cursor.execute(f"UPDATE {table_name} SET {', '.join(assignments)} WHERE id = ?", params + [row_id])
+
+    def archive_row(self, table_name, book, values):
+        # Tutup buku di komputer pengirim: baris ikut dipindah ke buku dengan nama yang sama di sini
+        book_table = book + BOOK_SUFFIXES.get(table_name, '')
+        if not self.db.find_book_tables(book_table):
+            self.db.cursor.execute(f"CREATE TABLE {book_table} AS SELECT {self.db.backup_columns(table_name)} FROM {table_name} WHERE 0")
+        book_columns = self.db.get_table_columns(book_table)
+        self.insert_row(book_table, {column: value for column, value in values.items() if column in book_columns})
+        self.db.touch_closed_book(book_table)
+        self.books.add(book_table)
+
+    def apply(self, change):
+        table_name = change['table']
+        if table_name not in TRACKED_TABLES:
+            return False
+        values = self.translate(table_name, change['data'] or {})
+        local_id = self.resolve_id(table_name, change['id'])
+
+        if change['op'] == 'insert' and local_id is None:
+            values.pop('id', None)
+            local_id = self.insert_row(table_name, values)
+            self.db.cursor.execute("INSERT OR REPLACE INTO sync_ids (node_id, table_name, remote_id, local_id) VALUES (?, ?, ?, ?)",
+                                   (self.source, table_name, change['id'], local_id))
+            return True
+
+        # Baris yang sudah ada sejak database disalin memakai id yang sama di kedua komputer
+        local_id = change['id'] if local_id is None else local_id
+        values['id'] = local_id
+        # Perubahan terbaru yang menang; jika waktunya sama, node_id yang lebih besar menang di semua komputer
+        stamp = self.local_stamp(table_name, local_id)
+        if stamp and tuple(stamp) >= (change['changed_at'], self.source):
+            return False
+
+        exists = self.row_exists(table_name, local_id)
+        if change['op'] == 'delete':
+            if exists:
+                if change.get('book'):
+                    self.archive_row(table_name, change['book'], values)
+                self.db.cursor.execute(f"DELETE FROM {table_name} WHERE id = ?", (local_id,))
+            return exists
+        if exists:
+            self.update_row(table_name, local_id, values)
+        else:
+            self.insert_row(table_name, values)
+        return True
+
+    def run(self):
+        applied = skipped = 0
+        peer = dict((node_id, (imported_seq, acked_seq)) for node_id, imported_seq, acked_seq in get_peers(self.db))
+        imported_seq = peer.get(self.source, (0, 0))[0]
+        if self.batch['since'] > imported_seq:
+            raise SyncError(f"Ada perubahan yang terlewat dari komputer {self.source}; minta ekspor dengan --since {imported_seq}")
+
+        self.db.begin_immediate()
+        try:
+            for change in self.batch['changes']:
+                if change['seq'] <= imported_seq:
+                    continue
+                self.db.set_sync_state('apply_node', self.source)
+                self.db.set_sync_state('apply_time', change['changed_at'])
+                if self.apply(change):
+                    applied += 1
+                else:
+                    skipped += 1
+            self.db.set_sync_state('apply_node', None)
+            self.db.set_sync_state('apply_time', None)
+            self.db.cursor.execute('''
+            INSERT INTO sync_peers (node_id, imported_seq, acked_seq) VALUES (?, ?, ?)
+            ON CONFLICT(node_id) DO UPDATE SET imported_seq = MAX(imported_seq, excluded.imported_seq),
+                                               acked_seq = MAX(acked_seq, excluded.acked_seq)
+            ''', (self.source, self.batch['until'], self.batch['acks'].get(get_node_id(self.db), 0)))
+            prune_change_log(self.db)
+            self.db.conn.commit()
+        except Exception:
+            self.db.conn.rollback()
+            raise
+        return applied, skipped
+
+
+def import_changes(db, path):
+    batch = read_batch(path)
+    if batch['node_id'] == get_node_id(db):
+        raise SyncError("File sinkronisasi ini dibuat oleh komputer ini sendiri")
+    return BatchImporter(db, batch).run()
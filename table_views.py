@@ -1,15 +1,12 @@
-from PyQt5.QtWidgets import QWidget, QFrame , QComboBox, QDialogButtonBox, QVBoxLayout, QLabel, QTableWidget, QTextEdit, QTableWidgetItem, QHeaderView, QHBoxLayout, QLineEdit, QPushButton, QFileDialog, QMessageBox, QInputDialog, QDateEdit, QSpacerItem, QDialog, QSizePolicy, QListWidgetItem, QListWidget
+from PyQt5.QtWidgets import QWidget, QFrame , QComboBox, QDialogButtonBox, QVBoxLayout, QLabel, QTableWidget, QTextEdit, QTableWidgetItem, QHeaderView, QHBoxLayout, QLineEdit, QPushButton, QFileDialog, QMessageBox, QInputDialog, QDateEdit, QSpacerItem, QDialog, QSizePolicy, QListWidgetItem, QListWidget, QProgressDialog
 from PyQt5.QtGui import QFont, QPixmap, QColor, QTransform
-from PyQt5.QtCore import Qt, QDate
-import openpyxl
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font, Alignment
+from PyQt5.QtCore import Qt, QDate, pyqtSignal
 from datetime import datetime
 import os
 
-from dialogs import AddConsumerDialog, ProjectInputDialog, AddMaterialDialog, AddSalesProjectDialog, AddTukangProjectDialog
-from database import DatabaseManager, COLUMN_MAPPINGS
-from error_handling import setup_error_handling
+from dialogs import AddConsumerDialog, ProjectInputDialog, AddMaterialDialog, AddSalesProjectDialog, AddTukangProjectDialog, CloseBookWorker
+from database import open_database, COLUMN_MAPPINGS
+import profiler
 
 def format_backup_name(backup_name, table_type, person_name=None):
     parts = backup_name.split('_')
@@ -34,17 +31,26 @@ def format_rupiah(value):
         return value  # Return original value if conversion fails
 
 class TableWidget(QWidget):
+    data_changed = pyqtSignal(tuple)
+
+    @profiler.timed
     def __init__(self, table_name, parent=None):
         super().__init__(parent)
-        setup_error_handling()
         self.table_name = table_name
-        self.db = DatabaseManager()
+        self.db = open_database()
         self.is_viewing_history = False
         self.current_book_name = None
         self.user_id = None
+        self.watched_tables = (table_name,)
+        self.last_data_version = None
+        self.last_change_counters = None
+        self.dirty = True
+        self.history_pages = None
+        self.add_history_page_row = None
         self.setup_ui()
 
         self.table.cellDoubleClicked.connect(self.show_full_note)
+        self.table.verticalScrollBar().valueChanged.connect(self.on_history_scroll)
 
     def setup_ui(self):
         self.layout = QVBoxLayout(self)
@@ -138,10 +144,62 @@ class TableWidget(QWidget):
 
         self.layout.addLayout(self.button_layout)
 
-    def set_user_id(self, user_id):
+    def set_user_id(self, user_id, load=True):
         self.user_id = user_id
+        self.dirty = True
+        if load:
+            self.load_data()
+
+    def mark_dirty(self):
+        # Tab yang tidak tampil hanya ditandai; datanya dimuat ulang saat tab itu dibuka
+        self.dirty = True
+
+    def remember_changes(self):
+        # Dipanggil setiap selesai memuat data agar refresh berikutnya bisa dilewati bila tidak ada perubahan
+        previous = self.last_change_counters
+        self.last_data_version = self.db.get_data_version()
+        self.last_change_counters = self.db.get_change_counters(self.watched_tables)
+        self.dirty = False
+        if previous:
+            changed = tuple(table for table, counter in self.last_change_counters.items() if previous.get(table) != counter)
+            if changed:
+                self.data_changed.emit(changed)
+
+    def refresh_if_changed(self):
+        if self.user_id is None:
+            return False
+        if self.dirty or self.last_change_counters is None:
+            self.load_data()
+            return True
+        data_version = self.db.get_data_version()
+        if data_version is not None and data_version == self.last_data_version:
+            return False
+        counters = self.db.get_change_counters(self.watched_tables)
+        self.last_data_version = data_version
+        if counters == self.last_change_counters:
+            return False
+        self.refresh_changed_rows()
+        return True
+
+    def refresh_changed_rows(self):
         self.load_data()
-    
+
+    def set_row_key(self, row, record_id, version):
+        # ID dan version baris disimpan di item kolom pertama untuk cek bentrok saat edit
+        item = self.table.item(row, 0)
+        if item is not None:
+            item.setData(Qt.UserRole, (record_id, version))
+
+    def get_row_key(self, row):
+        item = self.table.item(row, 0)
+        key = item.data(Qt.UserRole) if item is not None else None
+        return tuple(key) if key else (None, None)
+
+    def show_conflict_message(self):
+        QMessageBox.warning(self, "Data Sudah Berubah",
+                            "Data ini sudah diubah atau dihapus dari komputer lain. Data terbaru akan dimuat ulang, silakan ulangi perubahan Anda.")
+        self.load_data()
+
     def add_to_closed_book(self, data):
         header_labels = [self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount())]
         data_dict = dict(zip(header_labels, data))
@@ -154,6 +212,8 @@ class TableWidget(QWidget):
 
     def filter_table(self):
         search_text = self.search_input.text().lower()
+        if search_text:
+            self.load_all_history()
         for row in range(self.table.rowCount()):
             match = False
             for column in range(self.table.columnCount()):
@@ -163,6 +223,7 @@ class TableWidget(QWidget):
                     break
             self.table.setRowHidden(row, not match)
 
+    @profiler.action("close_book")
     def close_book(self):
         # Check if the table is empty
         if self.table.rowCount() == 0:
@@ -172,29 +233,105 @@ class TableWidget(QWidget):
         reply = QMessageBox.question(self, 'Tutup Buku', 'Anda yakin ingin menutup buku? Ini akan membuat backup data saat ini dan menghapus semua data dari tabel.',
                                  QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
-            backup_name = self.db.close_book(self.table_name)
-            self.load_data()  # Reload the (now empty) table
-            QMessageBox.information(self, "Tutup Buku", f"Buku telah ditutup. Data lama telah dibackup ke {backup_name} dan tabel telah direset.")
+            self.start_close_book('close_book', (self.table_name, self.user_id),
+                                  "Buku telah ditutup. Data lama telah dibackup ke {} dan tabel telah direset.")
+
+    def start_close_book(self, method, args, message):
+        # Tutup buku berjalan di thread lain dengan dialog progres, tabel dimuat ulang setelah selesai
+        self.close_book_button.setEnabled(False)
+        self.close_book_progress = QProgressDialog("Menutup buku...", None, 0, 100, self)
+        self.close_book_progress.setWindowTitle("Tutup Buku")
+        self.close_book_progress.setWindowModality(Qt.WindowModal)
+        self.close_book_progress.setMinimumDuration(0)
+        self.close_book_worker = CloseBookWorker(method, args)
+        self.close_book_worker.progress.connect(self.on_close_book_progress)
+        self.close_book_worker.result.connect(lambda backup_name, photo_warning: self.on_close_book_finished(message.format(backup_name), photo_warning))
+        self.close_book_worker.error.connect(self.on_close_book_error)
+        self.close_book_worker.start()
+
+    def on_close_book_progress(self, value, text):
+        self.close_book_progress.setLabelText(text)
+        self.close_book_progress.setValue(value)
+
+    def on_close_book_finished(self, message, photo_warning=''):
+        self.close_book_progress.close()
+        self.close_book_button.setEnabled(True)
+        self.load_data()  # Reload the (now empty) table
+        QMessageBox.information(self, "Tutup Buku", message)
+        if photo_warning:
+            QMessageBox.warning(self, "Tutup Buku", photo_warning)
+
+    def on_close_book_error(self, error_message):
+        self.close_book_progress.close()
+        self.close_book_button.setEnabled(True)
+        self.load_data()
+        QMessageBox.critical(self, "Tutup Buku", f"Gagal menutup buku, data tidak diubah: {error_message}")
 
+    @profiler.action("view_history")
     def view_history(self):
         closed_books = self.db.get_closed_books(self.table_name)
         if closed_books:
             book, ok = QInputDialog.getItem(self, "Pilih Riwayat", f"Riwayat {self.title_label.text()}:", closed_books, 0, False)
             if ok:
-                data = self.db.load_closed_book(book)
-                self.display_history(data, book)
+                self.display_history(book)
         else:
             QMessageBox.information(self, "Tidak Ada Data", "Tidak ada riwayat tersimpan untuk tabel ini.")
 
-    def display_history(self, data, book_name):
+    def start_history_paging(self, backup_table_name, add_row=None, project_id=None):
+        # Buku yang ditutup dimuat per halaman, halaman berikutnya diambil saat tabel digulir ke bawah
+        self.history_pages = self.db.iter_closed_book(backup_table_name, project_id=project_id, with_rowid=True)
+        self.add_history_page_row = add_row or self.add_history_row
+        self.load_more_history()
+
+    def load_more_history(self):
+        if self.history_pages is None:
+            return False
+        # Generator dilepas selama halaman ditambahkan agar sinyal scroll dari insertRow tidak memuat halaman bersarang
+        pages, self.history_pages = self.history_pages, None
+        rows = next(pages, None)
+        if rows is None:
+            return False
+        for row in rows:
+            self.add_history_page_row(row[1:])
+            self.set_row_key(self.table.rowCount() - 1, row[0], None)  # rowid buku untuk edit/hapus
+        self.history_pages = pages
+        return True
+
+    def load_all_history(self):
+        while self.load_more_history():
+            pass
+
+    def on_history_scroll(self, value):
+        scroll_bar = self.table.verticalScrollBar()
+        if self.is_viewing_history and self.history_pages is not None and value >= scroll_bar.maximum() - scroll_bar.pageStep():
+            self.load_more_history()
+
+    def update_history_buttons(self, archive_name=None):
+        # Buku yang sudah dipindah ke file arsip dibuka read-only
+        editable = not self.is_viewing_history or not self.db.get_archive_file(archive_name or self.current_book_name)
+        for button in (self.add_button, self.edit_button, self.delete_button):
+            button.setEnabled(editable)
+        return editable
+
+    def closed_book_row_at(self, row):
+        rowid, _ = self.get_row_key(row)
+        return self.db.get_closed_book_row(self.current_book_name, rowid) if rowid is not None else None
+
+    def closed_book_photo(self, closed_book_row):
+        # Buku lama bisa punya kolom tambahan (mis. version) setelah photo_path, jadi posisinya dicari dari nama kolom
+        columns = self.db.get_table_columns(self.current_book_name)
+        return closed_book_row[columns.index('photo_path')] if 'photo_path' in columns else None
+
+    def add_history_row(self, row_data):
+        row_position = self.table.rowCount()
+        self.table.insertRow(row_position)
+        for column, item in enumerate(row_data[1:]):  # Exclude id
+            self.table.setItem(row_position, column, QTableWidgetItem(str(item)))
+
+    def display_history(self, book_name):
         self.table.setRowCount(0)  # Clear the current table
         self.title_label.setText(f"Riwayat {self.title_label.text().split(' - ')[0]} - {book_name}")
-    
-        for row_data in data:
-            row_position = self.table.rowCount()
-            self.table.insertRow(row_position)
-            for column, item in enumerate(row_data[1:]):  # Exclude id
-                self.table.setItem(row_position, column, QTableWidgetItem(str(item)))
+        self.start_history_paging(book_name)
     
         self.close_book_button.hide()
         self.view_history_button.hide()
@@ -206,6 +343,7 @@ class TableWidget(QWidget):
 
         self.current_book_name = book_name
         self.is_viewing_history = True
+        self.update_history_buttons()
 
     def return_to_current_data(self):
         self.title_label.setText(self.title_label.text().split(" - ")[0])  # Remove the "Riwayat" part
@@ -214,20 +352,22 @@ class TableWidget(QWidget):
         self.load_data()
         self.close_book_button.show()
         self.view_history_button.show()
+        self.update_history_buttons()
         if self.return_button:
             self.return_button.setParent(None)  # Remove the return button
             self.return_button = None
 
     def load_data(self):
         self.table.setRowCount(0)  # Clear existing data
+        self.history_pages = None
         if self.is_viewing_history:
-            data = self.db.load_closed_book(self.current_book_name)
+            self.start_history_paging(self.current_book_name, lambda row_data: self.add_row(row_data[1:]))
         else:
             current_date = datetime.now()
             data = getattr(self.db, f"get_{self.table_name}")(year=current_date.year, month=current_date.month)
-        
-        for row_data in data:
-            self.add_row(row_data[1:])  # Exclude id
+            for row_data in data:
+                self.add_row(row_data[1:])  # Exclude id
+        self.remember_changes()
 
     def open_add_dialog(self):
         dialog = self.get_add_dialog()
@@ -265,11 +405,13 @@ class TableWidget(QWidget):
 
         if dialog.exec_():
             data = dialog.get_data()
+            # Key baris riwayat ada di item kolom pertama, jadi dibaca sebelum item diganti
+            closed_book_row = self.closed_book_row_at(selected_row) if self.is_viewing_history else None
             for col, item_text in enumerate(data):
                 self.table.setItem(selected_row, col, QTableWidgetItem(str(item_text) if item_text is not None else ""))
     
             if self.is_viewing_history:
-                record_id = self.db.load_closed_book(self.current_book_name)[selected_row][0]
+                record_id = closed_book_row[0]
                 header_labels = [self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount())]
                 data_dict = dict(zip(header_labels, data))
                 self.db.update_in_closed_book(self.current_book_name, record_id, data_dict)
@@ -292,10 +434,9 @@ class TableWidget(QWidget):
             selected_row = selected_items[0].row()
 
             if self.is_viewing_history:
-                closed_book_data = self.db.load_closed_book(self.current_book_name)
-                if selected_row < len(closed_book_data):
-                    record_id = closed_book_data[selected_row][0]
-                    self.db.delete_from_closed_book(self.current_book_name, record_id)
+                closed_book_row = self.closed_book_row_at(selected_row)
+                if closed_book_row:
+                    self.db.delete_from_closed_book(self.current_book_name, closed_book_row[0])
                 else:
                     QMessageBox.warning(self, "Error", "Tidak dapat menemukan data yang akan dihapus.")
                     return
@@ -310,52 +451,62 @@ class TableWidget(QWidget):
         self.table.removeRow(selected_row)
         QMessageBox.information(self, "Hapus Data", "Data berhasil dihapus.")
 
+    @profiler.action("export_to_excel")
     def export_to_excel(self):
         file_name, _ = QFileDialog.getSaveFileName(self, "Save Excel", "", "Excel Files (*.xlsx)")
         if file_name:
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-            
-            # Write headers
-            headers = [self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount()) if not self.table.isColumnHidden(i)]
-            for col, header in enumerate(headers, start=1):
-                cell = sheet.cell(row=1, column=col, value=header)
-                cell.font = Font(bold=True)
-            
-            # Write data
-            for row in range(self.table.rowCount()):
-                col_index = 1
-                for column in range(self.table.columnCount()):
-                    if not self.table.isColumnHidden(column):
-                        item = self.table.item(row, column)
-                        if item is not None:
-                            cell = sheet.cell(row=row+2, column=col_index, value=item.text())
-                            if headers[col_index-1] == "Keterangan":
-                                cell.alignment = Alignment(wrapText=True, vertical='top')
-                                cell = self.format_keterangan_cell(cell)
-                        else:
-                            sheet.cell(row=row+2, column=col_index, value='')
-                        col_index += 1
-
-            sheet.append([""] * sheet.max_column)            
-            self.add_additional_info(sheet)
-            
-            # Adjust column widths
-            for column in sheet.columns:
-                max_length = 0
-                column_letter = get_column_letter(column[0].column)
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(cell.value)
-                    except:
-                        pass
-                adjusted_width = (max_length + 2) * 1.2
-                sheet.column_dimensions[column_letter].width = adjusted_width
-            
-            workbook.save(file_name)
+            self.save_excel(file_name)
             QMessageBox.information(self, "Export Successful", f"Data has been exported to {file_name}")
 
+    def save_excel(self, file_name):
+        self.load_all_history()
+        # openpyxl cukup berat, jadi hanya diimpor saat export
+        import openpyxl
+        from openpyxl.utils import get_column_letter
+        from openpyxl.styles import Font, Alignment
+
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        
+        # Write headers
+        headers = [self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount()) if not self.table.isColumnHidden(i)]
+        for col, header in enumerate(headers, start=1):
+            cell = sheet.cell(row=1, column=col, value=header)
+            cell.font = Font(bold=True)
+        
+        # Write data
+        for row in range(self.table.rowCount()):
+            col_index = 1
+            for column in range(self.table.columnCount()):
+                if not self.table.isColumnHidden(column):
+                    item = self.table.item(row, column)
+                    if item is not None:
+                        cell = sheet.cell(row=row+2, column=col_index, value=item.text())
+                        if headers[col_index-1] == "Keterangan":
+                            cell.alignment = Alignment(wrapText=True, vertical='top')
+                            cell = self.format_keterangan_cell(cell)
+                    else:
+                        sheet.cell(row=row+2, column=col_index, value='')
+                    col_index += 1
+
+        sheet.append([""] * sheet.max_column)            
+        self.add_additional_info(sheet)
+        
+        # Adjust column widths
+        for column in sheet.columns:
+            max_length = 0
+            column_letter = get_column_letter(column[0].column)
+            for cell in column:
+                try:
+                    if len(str(cell.value)) > max_length:
+                        max_length = len(cell.value)
+                except:
+                    pass
+            adjusted_width = (max_length + 2) * 1.2
+            sheet.column_dimensions[column_letter].width = adjusted_width
+        
+        workbook.save(file_name)
+
     def format_keterangan_cell(self, cell, words_per_line=10):
         if cell.value:
             words = cell.value.split()
@@ -398,9 +549,9 @@ class TableWidget(QWidget):
             self.table.setItem(row_position, self.table.columnCount() - 1, QTableWidgetItem(str(data[0])))
 
 class ConsumerTable(TableWidget):
+    @profiler.timed
     def __init__(self, parent=None):
         super().__init__("consumers", parent)
-        setup_error_handling()
         self.title_label.setText("Daftar Konsumen")
         self.setup_table()
     
@@ -424,19 +575,66 @@ class ConsumerTable(TableWidget):
     def load_data(self):
         print("Memanggil fungsi load_data")  # Tambahkan log ini
         self.table.setRowCount(0)  # Clear existing data
+        self.history_pages = None
         if self.user_id:
             if self.is_viewing_history:
-                data = self.db.load_closed_book(self.current_book_name)
-            else:
-                data = self.db.get_consumers(year=None, month=None, user_id=self.user_id)
+                self.start_history_paging(self.current_book_name, self.add_consumer_row)
+                self.remember_changes()
+                return
+            data = self.db.get_consumers(year=None, month=None, user_id=self.user_id)
             if not data:
                 print("Data yang diterima dari database kosong")  # Tambahkan log ini
             else:
                 print(f"Data yang diterima dari database")  # Tambahkan log ini
             for row_data in data:
-                formatted_data = list(row_data[1:])  # Exclude id
-                formatted_data[5] = self.format_currency(formatted_data[5])  # Format total proyek
-                self.add_row(formatted_data)
+                self.add_consumer_row(row_data)
+                self.set_row_key(self.table.rowCount() - 1, row_data[0], row_data[-1])  # version kolom terakhir
+            self.remember_changes()
+
+    def add_consumer_row(self, row_data):
+        formatted_data = list(row_data[1:])  # Exclude id
+        formatted_data[5] = self.format_currency(formatted_data[5])  # Format total proyek
+        self.add_row(formatted_data)
+
+    def refresh_changed_rows(self):
+        # Hanya baris yang version-nya berubah, baris baru dan baris terhapus yang disentuh
+        row_by_id = {}
+        for row in range(self.table.rowCount()):
+            record_id, version = self.get_row_key(row)
+            row_by_id[record_id] = (row, version)
+        if self.is_viewing_history or not row_by_id or None in row_by_id:
+            self.load_data()
+            return
+
+        versions = self.db.get_row_versions('consumers', self.user_id)
+        current_ids = {record_id for record_id, _ in versions}
+        changed = [record_id for record_id, version in versions if record_id in row_by_id and row_by_id[record_id][1] != version]
+        added = [record_id for record_id, _ in versions if record_id not in row_by_id]
+        deleted_rows = sorted((row for record_id, (row, _) in row_by_id.items() if record_id not in current_ids), reverse=True)
+        if (added and min(added) < max(row_by_id)) or len(changed) + len(added) > len(versions) // 2:
+            self.load_data()
+            return
+
+        rows = {row_data[0]: row_data for row_data in self.db.get_consumers_by_ids(changed + added, self.user_id)}
+        for record_id in changed:
+            row = row_by_id[record_id][0]
+            row_data = rows[record_id]
+            for column, value in enumerate(row_data[1:len(COLUMN_MAPPINGS[self.table_name]) + 1]):
+                text = self.format_currency(value) if column == 5 else str(value)
+                self.table.setItem(row, column, QTableWidgetItem(text))
+            self.set_row_key(row, record_id, row_data[-1])
+        for row in deleted_rows:
+            self.table.removeRow(row)
+        for record_id in added:
+            row_data = rows[record_id]
+            formatted_data = list(row_data[1:])
+            formatted_data[5] = self.format_currency(formatted_data[5])
+            self.add_row(formatted_data)
+            self.set_row_key(self.table.rowCount() - 1, record_id, row_data[-1])
+
+        self.remember_changes()
+        if self.search_input.text():
+            self.filter_table()
     
     def add_row(self, data, new_id=None):
         row_position = self.table.rowCount()
@@ -482,9 +680,8 @@ class ConsumerTable(TableWidget):
                 self.load_data()
             else:
                 current_date = datetime.now()
-                new_id = self.db.insert_consumer(data, year=current_date.year, month=current_date.month, user_id=self.user_id)
-                self.add_row((new_id,) + tuple(data))
-                self.load_data()
+                self.db.insert_consumer(data, year=current_date.year, month=current_date.month, user_id=self.user_id)
+                self.refresh_changed_rows()
 
             QMessageBox.information(self, "Sukses", "Data konsumen berhasil ditambahkan.")
 
@@ -495,6 +692,8 @@ class ConsumerTable(TableWidget):
             return
 
         selected_row = selected_items[0].row()
+        record_id, version = self.get_row_key(selected_row)
+        closed_book_row = self.closed_book_row_at(selected_row) if self.is_viewing_history else None
         dialog = AddConsumerDialog(self)
 
         initial_data = []
@@ -530,13 +729,13 @@ class ConsumerTable(TableWidget):
                 self.table.setItem(selected_row, col, QTableWidgetItem(str(item_text) if item_text is not None else ""))
 
             if self.is_viewing_history:
-                record_id = self.db.load_closed_book(self.current_book_name)[selected_row][0]
+                record_id = closed_book_row[0]
                 self.db.update_in_closed_book(self.current_book_name, record_id, dict(zip(COLUMN_MAPPINGS['consumers'].keys(), data)))
                 self.load_data()  # Reload history data to reflect changes
             else:
-                consumers = self.db.get_consumers(user_id=self.user_id)
-                record_id = consumers[selected_row][0]
-                self.db.update_consumer(record_id, data, self.user_id)
+                if not self.db.update_consumer(record_id, data, self.user_id, version):
+                    self.show_conflict_message()
+                    return
                 self.load_data()  # Reload current data to reflect changes
 
             QMessageBox.information(self, "Sukses", "Data konsumen berhasil diedit.")
@@ -574,10 +773,10 @@ class ConsumerTable(TableWidget):
             print(f"Selected row: {selected_row}")
 
             if self.is_viewing_history:
-                closed_book_data = self.db.load_closed_book(self.current_book_name)
-                print(f"Closed book data: {closed_book_data}")
-                if selected_row < len(closed_book_data):
-                    record_id = closed_book_data[selected_row][0]
+                closed_book_row = self.closed_book_row_at(selected_row)
+                print(f"Closed book data: {closed_book_row}")
+                if closed_book_row:
+                    record_id = closed_book_row[0]
                     self.db.delete_from_closed_book(self.current_book_name, record_id)
                 else:
                     error_message = "Tidak dapat menemukan data yang akan dihapus."
@@ -599,6 +798,7 @@ class ConsumerTable(TableWidget):
         self.table.removeRow(selected_row)
         QMessageBox.information(self, "Hapus Data", "Data berhasil dihapus.")
 
+    @profiler.action("close_book")
     def close_book(self):
         if self.table.rowCount() == 0:
             QMessageBox.warning(self, 'Tutup Buku', 'Tidak dapat menutup buku karena data kosong.')
@@ -607,10 +807,10 @@ class ConsumerTable(TableWidget):
         reply = QMessageBox.question(self, 'Tutup Buku', 'Anda yakin ingin menutup buku? Ini akan membuat backup data saat ini dan menghapus semua data dari tabel.',
                                  QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
-            backup_name = self.db.close_book(self.table_name, self.user_id)
-            self.load_data()  # Reload the (now empty) table
-            QMessageBox.information(self, "Tutup Buku", f"Buku telah ditutup. Data lama telah dibackup ke {backup_name} dan tabel telah direset.")
+            self.start_close_book('close_book', (self.table_name, self.user_id),
+                                  "Buku telah ditutup. Data lama telah dibackup ke {} dan tabel telah direset.")
 
+    @profiler.action("view_history")
     def view_history(self):
         closed_books = self.db.get_closed_books(self.table_name, self.user_id)
         if closed_books:
@@ -627,8 +827,7 @@ class ConsumerTable(TableWidget):
         
             if ok:
                 original_name = formatted_names[formatted_name]
-                data = self.db.load_closed_book(original_name)
-                self.display_history(data, formatted_name, original_name)
+                self.display_history(formatted_name, original_name)
         else:
             QMessageBox.information(self, "Tidak Ada Data", "Tidak ada riwayat tersimpan untuk konsumen.")
 
@@ -643,17 +842,12 @@ class ConsumerTable(TableWidget):
         
         return f"Konsumen {year} {month_name} {day} ({count})"
 
-    def display_history(self, data, book_name, original_name):
+    def display_history(self, book_name, original_name):
         self.table.setRowCount(0)  # Clear the current table
         self.title_label.setText(f"Riwayat {self.title_label.text().split(' - ')[0]} - {book_name}")
-    
-        for row_data in data:
-            row_position = self.table.rowCount()
-            self.table.insertRow(row_position)
-            for column, item in enumerate(row_data[1:]):  # Exclude id
-                self.table.setItem(row_position, column, QTableWidgetItem(str(item)))
-    
-    
+        # Dirender lewat add_consumer_row seperti load_data agar angka tampil dengan format yang sama
+        self.start_history_paging(original_name, self.add_consumer_row)
+
         self.close_book_button.hide()
         self.view_history_button.hide()
     
@@ -663,6 +857,7 @@ class ConsumerTable(TableWidget):
 
         self.current_book_name = original_name
         self.is_viewing_history = True
+        self.update_history_buttons()
 
     def return_to_current_data(self):
         self.title_label.setText("Daftar Konsumen")
@@ -678,9 +873,10 @@ class ConsumerTable(TableWidget):
         self.return_button = None
 
 class SalesTable(TableWidget):
+    @profiler.timed
     def __init__(self, parent=None):
         super().__init__("sales_projects", parent)
-        setup_error_handling()
+        self.watched_tables = ('sales', 'sales_projects')
         self.title_label.setText("Daftar Proyek Sales")
         self.current_sales_id = None
         self.current_sales_name = ""
@@ -703,11 +899,10 @@ class SalesTable(TableWidget):
         self.table.setColumnWidth(7, 200)  # Keterangan
         self.table.horizontalHeader().setStretchLastSection(True)
 
-    def set_user_id(self, user_id):
-        super().set_user_id(user_id)
+    def set_user_id(self, user_id, load=True):
         self.current_sales_id = None
         self.current_sales_name = ""
-        self.load_data()
+        super().set_user_id(user_id, load)
 
     def setup_table(self):
         column_names = ["ID"] + list(COLUMN_MAPPINGS[self.table_name].keys())
@@ -771,10 +966,10 @@ class SalesTable(TableWidget):
         selected_row = selected_items[0].row()
 
         if self.is_viewing_history:
-            closed_book_data = self.db.load_closed_book(self.current_book_name)
-            if selected_row < len(closed_book_data):
-                project_id = closed_book_data[selected_row][0]
-                photo_path = closed_book_data[selected_row][-1]  # Assuming photo_path is the last column
+            closed_book_row = self.closed_book_row_at(selected_row)
+            if closed_book_row:
+                project_id = closed_book_row[0]
+                photo_path = self.closed_book_photo(closed_book_row)
             else:
                 QMessageBox.warning(self, "Error", "Tidak dapat menemukan data proyek.")
                 return
@@ -782,8 +977,9 @@ class SalesTable(TableWidget):
             project_id = self.table.item(selected_row, 0).text()  # Assuming ID is in the first column
             photo_path = self.db.get_sales_project_photo(project_id, self.user_id)
 
+        photo_path = self.db.fetch_photo(photo_path)
         if photo_path and os.path.exists(photo_path):
-            dialog = PhotoViewerDialog(self, photo_path)
+            dialog = PhotoViewerDialog(self, photo_path, self.db)
             dialog.exec_()
         else:
             QMessageBox.information(self, "Tidak Ada Gambar", "Tidak ada gambar tersedia untuk proyek ini.")
@@ -913,20 +1109,21 @@ class SalesTable(TableWidget):
     
     def load_data(self):
         self.table.setRowCount(0)  # Clear existing data
+        self.history_pages = None
         if self.current_sales_id is not None:
             if self.is_viewing_history:
                 self.select_sales_button.hide()
                 self.setting_button.hide()
-                projects = self.db.load_closed_book(self.current_book_name)
-                for project in projects:
-                    self.add_row(project[1:])  # Skip the ID column
+                self.start_history_paging(self.current_book_name, self.add_history_project)
             else:
                 self.select_sales_button.show()
                 self.setting_button.show()
                 projects = self.db.get_sales_projects(self.current_sales_id, self.user_id)
                 for project in projects:
-                    self.add_row(project)
+                    self.add_row(project[:-1])
+                    self.set_row_key(self.table.rowCount() - 1, project[0], project[-1])
         self.update_total_commission()
+        self.remember_changes()
 
     def add_row(self, data):
         row_position = self.table.rowCount()
@@ -937,9 +1134,9 @@ class SalesTable(TableWidget):
                 self.table.setItem(row_position, column, QTableWidgetItem(formatted_value))
             else:
                 self.table.setItem(row_position, column, QTableWidgetItem(str(item)))
-    
-        self.update_total_commission()
 
+    def add_history_project(self, project):
+        self.add_row(project[1:])  # Skip the ID column
 
     def update_sales_info(self):
         if self.current_sales_id is not None:
@@ -950,6 +1147,14 @@ class SalesTable(TableWidget):
             self.setting_button.hide()  # Sembunyikan tombol setting
     
     def update_total_commission(self):
+        if self.is_viewing_history and self.current_book_name:
+            # Riwayat dimuat bertahap, jadi total dihitung langsung dari buku yang ditutup
+            total_commission, total_kb = self.db.get_closed_book_totals(self.current_book_name, ('commission', 'kb'))
+            self.total_commission = total_commission - total_kb
+            self.total_commission_label.setText(f"Total Komisi: {self.format_currency(self.total_commission)}")
+            self.total_kb_label.setText(f"Total KB: {self.format_currency(total_kb)}")
+            return
+
         total_commission = 0
         total_kb = 0
         for row in range(self.table.rowCount()):
@@ -1031,21 +1236,21 @@ class SalesTable(TableWidget):
                         self.table.setItem(selected_row, col, QTableWidgetItem(str(item_text) if item_text is not None else ""))
     
                 if self.is_viewing_history:
-                    closed_book_data = self.db.load_closed_book(self.current_book_name)
-                    if selected_row < len(closed_book_data):
-                        record_id = closed_book_data[selected_row][0]
+                    closed_book_row = self.closed_book_row_at(selected_row)
+                    if closed_book_row:
+                        record_id = closed_book_row[0]
                         self.db.update_in_closed_book(self.current_book_name, record_id, dict(zip(COLUMN_MAPPINGS[self.table_name].keys(), data)), photo_path, self.user_id, self.current_sales_id)
                     else:
                         QMessageBox.warning(self, "Error", "Tidak dapat menemukan data yang akan diupdate.")
                         return
                 else:
-                    sales_projects = self.db.get_sales_projects(self.current_sales_id, self.user_id)
-                    if selected_row < len(sales_projects):
-                        project_id = sales_projects[selected_row][0]
-                        self.db.update_sales_project(project_id, data, self.user_id, photo_path)
-                    else:
+                    project_id, version = self.get_row_key(selected_row)
+                    if project_id is None:
                         QMessageBox.warning(self, "Error", "Tidak dapat menemukan data yang akan diupdate.")
                         return
+                    if not self.db.update_sales_project(project_id, data, self.user_id, photo_path, version):
+                        self.show_conflict_message()
+                        return
         
                 self.update_total_commission()
                 QMessageBox.information(self, "Sukses", "Data proyek sales berhasil diedit.")
@@ -1096,10 +1301,10 @@ class SalesTable(TableWidget):
             selected_row = selected_items[0].row()
 
             if self.is_viewing_history:
-                closed_book_data = self.db.load_closed_book(self.current_book_name)
-                if selected_row < len(closed_book_data):
-                    record_id = closed_book_data[selected_row][0]
-                    photo_path = closed_book_data[selected_row][-1]  # Assuming photo_path is the last column
+                closed_book_row = self.closed_book_row_at(selected_row)
+                if closed_book_row:
+                    record_id = closed_book_row[0]
+                    photo_path = self.closed_book_photo(closed_book_row)
                 
                     # Delete photo if it exists
                     if photo_path and os.path.exists(photo_path):
@@ -1138,6 +1343,7 @@ class SalesTable(TableWidget):
             QMessageBox.information(self, "Hapus Data", "Data berhasil dihapus.")
             self.update_total_commission()
 
+    @profiler.action("close_book")
     def close_book(self):
         if self.current_sales_id is None:
             QMessageBox.warning(self, 'Tutup Buku', 'Silakan pilih sales terlebih dahulu.')
@@ -1150,10 +1356,10 @@ class SalesTable(TableWidget):
         reply = QMessageBox.question(self, 'Tutup Buku', f'Anda yakin ingin menutup buku untuk sales {self.current_sales_name}? Ini akan membuat backup data saat ini dan menghapus semua data dari tabel.',
                              QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
-            backup_name = self.db.close_book_for_person(self.table_name, self.current_sales_id, self.user_id)
-            self.load_data()  # Reload the (now empty) table
-            QMessageBox.information(self, "Tutup Buku", f"Buku untuk sales {self.current_sales_name} telah ditutup. Data lama telah dibackup ke {backup_name} dan tabel telah direset.")
+            self.start_close_book('close_book_for_person', (self.table_name, self.current_sales_id, self.user_id),
+                                  f"Buku untuk sales {self.current_sales_name} telah ditutup. Data lama telah dibackup ke {{}} dan tabel telah direset.")
 
+    @profiler.action("view_history")
     def view_history(self):
         if self.current_sales_id is None:
             QMessageBox.warning(self, 'Lihat Riwayat', 'Silakan pilih sales terlebih dahulu.')
@@ -1174,8 +1380,7 @@ class SalesTable(TableWidget):
         
             if ok:
                 original_name = formatted_names[formatted_name]
-                data = self.db.load_closed_book(original_name)
-                self.display_history(data, formatted_name, original_name)
+                self.display_history(formatted_name, original_name)
                 self.load_data()
         else:
             QMessageBox.information(self, "Tidak Ada Data", f"Tidak ada riwayat tersimpan untuk sales {self.current_sales_name}.")
@@ -1191,16 +1396,10 @@ class SalesTable(TableWidget):
         
         return f"{self.current_sales_name} {year} {month_name} {day} ({count})"
     
-    def display_history(self, data, book_name, original_name):
+    def display_history(self, book_name, original_name):
         self.table.setRowCount(0)  # Clear the current table
         self.title_label.setText(f"Riwayat {self.title_label.text().split(' - ')[0]} - {book_name}")
 
-        for row_data in data:
-            row_position = self.table.rowCount()
-            self.table.insertRow(row_position)
-            for column, item in enumerate(row_data[1:]):  # Exclude id
-                self.table.setItem(row_position, column, QTableWidgetItem(str(item)))
-
         self.close_book_button.hide()
         self.view_history_button.hide()
         self.setting_button.hide()
@@ -1211,7 +1410,10 @@ class SalesTable(TableWidget):
 
         self.current_book_name = original_name
         self.is_viewing_history = True
-        
+        self.update_history_buttons()
+
+        # Total riwayat dihitung sekali dari seluruh buku, tidak bergantung pada halaman yang sudah dimuat
+        self.start_history_paging(original_name, self.add_history_project)
         self.update_total_commission()
 
 
@@ -1243,63 +1445,73 @@ class SalesTable(TableWidget):
                 total_kb += self.parse_currency(kb_item.text())
         return total_commission, total_kb
 
+    @profiler.action("export_to_excel")
     def export_to_excel(self):
         file_name, _ = QFileDialog.getSaveFileName(self, "Save Excel", "", "Excel Files (*.xlsx)")
         if file_name:
-            workbook = openpyxl.Workbook()
-            sheet = workbook.active
-            
-            # Write headers
-            headers = [self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount()) if not self.table.isColumnHidden(i)]
-            for col, header in enumerate(headers, start=1):
-                cell = sheet.cell(row=1, column=col, value=header)
-                cell.font = Font(bold=True)
-            
-            # Write data
-            for row in range(self.table.rowCount()):
-                col_index = 1
-                for column in range(self.table.columnCount()):
-                    if not self.table.isColumnHidden(column):
-                        item = self.table.item(row, column)
-                        if item is not None:
-                            cell = sheet.cell(row=row+2, column=col_index, value=item.text())
-                            if headers[col_index-1] == "Keterangan":
-                                cell.alignment = Alignment(wrapText=True, vertical='top')
-                                cell = self.format_keterangan_cell(cell)
-                        else:
-                            sheet.cell(row=row+2, column=col_index, value='')
-                        col_index += 1
-            
-            sheet.append([""] * sheet.max_column)
-            
-            total_commission, total_kb = self.calculate_totals()
-            row = sheet.max_row + 2
-            sheet.cell(row=row, column=1, value="Total Komisi").font = Font(bold=True)
-            sheet.cell(row=row, column=2, value=self.format_currency(total_commission - total_kb))
-            row += 1
-            sheet.cell(row=row, column=1, value="Total KB").font = Font(bold=True)
-            sheet.cell(row=row, column=2, value=self.format_currency(total_kb))
-            
-            # Adjust column widths
-            for column in sheet.columns:
-                max_length = 0
-                column_letter = get_column_letter(column[0].column)
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(cell.value)
-                    except:
-                        pass
-                adjusted_width = (max_length + 2) * 1.2
-                sheet.column_dimensions[column_letter].width = adjusted_width
-            
-            workbook.save(file_name)
+            self.save_excel(file_name)
             QMessageBox.information(self, "Export Successful", f"Data has been exported to {file_name}")
 
+    def save_excel(self, file_name):
+        self.load_all_history()
+        import openpyxl
+        from openpyxl.utils import get_column_letter
+        from openpyxl.styles import Font, Alignment
+
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        
+        # Write headers
+        headers = [self.table.horizontalHeaderItem(i).text() for i in range(self.table.columnCount()) if not self.table.isColumnHidden(i)]
+        for col, header in enumerate(headers, start=1):
+            cell = sheet.cell(row=1, column=col, value=header)
+            cell.font = Font(bold=True)
+        
+        # Write data
+        for row in range(self.table.rowCount()):
+            col_index = 1
+            for column in range(self.table.columnCount()):
+                if not self.table.isColumnHidden(column):
+                    item = self.table.item(row, column)
+                    if item is not None:
+                        cell = sheet.cell(row=row+2, column=col_index, value=item.text())
+                        if headers[col_index-1] == "Keterangan":
+                            cell.alignment = Alignment(wrapText=True, vertical='top')
+                            cell = self.format_keterangan_cell(cell)
+                    else:
+                        sheet.cell(row=row+2, column=col_index, value='')
+                    col_index += 1
+        
+        sheet.append([""] * sheet.max_column)
+        
+        total_commission, total_kb = self.calculate_totals()
+        row = sheet.max_row + 2
+        sheet.cell(row=row, column=1, value="Total Komisi").font = Font(bold=True)
+        sheet.cell(row=row, column=2, value=self.format_currency(total_commission - total_kb))
+        row += 1
+        sheet.cell(row=row, column=1, value="Total KB").font = Font(bold=True)
+        sheet.cell(row=row, column=2, value=self.format_currency(total_kb))
+        
+        # Adjust column widths
+        for column in sheet.columns:
+            max_length = 0
+            column_letter = get_column_letter(column[0].column)
+            for cell in column:
+                try:
+                    if len(str(cell.value)) > max_length:
+                        max_length = len(cell.value)
+                except:
+                    pass
+            adjusted_width = (max_length + 2) * 1.2
+            sheet.column_dimensions[column_letter].width = adjusted_width
+        
+        workbook.save(file_name)
+
 class TukangTable(TableWidget):
+    @profiler.timed
     def __init__(self, parent=None):
         super().__init__("worker_projects", parent)
-        setup_error_handling()
+        self.watched_tables = ('tukang', 'worker_projects')
         self.title_label.setText("Daftar Proyek Tukang")
         self.setup_table()
         self.setup_setting_button()
@@ -1370,17 +1582,21 @@ class TukangTable(TableWidget):
             else:
                 self.table.setItem(row_position, column, QTableWidgetItem(str(item)))
 
+    def add_history_project(self, project):
+        self.add_row(project[1:])  # Skip the ID column
+
     def load_data(self):
         self.table.setRowCount(0)  # Clear existing data
+        self.history_pages = None
         if self.current_tukang_id:
             if self.is_viewing_history:
-                projects = self.db.load_closed_book(self.current_book_name)
-                for project in projects:
-                    self.add_row(project[1:])  # Skip the ID column
+                self.start_history_paging(self.current_book_name, self.add_history_project)
             else:
                 projects = self.db.get_worker_projects(self.current_tukang_id, self.user_id)
                 for project in projects:
-                    self.add_row(project)
+                    self.add_row(project[:-1])
+                    self.set_row_key(self.table.rowCount() - 1, project[0], project[-1])
+        self.remember_changes()
 
     def create_new_tukang(self):
         tukang_name, ok = QInputDialog.getText(self, "Tukang Baru", "Nama Tukang:")
@@ -1519,10 +1735,10 @@ class TukangTable(TableWidget):
         selected_row = selected_items[0].row()
 
         if self.is_viewing_history:
-            closed_book_data = self.db.load_closed_book(self.current_book_name)
-            if selected_row < len(closed_book_data):
-                project_id = closed_book_data[selected_row][0]
-                photo_path = closed_book_data[selected_row][-1]  # Assuming photo_path is the last column
+            closed_book_row = self.closed_book_row_at(selected_row)
+            if closed_book_row:
+                project_id = closed_book_row[0]
+                photo_path = self.closed_book_photo(closed_book_row)
             else:
                 QMessageBox.warning(self, "Error", "Tidak dapat menemukan data proyek.")
                 return
@@ -1530,8 +1746,9 @@ class TukangTable(TableWidget):
             project_id = self.table.item(selected_row, 0).text()  # Assuming ID is in the first column
             photo_path = self.db.get_worker_project_photo(project_id, self.user_id)
 
+        photo_path = self.db.fetch_photo(photo_path)
         if photo_path and os.path.exists(photo_path):
-            dialog = PhotoViewerDialog(self, photo_path)
+            dialog = PhotoViewerDialog(self, photo_path, self.db)
             dialog.exec_()
         else:
             QMessageBox.information(self, "Tidak Ada Gambar", "Tidak ada gambar tersedia untuk proyek ini.")
@@ -1555,6 +1772,7 @@ class TukangTable(TableWidget):
                     formatted_data = list(data)
                     formatted_data[4] = self.format_currency(data[4])  # Format KB
                     self.add_row((new_id,) + tuple(formatted_data))
+                    self.set_row_key(self.table.rowCount() - 1, new_id, self.db.get_row_version('worker_projects', new_id, self.user_id))
                 QMessageBox.information(self, "Sukses", "Data proyek tukang berhasil ditambahkan.")
         else:
             QMessageBox.warning(self, "No Tukang Selected", "Please select or create a tukang first.")
@@ -1597,16 +1815,21 @@ class TukangTable(TableWidget):
                     self.table.setItem(selected_row, col, QTableWidgetItem(str(item_text)))
 
             if self.is_viewing_history:
-                closed_book_data = self.db.load_closed_book(self.current_book_name)
-                if selected_row < len(closed_book_data):
-                    record_id = closed_book_data[selected_row][0]
+                closed_book_row = self.closed_book_row_at(selected_row)
+                if closed_book_row:
+                    record_id = closed_book_row[0]
                     self.db.update_in_closed_book(self.current_book_name, record_id, dict(zip(COLUMN_MAPPINGS[self.table_name].keys(), data)), photo_path, self.user_id, self.current_tukang_id)
                 else:
                     QMessageBox.warning(self, "Error", "Tidak dapat menemukan data yang akan diupdate.")
                     return
             else:
-                project_id = int(self.table.item(selected_row, 0).text())  # Get ID from hidden column
-                self.db.update_worker_project(project_id, data, self.user_id, photo_path)
+                project_id, version = self.get_row_key(selected_row)
+                if project_id is None:
+                    QMessageBox.warning(self, "Error", "Tidak dapat menemukan data yang akan diupdate.")
+                    return
+                if not self.db.update_worker_project(project_id, data, self.user_id, photo_path, version):
+                    self.show_conflict_message()
+                    return
         
             self.load_data()  # Reload data to reflect changes
             QMessageBox.information(self, "Sukses", "Data proyek tukang berhasil diedit.")
@@ -1649,10 +1872,10 @@ class TukangTable(TableWidget):
             selected_row = selected_items[0].row()
 
             if self.is_viewing_history:
-                closed_book_data = self.db.load_closed_book(self.current_book_name)
-                if selected_row < len(closed_book_data):
-                    record_id = closed_book_data[selected_row][0]
-                    photo_path = closed_book_data[selected_row][-1]  # Assuming photo_path is the last column
+                closed_book_row = self.closed_book_row_at(selected_row)
+                if closed_book_row:
+                    record_id = closed_book_row[0]
+                    photo_path = self.closed_book_photo(closed_book_row)
                 
                     # Delete photo if it exists
                     if photo_path and os.path.exists(photo_path):
@@ -1693,6 +1916,7 @@ class TukangTable(TableWidget):
             self.table.removeRow(selected_row)
             QMessageBox.information(self, "Hapus Data", "Data berhasil dihapus.")
 
+    @profiler.action("close_book")
     def close_book(self):
         if self.current_tukang_id is None:
             QMessageBox.warning(self, 'Tutup Buku', 'Silakan pilih tukang terlebih dahulu.')
@@ -1705,10 +1929,10 @@ class TukangTable(TableWidget):
         reply = QMessageBox.question(self, 'Tutup Buku', f'Anda yakin ingin menutup buku untuk tukang {self.current_tukang_name}? Ini akan membuat backup data saat ini dan menghapus semua data dari tabel.',
                              QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
-            backup_name = self.db.close_book_for_person(self.table_name, self.current_tukang_id, self.user_id)
-            self.load_data()  # Reload the (now empty) table
-            QMessageBox.information(self, "Tutup Buku", f"Buku untuk tukang {self.current_tukang_name} telah ditutup. Data lama telah dibackup ke {backup_name} dan tabel telah direset.")
+            self.start_close_book('close_book_for_person', (self.table_name, self.current_tukang_id, self.user_id),
+                                  f"Buku untuk tukang {self.current_tukang_name} telah ditutup. Data lama telah dibackup ke {{}} dan tabel telah direset.")
 
+    @profiler.action("view_history")
     def view_history(self):
         if self.current_tukang_id is None:
             QMessageBox.warning(self, 'Lihat Riwayat', 'Silakan pilih tukang terlebih dahulu.')
@@ -1729,8 +1953,7 @@ class TukangTable(TableWidget):
         
             if ok:
                 original_name = formatted_names[formatted_name]
-                data = self.db.load_closed_book(original_name)
-                self.display_history(data, formatted_name, original_name)
+                self.display_history(formatted_name, original_name)
                 self.load_data()
         else:
             QMessageBox.information(self, "Tidak Ada Data", f"Tidak ada riwayat tersimpan untuk tukang {self.current_tukang_name}.")
@@ -1746,16 +1969,11 @@ class TukangTable(TableWidget):
         
         return f"{self.current_tukang_name} {year} {month_name} {day} ({count})"
 
-    def display_history(self, data, book_name, original_name):
+    def display_history(self, book_name, original_name):
         self.table.setRowCount(0)  # Clear the current table
         self.title_label.setText(f"Riwayat {self.title_label.text().split(' - ')[0]} - {book_name}")
-    
-        for row_data in data:
-            row_position = self.table.rowCount()
-            self.table.insertRow(row_position)
-            for column, item in enumerate(row_data[1:]):  # Exclude id
-                self.table.setItem(row_position, column, QTableWidgetItem(str(item)))
-    
+        self.start_history_paging(original_name, self.add_history_project)
+
         self.close_book_button.hide()
         self.view_history_button.hide()
         self.setting_button.hide()
@@ -1767,6 +1985,7 @@ class TukangTable(TableWidget):
 
         self.current_book_name = original_name
         self.is_viewing_history = True
+        self.update_history_buttons()
 
     def return_to_current_data(self):
         self.title_label.setText(f"Daftar Proyek Tukang - {self.current_tukang_name}")
@@ -1783,8 +2002,10 @@ class TukangTable(TableWidget):
         self.return_button = None
 
 class MaterialTable(TableWidget):
+    @profiler.timed
     def __init__(self, parent=None):
         super().__init__("materials_usage", parent)
+        self.watched_tables = ('projects', 'materials_usage')
         self.title_label.setText("Daftar Pemakaian Bahan")
         self.setup_project_info_display()
         self.setup_table()
@@ -1880,13 +2101,16 @@ class MaterialTable(TableWidget):
 
     def load_data(self):
         self.table.setRowCount(0)
+        self.history_pages = None
         if self.current_project_id:
             materials = self.db.get_material_usage(self.current_project_id, self.user_id)
             for material in materials:
                 data = list(material[2:])  # Exclude id and project_id
                 data[3] = self.format_price(data[3])  # Format Harga Satuan
                 self.add_row(data)
+                self.set_row_key(self.table.rowCount() - 1, material[0], material[-1])
         self.update_total_price()
+        self.remember_changes()
     
     def get_project_input(self, title, initial_data=None):
         project_data = {}
@@ -1925,6 +2149,7 @@ class MaterialTable(TableWidget):
         if not projects:
             QMessageBox.warning(self, "Tidak Ada Proyek", "Tidak ada proyek yang tersedia. Silakan buat proyek baru terlebih dahulu.")
             return
+        summaries = self.db.get_project_summaries(self.user_id)
 
         dialog = QDialog(self)
         dialog.setWindowTitle("Pilih Proyek")
@@ -1939,8 +2164,8 @@ class MaterialTable(TableWidget):
 
         # Gunakan QTableWidget alih-alih QListWidget
         project_table = QTableWidget(dialog)
-        project_table.setColumnCount(2)
-        project_table.setHorizontalHeaderLabels(["Nama Proyek", "Tanggal Mulai"])
+        project_table.setColumnCount(5)
+        project_table.setHorizontalHeaderLabels(["Nama Proyek", "Tanggal Mulai", "Jumlah Bahan", "Biaya Bahan", "Keuntungan"])
         project_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         project_table.verticalHeader().setVisible(False)
         project_table.setSelectionBehavior(QTableWidget.SelectRows)
@@ -1961,11 +2186,15 @@ class MaterialTable(TableWidget):
                     project_table.insertRow(row)
                     project_table.setItem(row, 0, QTableWidgetItem(project[1]))
                     project_table.setItem(row, 1, QTableWidgetItem(project[4]))
+                    material_count, material_cost, profit = summaries.get(project[0], (0, 0, self.parse_currency(project[6])))
+                    project_table.setItem(row, 2, QTableWidgetItem(str(material_count)))
+                    project_table.setItem(row, 3, QTableWidgetItem(self.format_currency(material_cost)))
+                    project_table.setItem(row, 4, QTableWidgetItem(self.format_currency(profit)))
                 
                     # Set warna latar belakang selang-seling
                     if row % 2 == 0:
-                        project_table.item(row, 0).setBackground(QColor("#34485c"))
-                        project_table.item(row, 1).setBackground(QColor("#34485c"))
+                        for column in range(project_table.columnCount()):
+                            project_table.item(row, column).setBackground(QColor("#34485c"))
 
         # Hubungkan input pencarian ke fungsi filter
         search_input.textChanged.connect(populate_table)
@@ -2024,8 +2253,7 @@ class MaterialTable(TableWidget):
             return
     
         if self.is_viewing_history:
-            projects = self.db.load_closed_book(self.current_book_name + "_projects")
-            project = next((p for p in projects if p[0] == self.current_project_id), None)
+            project = self.db.get_closed_book_record(self.current_book_name + "_projects", self.current_project_id)
         else:
             projects = self.db.get_projects(self.user_id)
             project = next((p for p in projects if p[0] == self.current_project_id), None)
@@ -2060,7 +2288,10 @@ class MaterialTable(TableWidget):
                 # When editing a project in history, ensure the correct table is updated
                 self.db.update_in_closed_book(self.current_book_name + "_projects", self.current_project_id, dict(zip(["name", "sales_name", "worker_name", "start_date", "end_date", "total_project", "dp"], updated_data.values())))
             else:
-                self.db.update_project(updated_project_data, self.user_id)
+                if not self.db.update_project(updated_project_data, self.user_id, project[-1]):
+                    self.show_conflict_message()
+                    self.update_project_info()
+                    return
 
             self.update_project_info()
             QMessageBox.information(self, "Success", "Project updated successfully.")
@@ -2094,10 +2325,10 @@ class MaterialTable(TableWidget):
     def update_project_info(self, project=None):
         if project is None and self.current_project_id:
             if self.is_viewing_history:
-                projects = self.db.load_closed_book(self.current_book_name + "_projects")
+                project = self.db.get_closed_book_record(self.current_book_name + "_projects", self.current_project_id)
             else:
                 projects = self.db.get_projects(self.user_id)
-            project = next((p for p in projects if p[0] == self.current_project_id), None)
+                project = next((p for p in projects if p[0] == self.current_project_id), None)
 
         if project:
             self.current_project_name = project[1]
@@ -2136,6 +2367,8 @@ class MaterialTable(TableWidget):
             return
 
         selected_row = selected_items[0].row()
+        # Item kolom pertama diganti saat tabel diperbarui, jadi id dan version dibaca lebih dulu
+        material_id, version = self.get_row_key(selected_row)
         dialog = AddMaterialDialog(self)
     
         initial_data = []
@@ -2166,8 +2399,13 @@ class MaterialTable(TableWidget):
                     record_id = int(self.table.item(selected_row, 6).text())  # Get the ID from the hidden column
                     self.db.update_in_closed_book(self.current_book_name + "_materials", record_id, dict(zip(["date", "item_name", "quantity", "unit_price", "total", "notes"], data)))
                 else:
-                    material_id = self.db.get_material_usage(self.current_project_id, self.user_id)[selected_row][0]
-                    self.db.update_material_usage(material_id, data, self.user_id)
+                    if material_id is None:
+                        QMessageBox.warning(self, "Error", "Tidak dapat menemukan data yang akan diupdate.")
+                        return
+                    if not self.db.update_material_usage(material_id, data, self.user_id, version):
+                        self.show_conflict_message()
+                        return
+                    self.set_row_key(selected_row, material_id, self.db.get_row_version('materials_usage', material_id, self.user_id))
             
                 self.update_total_price()
             else:
@@ -2201,6 +2439,17 @@ class MaterialTable(TableWidget):
             QMessageBox.information(self, "Hapus Data", "Data berhasil dihapus.")
 
     def update_total_price(self):
+        # Proyek aktif memakai project_summary yang dijaga trigger, riwayat dijumlahkan langsung dari buku yang ditutup
+        summary = None
+        if self.current_project_id and self.is_viewing_history and self.current_book_name:
+            summary = self.db.get_closed_material_summaries(self.current_book_name, self.current_project_id).get(self.current_project_id, (0, 0))
+        elif self.current_project_id:
+            summary = self.db.get_project_summary(self.current_project_id)
+        if summary:
+            self.total_price_label.setText(f"Total Harga: {self.format_currency(summary[1])}")
+            self.update_total_profit()
+            return
+
         total_price = 0
         for row in range(self.table.rowCount()):
             total_item = self.table.item(row, 4)  # Total column
@@ -2241,8 +2490,9 @@ class MaterialTable(TableWidget):
                 if dialog.exec_():
                     if dialog.validate_data():
                         data = dialog.get_data()
-                        self.db.insert_material_usage(self.current_project_id, data, self.user_id)
+                        new_id = self.db.insert_material_usage(self.current_project_id, data, self.user_id)
                         self.add_row(data)
+                        self.set_row_key(self.table.rowCount() - 1, new_id, self.db.get_row_version('materials_usage', new_id, self.user_id))
                         self.update_total_price()
                     else:
                         QMessageBox.warning(self, "Input Tidak Valid", "Quantity dan Harga Satuan harus berupa angka.")
@@ -2262,8 +2512,6 @@ class MaterialTable(TableWidget):
 
         if len(data) > 6:
             self.table.setItem(row_position, 6, QTableWidgetItem(str(data[6])))
-            
-        self.update_total_price()
     
     def format_price(self, price):
         try:
@@ -2273,12 +2521,13 @@ class MaterialTable(TableWidget):
             return price 
     
     def add_additional_info(self, sheet):
+        from openpyxl.styles import Font
+
         if self.is_viewing_history:
-            projects = self.db.load_closed_book(self.current_book_name + "_projects")
+            project = self.db.get_closed_book_record(self.current_book_name + "_projects", self.current_project_id)
         else:
             projects = self.db.get_projects(self.user_id)
-    
-        project = next((p for p in projects if p[0] == self.current_project_id), None)
+            project = next((p for p in projects if p[0] == self.current_project_id), None)
     
         if project:
             project_details = [
@@ -2306,6 +2555,7 @@ class MaterialTable(TableWidget):
         sheet.cell(row=sheet.max_row + 1, column=1, value="Total Keuntungan").font = Font(bold=True)
         sheet.cell(row=sheet.max_row, column=2, value=self.format_currency(total_profit))
 
+    @profiler.action("close_book")
     def close_book(self):
         # Cek apakah ada proyek di dalam database
         project_count = self.db.count_projects(self.user_id)
@@ -2316,19 +2566,12 @@ class MaterialTable(TableWidget):
         reply = QMessageBox.question(self, 'Tutup Buku', 'Anda yakin ingin menutup buku untuk semua proyek? Ini akan membuat backup data saat ini dan menghapus semua data dari tabel.',
                                  QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
-            current_date = datetime.now()
-            backup_name = f"materials_backup_{self.user_id}_{current_date.year}_{current_date.month}_{current_date.day}"
-        
-            # Backup semua proyek dan material usage
-            unique_backup_name = self.db.backup_projects_and_materials(self.user_id, backup_name)
-        
-            # Hapus semua data proyek dan material usage
-            self.db.clear_projects_and_materials(self.user_id)
-        
-            self.load_data()  # Reload the (now empty) table
+            # Backup lalu hapus semua proyek dan material usage dalam satu transaksi
             self.reset_project_info()
-            QMessageBox.information(self, "Tutup Buku", f"Buku telah ditutup. Data lama telah dibackup ke {unique_backup_name} dan tabel telah direset.")
+            self.start_close_book('close_materials_book', (self.user_id,),
+                                  "Buku telah ditutup. Data lama telah dibackup ke {} dan tabel telah direset.")
 
+    @profiler.action("view_history")
     def view_history(self):
         backup_books = self.db.get_backup_books(self.user_id)
         if backup_books:
@@ -2345,8 +2588,8 @@ class MaterialTable(TableWidget):
         
             if ok:
                 original_name = backup_books[formatted_names.index(formatted_name)]
-                projects, materials = self.db.load_backup_book(original_name)
-                self.display_history(projects, materials, formatted_name, original_name)
+                projects = self.db.load_closed_book(original_name + "_projects")
+                self.display_history(projects, formatted_name, original_name)
         else:
             QMessageBox.information(self, "Tidak Ada Data", "Tidak ada riwayat tersimpan untuk tabel ini.")
 
@@ -2362,7 +2605,7 @@ class MaterialTable(TableWidget):
 
         return f"Tutup Buku {day}/{month}/{year} (User {user_id}, Backup #{counter})"
 
-    def display_history(self, projects, materials, book_name, original_name):
+    def display_history(self, projects, book_name, original_name):
         self.is_viewing_history = True
         self.current_book_name = original_name
 
@@ -2372,6 +2615,7 @@ class MaterialTable(TableWidget):
         self.table.setRowCount(0)
         self.reset_project_info()
         self.edit_project_button.show()
+        self.edit_project_button.setEnabled(self.update_history_buttons(original_name + "_projects"))
 
         # Hide normal buttons
         self.new_project_button.hide()
@@ -2397,33 +2641,37 @@ class MaterialTable(TableWidget):
 
         # Create new select history project button
         self.select_history_project_button = QPushButton("Pilih Proyek")
-        self.select_history_project_button.clicked.connect(lambda: self.select_history_project(projects, materials))
+        self.select_history_project_button.clicked.connect(lambda: self.select_history_project(projects))
         self.button_layout.addWidget(self.select_history_project_button)
 
         if projects:
-            self.load_history_project(projects[0][0], projects, materials)
+            self.load_history_project(projects[0][0], projects)
 
 
-    def select_history_project(self, projects, materials):
-        dialog = ProjectSelectionDialog(projects, self)
+    def select_history_project(self, projects):
+        # Buku lama tidak punya project_summary, jadi ringkasannya dihitung dengan satu query GROUP BY
+        material_summaries = self.db.get_closed_material_summaries(self.current_book_name)
+        summaries = {}
+        for project in projects:
+            material_count, material_cost = material_summaries.get(project[0], (0, 0))
+            summaries[project[0]] = (material_count, material_cost, self.parse_currency(project[6]) - material_cost)
+        dialog = ProjectSelectionDialog(projects, self, summaries)
         if dialog.exec_() == QDialog.Accepted:
             selected_project_id = dialog.get_selected_project()
             if selected_project_id is not None:
-                self.load_history_project(selected_project_id, projects, materials)
+                self.load_history_project(selected_project_id, projects)
 
-    def load_history_project(self, project_id, projects, materials):
+    def load_history_project(self, project_id, projects):
         project = next((p for p in projects if p[0] == project_id), None)
         if project:
             self.current_project_id = project[0]  # Set the current_project_id
             self.update_project_info(project)
     
             self.table.setRowCount(0)
-            for material in materials:
-                if material[1] == project_id:  # Check if material belongs to current project
-                    print(material[1] , project_id)
-                    self.add_row(list(material[2:8]) + [material[0]] )  # Convert tuple to list and include id, skip project_id
-                    print(list(material[2:8]) + [material[0]])
-
+            # Hanya bahan milik proyek ini yang dimuat, per halaman
+            self.start_history_paging(self.current_book_name + "_materials",
+                                      lambda material: self.add_row(list(material[2:8]) + [material[0]]),  # skip project_id, include id
+                                      project_id)
             self.update_total_price()
 
 
@@ -2440,6 +2688,8 @@ class MaterialTable(TableWidget):
         self.edit_project_button.show()
         self.delete_project_button.show()
         self.close_book_button.show()
+        self.update_history_buttons()
+        self.edit_project_button.setEnabled(True)
 
         if hasattr(self, 'return_button'):
             self.return_button.setParent(None)
@@ -2458,7 +2708,6 @@ class MaterialTable(TableWidget):
 class DateInputDialog(QDialog):
     def __init__(self, parent=None, title="Select Date"):
         super().__init__(parent)
-        setup_error_handling()
         self.setWindowTitle(title)
         self.layout = QVBoxLayout(self)
         
@@ -2481,7 +2730,7 @@ class PhotoViewerDialog(QDialog):
         self.setMinimumWidth(600)
         self.setMinimumHeight(400)
         self.photo_path = photo_path
-        self.db = DatabaseManager()
+        self.db = db_manager or open_database()
         self.project_id = project_id
         self.user_id = user_id
         self.is_sales_project = is_sales_project
@@ -2576,9 +2825,10 @@ class PhotoViewerDialog(QDialog):
         super().resizeEvent(event)
 
 class ProjectSelectionDialog(QDialog):
-    def __init__(self, projects, parent=None):
+    def __init__(self, projects, parent=None, summaries=None):
         super().__init__(parent)
         self.setWindowTitle("Pilih Proyek")
+        self.summaries = summaries or {}
         self.setMinimumWidth(600)
         self.setMinimumHeight(400)
 
@@ -2591,8 +2841,8 @@ class ProjectSelectionDialog(QDialog):
 
         # Project table
         self.project_table = QTableWidget(self)
-        self.project_table.setColumnCount(3)
-        self.project_table.setHorizontalHeaderLabels(["Nama Proyek", "Tanggal Mulai", "Tanggal Selesai"])
+        self.project_table.setColumnCount(6)
+        self.project_table.setHorizontalHeaderLabels(["Nama Proyek", "Tanggal Mulai", "Tanggal Selesai", "Jumlah Bahan", "Biaya Bahan", "Keuntungan"])
         self.project_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.project_table.verticalHeader().setVisible(False)
         self.project_table.setSelectionBehavior(QTableWidget.SelectRows)
@@ -2621,6 +2871,11 @@ class ProjectSelectionDialog(QDialog):
                 self.project_table.setItem(row, 0, QTableWidgetItem(project[1]))
                 self.project_table.setItem(row, 1, QTableWidgetItem(project[4]))
                 self.project_table.setItem(row, 2, QTableWidgetItem(project[5]))
+                if project[0] in self.summaries:
+                    material_count, material_cost, profit = self.summaries[project[0]]
+                    self.project_table.setItem(row, 3, QTableWidgetItem(str(material_count)))
+                    self.project_table.setItem(row, 4, QTableWidgetItem(format_rupiah(material_cost)))
+                    self.project_table.setItem(row, 5, QTableWidgetItem(format_rupiah(profit)))
                 self.project_table.item(row, 0).setData(Qt.UserRole, project[0])
 
     def filter_projects(self, text):
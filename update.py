@@ -5,6 +5,7 @@ import requests
 import subprocess
 import argparse
 import logging
+from delta import apply_delta, create_delta_file, DeltaError
 from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QProgressBar, QLabel, QMessageBox, QDesktopWidget
 from PyQt5.QtCore import Qt, QThread, pyqtSignal
 
@@ -39,7 +40,7 @@ class UpdaterThread(QThread):
             self.progress_signal.emit(60)
 
             self.status_signal.emit("Memperbarui konfigurasi...")
-            update_config(latest_version)
+            update_config(latest_version, new_exe)
             self.progress_signal.emit(100)
 
             self.status_signal.emit("Update selesai")
@@ -147,8 +148,16 @@ def download_update(version):
 
     for asset in release['assets']:
         if asset['name'].endswith('.exe'):
+            # Coba patch delta dulu, unduh installer lengkap jika gagal
+            try:
+                if download_delta_update(release, asset['name'], version):
+                    return asset['name']
+            except (DeltaError, requests.RequestException, OSError) as e:
+                logging.warning(f"Patch delta gagal, mengunduh installer lengkap: {str(e)}")
+
             download_url = asset['browser_download_url']
             response = requests.get(download_url)
+            response.raise_for_status()
             with open(asset['name'], 'wb') as f:
                 f.write(response.content)
             logging.info(f"File update {asset['name']} berhasil diunduh.")
@@ -157,11 +166,46 @@ def download_update(version):
     logging.warning("Tidak ada file update yang ditemukan.")
     return None
 
-def update_config(new_version):
+def get_delta_asset_name(from_version, to_version):
+    return f"{from_version}_to_{to_version}.delta"
+
+def download_delta_update(release, exe_name, version):
+    with open(CONFIG_FILE, 'r') as f:
+        config = json.load(f)
+    old_exe = config.get('installer', exe_name)
+    if not os.path.exists(old_exe):
+        logging.info("Installer versi sebelumnya tidak ditemukan, patch delta dilewati.")
+        return False
+
+    delta_name = get_delta_asset_name(config['version'], version)
+    delta_asset = next((a for a in release['assets'] if a['name'] == delta_name), None)
+    if not delta_asset:
+        logging.info(f"Tidak ada patch delta {delta_name} untuk rilis ini.")
+        return False
+
+    response = requests.get(delta_asset['browser_download_url'])
+    response.raise_for_status()
+    logging.info(f"Patch delta {delta_name} diunduh ({len(response.content)} byte).")
+
+    with open(old_exe, 'rb') as f:
+        old_data = f.read()
+    # apply_delta memverifikasi hash sumber dan hasil sebelum file ditulis
+    new_data = apply_delta(old_data, response.content)
+
+    temp_name = f"{exe_name}.tmp"
+    with open(temp_name, 'wb') as f:
+        f.write(new_data)
+    os.replace(temp_name, exe_name)
+    logging.info(f"Patch delta berhasil diterapkan ke {exe_name}.")
+    return True
+
+def update_config(new_version, installer=None):
     with open(CONFIG_FILE, 'r') as f:
         config = json.load(f)
     
     config['version'] = new_version
+    if installer:
+        config['installer'] = installer
     
     with open(CONFIG_FILE, 'w') as f:
         json.dump(config, f, indent=4)
@@ -171,9 +215,15 @@ def update_config(new_version):
 def main():
     parser = argparse.ArgumentParser(description="Update checker and installer")
     parser.add_argument("--install", action="store_true", help="Install update")
+    parser.add_argument("--make-delta", nargs=3, metavar=("OLD_EXE", "NEW_EXE", "OUTPUT"),
+                        help="Buat file patch delta untuk aset rilis")
     args = parser.parse_args()
 
-    if args.install:
+    if args.make_delta:
+        old_exe, new_exe, output = args.make_delta
+        size = create_delta_file(old_exe, new_exe, output)
+        print(f"Patch delta dibuat: {output} ({size} byte)")
+    elif args.install:
         app = QApplication(sys.argv)
         gui = UpdaterGUI()
         gui.show()